@@ -0,0 +1,92 @@
+# file: benchmarks/bench_cards.py
+"""Microbenchmark for rendering a 500-card selection of one kanji.
+
+Usage: python benchmarks/bench_cards.py
+
+Compares formatting the full config.json Template once per card, as the
+controller did before CardRenderer, with CardRenderer.render_batch, which
+binds the kanji-level fields (including a 3 KB stroke SVG) once per batch.
+Both paths must produce identical cards.
+"""
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from kanji2vocab.models import KanjiInfo, plain, render_html  # noqa: E402
+from kanji2vocab.services.cards import CardRenderer  # noqa: E402
+from kanji2vocab.services.formatter import Formatter  # noqa: E402
+from kanji2vocab.services.logger import Logger  # noqa: E402
+from kanji2vocab.services.scraper import JishoScraper, VocabFilter  # noqa: E402
+from kanji2vocab.services.utils import strip_prefix  # noqa: E402
+
+
+# Jisho fixture pages shared with the tests.
+FIXTURES = ROOT / "tests" / "fixtures" / "jisho"
+
+CARDS = 500
+EXPLANATION = "[Semantic]\nStrong meaning 勉強 text.\n[Context]\nUsed when 強い.\n[Component]\n強 = bow + insect."
+KANJI_INFO = KanjiInfo(info="11 strokes", onyomi="On:キョウ、ゴウ", kunyomi="Kun:つよ.い", meaning="strong")
+STROKE = "<svg>" + "x" * 3000 + "</svg>"
+
+
+def per_card(template: str, renderer: CardRenderer, items, explanations) -> list[str]:
+    """Format the whole template for every card, kanji fields included."""
+    cards = []
+    for item, explanation in zip(items, explanations):
+        formatted_meaning = re.sub(r"(\d+\.)", r"<br>\1", render_html(item.meaning))
+        updated_meaning = formatted_meaning + "<br><br>" + renderer.format_explanation_sections(explanation)
+        updated_meaning = renderer.censor_vocab(updated_meaning, item.vocab)
+        cards.append(
+            template.format(
+                KANJI="強",
+                KANJI_ONYOMI=" " + strip_prefix(KANJI_INFO.onyomi, "On:"),
+                KANJI_KUNYOMI=" " + strip_prefix(KANJI_INFO.kunyomi, "Kun:"),
+                KANJI_MEANING=KANJI_INFO.meaning,
+                VOCAB=r"{{c1::" + renderer.color_vocab_by_verb_type(item.vocab, plain(item.meaning)) + r"}}",
+                MEANING=r"{{c2::" + updated_meaning + r"}}",
+                FURIGANA=r"{{c1::" + render_html(item.furigana) + r"}}",
+                TAG=render_html(item.tag),
+                STROKE=STROKE,
+            )
+        )
+    return cards
+
+
+def best_of(runs: int, fn) -> float:
+    """Return the fastest of several timed calls, in seconds."""
+    best = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    """Build 500 cards from the fixture pages and time both paths."""
+    # Use the shipped templates and every fixture entry, repeated up to CARDS.
+    config = json.loads((ROOT / "config.json").read_text(encoding="utf-8"))
+    scraper = JishoScraper("{}{}", Formatter(), Logger(), VocabFilter(set("勉盗いる")))
+    items = []
+    for page in (1, 2):
+        items += scraper._parse_page((FIXTURES / f"page{page}.html").read_bytes(), "強", page).items
+    items = (items * CARDS)[:CARDS]
+    explanations = [EXPLANATION] * CARDS
+
+    # Both paths must agree before their timings mean anything.
+    renderer = CardRenderer(config["Template"], config["TemplateKanji"])
+    batch = lambda: renderer.render_batch("強", KANJI_INFO, STROKE, items, explanations)  # noqa: E731
+    naive = lambda: per_card(config["Template"], renderer, items, explanations)  # noqa: E731
+    assert batch() == naive(), "render_batch and per-card str.format disagree"
+
+    for name, fn in (("per-card str.format", naive), ("render_batch", batch)):
+        print(f"{name:>20}: {best_of(20, fn) * 1000:6.2f} ms / {CARDS} cards")
+
+
+if __name__ == "__main__":
+    main()
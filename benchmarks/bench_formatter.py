@@ -0,0 +1,91 @@
+# file: benchmarks/bench_formatter.py
+"""Microbenchmark for meaning and tag shortening on one full result page.
+
+Usage: python benchmarks/bench_formatter.py [--check] [TREE ...]
+
+Each TREE is a checkout of this repo (default: the current one), so the
+compiled rule engine can be compared with the commit before it:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/bench_formatter.py --check /tmp/before .
+
+Trees take turns over several rounds and the best round counts, so a slow
+spell on a busy machine does not decide the comparison. With --check, the
+exit status is 1 unless the last tree is faster than the first.
+"""
+import sys
+import subprocess
+from pathlib import Path
+
+
+# Jisho fixture pages shared with the tests.
+FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "jisho"
+
+ROUNDS = 5
+
+# Runs inside each tree, so only APIs present since the lxml parser are used.
+_BENCH = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from kanji2vocab.services.formatter import Formatter
+from kanji2vocab.services.parser import JishoParser
+
+formatter = Formatter()
+parser = JishoParser(formatter)
+pages = [parser.parse(open(f"{sys.argv[2]}/page{n}.html", "rb").read()) for n in (1, 2)]
+entries = [entry for page in pages for entry in page.entries]
+
+# Scale the fixture entries up to a full page: 20 entries, 120 senses.
+senses = [entry.senses * 3 for entry in (entries * 5)[:20]]
+tags = [", ".join(entry.tags) for entry in (entries * 5)[:20]]
+
+def run():
+    for entry_senses, entry_tags in zip(senses, tags):
+        formatter.shortify_meaning(entry_senses)
+        formatter.shortify_tag(entry_tags)
+
+best = float("inf")
+for _ in range(5):
+    start = time.perf_counter()
+    for _ in range(200):
+        run()
+    best = min(best, (time.perf_counter() - start) / 200)
+print(best * 1e6)
+"""
+
+
+def time_tree(tree: str) -> float:
+    """Time one tree in its own interpreter, in microseconds per page."""
+    result = subprocess.run(
+        [sys.executable, "-c", _BENCH, str(Path(tree).resolve()), str(FIXTURES)],
+        capture_output=True, text=True,
+    )
+    if result.returncode:
+        sys.exit(f"{tree}: {result.stderr.strip().splitlines()[-1]}")
+    return float(result.stdout)
+
+
+def main() -> None:
+    """Time every given tree and optionally check that the last one is fastest."""
+    # Default to the checkout this script lives in.
+    args = sys.argv[1:]
+    check = "--check" in args
+    trees = [arg for arg in args if arg != "--check"] or [str(Path(__file__).resolve().parent.parent)]
+
+    # Take turns, so load on the machine slows every tree alike.
+    best = [float("inf")] * len(trees)
+    for _ in range(ROUNDS):
+        for index, tree in enumerate(trees):
+            best[index] = min(best[index], time_tree(tree))
+
+    # A page is 20 entries with 120 senses.
+    for tree, micros in zip(trees, best):
+        print(f"{tree}: {micros:8.1f} us per page ({micros / best[0]:.2f}x)")
+
+    # The compiled engine must stay ahead of the tree it is compared with.
+    if check and len(trees) > 1 and best[-1] >= best[0]:
+        sys.exit(f"{trees[-1]} is not faster than {trees[0]}")
+
+
+if __name__ == "__main__":
+    main()
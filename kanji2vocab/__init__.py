@@ -10,10 +10,15 @@ Data Objects:
 
 Logic Classes:
 - Formatter: meaning/tag/markup normalization and color conversion.
-- VocabFilter + JishoScraper: fetch and parse data from Jisho.
-- PaginationHandler: sequential/concurrent scraping orchestration.
+- VocabFilter + VocabSource: filtering and the shared item-building path.
+- JishoScraper: fetch and parse data from Jisho.
+- JMdictStore + JMdictSource: offline vocab from a local JMdict import.
+- KanjidicStore: local kanji metadata built from KANJIDIC2.
+- JishoParser: single-pass lxml parser for result pages.
+- PageCache: compressed on-disk cache of downloaded pages.
+- PaginationHandler: sequential/concurrent (asyncio) scraping orchestration.
 - StrokeScraper: fetch kanji stroke SVG.
-- APIKeyRotator + AIClient: AI request and key rotation.
+- KeyScheduler + AIClient: AI requests spread over healthy API keys.
 - AnkiInteractor + AnkiClient: AnkiConnect API wrapper.
 - ConsoleUI: input/output and selection workflows.
 - ConfigManager: config I/O and mutations.
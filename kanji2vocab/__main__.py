@@ -7,11 +7,17 @@ import pyperclip
 from .services.utils import load_env
 from .services.logger import Logger
 from .services.formatter import Formatter
+from .services.cache import PageCache
 from .services.scraper import JishoScraper, VocabFilter
+from .services.jmdict import JMdictStore, JMdictSource
+from .services.kanjidic import KanjidicStore
 from .services.pagination import PaginationHandler
 from .services.stroke import StrokeScraper
-from .services.ai import APIKeyRotator, AIClient
+from .services.ai import KeyScheduler, AIClient
 from .services.anki import AnkiInteractor, AnkiClient
+from .services.outbox import AnkiOutbox
+from .services.cards import CardRenderer
+from .services.explanations import ExplanationCache
 from .services.ui import ConsoleUI
 from .config import ConfigManager
 from .cli import parse_cli
@@ -31,35 +37,113 @@ async def main() -> None:
     config = config_manager.load()
 
     # Initialize formatter and UI.
-    formatter = Formatter()
+    formatter = Formatter(config.meaning_rules, logger)
     ui = ConsoleUI(logger, formatter)
 
-    # Initialize vocab filter and scraper.
+    # Initialize vocab filter.
     vocab_filter = VocabFilter(set(config.has_learned))
-    scraper = JishoScraper(
-        base_url_template=config.base_url,
-        formatter=formatter,
-        logger=logger,
-        vocab_filter=vocab_filter,
-        is_tag_shortened=config.is_tag_shortened,
-        is_meaning_shortened=config.is_meaning_shortened,
-        is_colored=config.is_colored,
-    )
+
+    # Open the local kanji metadata store if it exists or can be imported.
+    kanji_store = None
+    if os.path.isfile(config.kanjidic_db) or os.path.isfile(config.kanjidic_path):
+        kanji_store = KanjidicStore(config.kanjidic_db, logger)
+        if not kanji_store.is_built():
+            if os.path.isfile(config.kanjidic_path):
+                logger.log(f"Importing {config.kanjidic_path} (one-time)...", "i")
+                kanji_store.build(config.kanjidic_path)
+            else:
+                kanji_store.close()
+                kanji_store = None
+
+    # Open the offline JMdict store if selected, importing it on first use.
+    jmdict_store = None
+    if config.vocab_source == "jmdict":
+        jmdict_store = JMdictStore(config.jmdict_db, logger)
+        if not jmdict_store.is_built():
+            if os.path.isfile(config.jmdict_path):
+                logger.log(f"Importing {config.jmdict_path} (one-time)...", "i")
+                jmdict_store.build(config.jmdict_path)
+            else:
+                logger.log(f"JMdict file {config.jmdict_path} not found. Falling back to Jisho.", "w")
+                jmdict_store.close()
+                jmdict_store = None
+        # Kanji readings and meanings only come from KANJIDIC when JMdict is the source.
+        if jmdict_store and not kanji_store:
+            logger.log(
+                f"KANJIDIC file {config.kanjidic_path} not found: JMdict cards will have no kanji info "
+                "and uncolored furigana.", "w"
+            )
+
+    # Initialize the vocab source.
+    page_cache = None
+    if jmdict_store:
+        scraper = JMdictSource(
+            store=jmdict_store,
+            formatter=formatter,
+            logger=logger,
+            vocab_filter=vocab_filter,
+            is_tag_shortened=config.is_tag_shortened,
+            is_meaning_shortened=config.is_meaning_shortened,
+            is_colored=config.is_colored,
+            common_only=config.jmdict_common_only,
+            kanji_store=kanji_store,
+        )
+    else:
+        # Initialize the on-disk page cache if enabled.
+        if config.is_cached:
+            page_cache = PageCache(
+                config.cache_path,
+                ttl=config.cache_ttl,
+                max_bytes=config.cache_max_mb * 1024 * 1024,
+            )
+        scraper = JishoScraper(
+            base_url_template=config.base_url,
+            formatter=formatter,
+            logger=logger,
+            vocab_filter=vocab_filter,
+            is_tag_shortened=config.is_tag_shortened,
+            is_meaning_shortened=config.is_meaning_shortened,
+            is_colored=config.is_colored,
+            connection_limit=config.connection_limit,
+            cache=page_cache,
+            kanji_store=kanji_store,
+        )
 
     # Initialize pagination handler.
-    paginator = PaginationHandler(scraper, logger)
+    paginator = PaginationHandler(scraper, logger, speculative_pages=config.speculative_pages)
 
     # Initialize stroke scraper.
     stroke_scraper = StrokeScraper(logger)
 
-    # Initialize AI client with rotating keys.
-    ai_rotator = APIKeyRotator([0, 1], logger)
-    ai_client = AIClient(ai_rotator, os.getenv("AI_URL"), os.getenv("AI_MODEL"), logger)
+    # Initialize AI client over every API_KEY_* key.
+    key_scheduler = KeyScheduler(logger)
+    ai_client = AIClient(key_scheduler, os.getenv("AI_URL"), os.getenv("AI_MODEL"), logger, timeout=config.ai_timeout)
 
     # Initialize Anki client.
     anki_interactor = AnkiInteractor(logger=logger)
-    anki_client = AnkiClient(anki_interactor, config.anki_deck, logger)
+    anki_outbox = AnkiOutbox(config.outbox_path)
+    anki_client = AnkiClient(
+        anki_interactor,
+        config.anki_deck,
+        logger,
+        batch_size=config.anki_batch_size,
+        outbox=anki_outbox,
+        flush_interval=config.outbox_flush_interval,
+    )
     logger.log("AnkiAPI Connected", "s")
+    # Index existing vocab notes once so duplicates are caught before any request.
+    if config.vocab_method != "m":
+        await anki_client.load_index(config.anki_model_vocab)
+    # Drain notes left over from runs where Anki was unavailable.
+    if anki_outbox.count():
+        logger.log(f"{anki_outbox.count()} note(s) waiting in the Anki outbox", "i")
+        anki_client.start_flusher()
+
+    # Open the per-vocab AI explanation cache if enabled.
+    explanation_cache = ExplanationCache(config.ai_cache_path) if config.is_ai_cached else None
+
+    # Compile card templates.
+    card_renderer = CardRenderer(config.template, config.template_kanji)
 
     # Build controller.
     controller = AppController(
@@ -72,14 +156,33 @@ async def main() -> None:
         stroke_scraper=stroke_scraper,
         ai_client=ai_client,
         anki_client=anki_client,
+        card_renderer=card_renderer,
         vocab_filter=vocab_filter,
         clipboard=pyperclip,
         initial_config=config,
+        kanji_store=kanji_store,
+        explanation_cache=explanation_cache,
     )
 
     # Parse CLI arguments and dispatch.
     args = parse_cli(sys.argv)
-    await controller.dispatch(args)
+    try:
+        await controller.dispatch(args)
+    finally:
+        # Release the scraper's and Anki's pooled connections.
+        await scraper.close()
+        await anki_client.close()
+        await ai_client.close()
+        await anki_interactor.close()
+        anki_outbox.close()
+        if page_cache:
+            page_cache.close()
+        if jmdict_store:
+            jmdict_store.close()
+        if kanji_store:
+            kanji_store.close()
+        if explanation_cache:
+            explanation_cache.close()
 
 
 if __name__ == "__main__":
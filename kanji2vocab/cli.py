@@ -11,6 +11,10 @@ def parse_cli(argv: list[str]) -> CLIArgs:
     if len(argv) == 2 and argv[1] in ("-c", "--config"):
         return CLIArgs(action="config")
 
+    # Handle outbox replay option.
+    if len(argv) == 2 and argv[1] in ("-r", "--replay"):
+        return CLIArgs(action="replay")
+
     # Handle help option.
     if len(argv) == 2 and argv[1] in ("-h", "--help"):
         return CLIArgs(action="help")
@@ -2,20 +2,25 @@
 import re
 import time
 import asyncio
+import hashlib
+from typing import AsyncIterator
 
 from rich.live import Live
 
-from .models import AppConfig, KanjiInfo, VocabItem, PaginationResult, CLIArgs
+from .models import AppConfig, KanjiInfo, VocabItem, PaginationResult, PaginationStats, PreparedKanji, CLIArgs
 from .config import ConfigManager
 from .services.logger import Logger
 from .services.formatter import Formatter
 from .services.ui import ConsoleUI
-from .services.scraper import JishoScraper, VocabFilter
+from .services.scraper import VocabSource, VocabFilter
 from .services.pagination import PaginationHandler
 from .services.stroke import StrokeScraper
 from .services.ai import AIClient
-from .services.anki import AnkiClient
-from .services.utils import strip_prefix
+from .services.anki import AnkiClient, MEDIA_PREFIX
+from .services.cards import CardRenderer
+from .services.utils import normalize_jp, uni
+from .services.kanjidic import KanjidicStore
+from .services.explanations import ExplanationCache, SectionParser, explanation_text, split_sections
 
 
 class AppController:
@@ -26,14 +31,17 @@ class AppController:
         logger: Logger,
         formatter: Formatter,
         ui: ConsoleUI,
-        scraper: JishoScraper,
+        scraper: VocabSource,
         paginator: PaginationHandler,
         stroke_scraper: StrokeScraper,
         ai_client: AIClient,
         anki_client: AnkiClient,
+        card_renderer: CardRenderer,
         vocab_filter: VocabFilter,
         clipboard,
         initial_config: AppConfig,
+        kanji_store: KanjidicStore | None = None,
+        explanation_cache: ExplanationCache | None = None,
     ) -> None:
         # Store dependencies.
         self.config_manager = config_manager
@@ -45,8 +53,11 @@ class AppController:
         self.stroke_scraper = stroke_scraper
         self.ai_client = ai_client
         self.anki_client = anki_client
+        self.card_renderer = card_renderer
         self.vocab_filter = vocab_filter
         self.clipboard = clipboard
+        self.kanji_store = kanji_store
+        self.explanation_cache = explanation_cache
 
         # Store config and apply settings.
         self.config = initial_config
@@ -58,6 +69,8 @@ class AppController:
         self.config = config
         # Update learned set in vocab filter.
         self.vocab_filter.set_learned_set(set(config.has_learned))
+        # Recompile meaning rules if MeaningRules changed.
+        self.formatter.update_rules(config.meaning_rules)
         # Update scraper settings.
         self.scraper.update_settings(
             base_url_template=config.base_url,
@@ -65,8 +78,10 @@ class AppController:
             is_meaning_shortened=config.is_meaning_shortened,
             is_colored=config.is_colored,
         )
-        # Update Anki deck.
-        self.anki_client.update_deck(config.anki_deck)
+        # Recompile card templates if they changed.
+        self.card_renderer.update_templates(config.template, config.template_kanji)
+        # Update Anki deck and batch size.
+        self.anki_client.update_settings(deck_name=config.anki_deck, batch_size=config.anki_batch_size)
 
     def reload_config(self) -> None:
         """Reload configuration from disk and apply it."""
@@ -75,12 +90,36 @@ class AppController:
         # Apply updated settings.
         self._apply_config(config)
 
-    def _update_learned(self, kanji: str) -> None:
+    async def _update_learned(self, kanji: str) -> None:
         """Update hasLearned with a new kanji and refresh config."""
-        # Update config via manager and apply changes.
-        updated = self.config_manager.update_learned(self.config, kanji)
+        # Persist in a thread so the file write overlaps with network stages.
+        updated = await asyncio.to_thread(self.config_manager.update_learned, self.config, kanji)
         self._apply_config(updated)
 
+    async def _timed(self, timings: dict[str, float], stage: str, coro):
+        """Await a stage and record its wall-clock duration."""
+        # Record the time even if the stage fails.
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            timings[stage] = time.perf_counter() - start
+
+    async def _lookup_kanji_info(self, kanji: str) -> KanjiInfo | None:
+        """Return kanji info from the local store, if one is configured."""
+        # SQLite connections stay on the loop thread; the lookup is a single indexed read.
+        return self.kanji_store.get(kanji) if self.kanji_store else None
+
+    async def _scrape(
+        self, kanji: str, total_pages: int, method: str, stats: PaginationStats
+    ) -> tuple[list[VocabItem], KanjiInfo | None, asyncio.Task | None]:
+        """Scrape vocab; concurrent runs return after page 1 with a background loader."""
+        if method == "c":
+            # Wait for page 1 only; later pages keep loading in the background.
+            return await self._start_streaming(kanji, total_pages, stats)
+        pagination_result = await self.paginator.sequential(kanji, total_pages)
+        return self._dedupe_items(pagination_result.items), pagination_result.kanji_info, None
+
     def _dedupe_items(self, items: list[VocabItem]) -> list[VocabItem]:
         """Remove duplicate vocab items by vocab string."""
         # Track seen vocab strings.
@@ -94,6 +133,56 @@ class AppController:
         # Return unique list.
         return unique
 
+    async def _start_streaming(
+        self, kanji: str, total_pages: int, stats: PaginationStats
+    ) -> tuple[list[VocabItem], KanjiInfo | None, asyncio.Task]:
+        """Return page 1 items now and a task that appends the remaining pages."""
+        # Pull page 1 from the ordered page stream.
+        pages = self.paginator.stream(kanji, total_pages, stats)
+        _, first = await anext(pages)
+
+        # Seed the shared list; indices stay stable because later pages only append.
+        items: list[VocabItem] = []
+        seen: set[str] = set()
+        if first is not None:
+            self._append_unique(items, seen, first.items)
+
+        # Keep consuming the stream in the background.
+        loader = asyncio.create_task(self._collect_pages(pages, items, seen))
+        return items, first.kanji_info if first else None, loader
+
+    async def _collect_pages(self, pages, items: list[VocabItem], seen: set[str]) -> None:
+        """Append streamed pages to the shared item list, skipping duplicates."""
+        # Failed pages arrive as None and are simply skipped.
+        async for _, result in pages:
+            if result is not None:
+                self._append_unique(items, seen, result.items)
+
+    def _append_unique(self, items: list[VocabItem], seen: set[str], new_items: list[VocabItem]) -> None:
+        """Extend items in place with vocab not seen before."""
+        # Same rule as _dedupe_items, applied incrementally.
+        for item in new_items:
+            if item.vocab not in seen:
+                items.append(item)
+                seen.add(item.vocab)
+
+    async def _finish_loading(self, loader: asyncio.Task | None, stats: PaginationStats) -> None:
+        """Cancel any background page loading and log request statistics."""
+        # Cancelling closes the page stream, which cancels its in-flight requests.
+        if loader is not None:
+            if not loader.done():
+                loader.cancel()
+            try:
+                await loader
+            except asyncio.CancelledError:
+                pass
+            # Show every streamed page and the requests spent; pages loaded behind selection, so nothing was drawn live.
+            self.logger.log(self.paginator.stream_table(stats), "_")
+
+        # Report page cache effectiveness.
+        if self.scraper.cache:
+            self.logger.log(f"Page cache: {self.scraper.cache.stats()}", "i")
+
     def _build_prompt(self, vocab_list: list[str]) -> str:
         """Build the AI prompt for the given vocab list."""
         # Join vocab list using # as separator.
@@ -170,121 +259,190 @@ class AppController:
         # Compare with expected vocab list.
         return aligned == expected
 
+    def _prompt_hash(self) -> str:
+        """Hash of the prompt template; the vocab list is appended last, so it is left out."""
+        return hashlib.sha1(self._build_prompt([]).encode("utf-8")).hexdigest()[:16]
+
+    def _cache_sections(self, sections: dict[str, str]) -> None:
+        """Store real sections; a bare heading is a placeholder for a vocab the AI never explained."""
+        if self.explanation_cache:
+            self.explanation_cache.put_many(
+                {vocab: body for vocab, body in sections.items() if body != f"# {vocab}"},
+                self.ai_client.model,
+                self._prompt_hash(),
+            )
+
+    async def _explain(self, vocab_list: list[str]) -> str:
+        """Return explanations for vocab_list in order, asking the AI only for cache misses."""
+        # Without a cache every vocab goes to the AI.
+        if not self.explanation_cache:
+            return await self._request_ai_explanations(vocab_list)
+
+        # Key entries by model and prompt template.
+        sections = self.explanation_cache.get_many(vocab_list, self.ai_client.model, self._prompt_hash())
+
+        # Ask only for the misses and store their sections.
+        misses = [vocab for vocab in dict.fromkeys(vocab_list) if vocab not in sections]
+        if misses:
+            fresh = split_sections(await self._request_ai_explanations(misses))
+            self._cache_sections(fresh)
+            sections.update(fresh)
+        self.logger.log(
+            f"AI cache: {len(vocab_list) - len(misses)}/{len(vocab_list)} reused | {self.explanation_cache.stats()}", "i"
+        )
+
+        # Merge cached and fresh sections back in selection order.
+        return "\n\n".join(sections.get(vocab, f"# {vocab}") for vocab in vocab_list)
+
+    async def _stream_explanations(self, vocab_list: list[str]) -> AsyncIterator[tuple[str, str]]:
+        """Yield (vocab, section) pairs as they become available: cached ones first, then streamed ones."""
+        # Serve cache hits immediately.
+        cached = (
+            self.explanation_cache.get_many(vocab_list, self.ai_client.model, self._prompt_hash())
+            if self.explanation_cache
+            else {}
+        )
+        for vocab in vocab_list:
+            if vocab in cached:
+                yield vocab, cached[vocab]
+        misses = [vocab for vocab in dict.fromkeys(vocab_list) if vocab not in cached]
+        if self.explanation_cache:
+            self.logger.log(
+                f"AI cache: {len(vocab_list) - len(misses)}/{len(vocab_list)} reused | {self.explanation_cache.stats()}", "i"
+            )
+        if not misses:
+            return
+
+        # Stream every chunk concurrently into one queue; None marks the end.
+        size = max(1, self.config.ai_chunk_size)
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks = [
+            asyncio.create_task(self._stream_ai_chunk(misses[i : i + size], queue))
+            for i in range(0, len(misses), size)
+        ]
+        streams = asyncio.gather(*tasks, return_exceptions=True)
+        streams.add_done_callback(lambda _: queue.put_nowait(None))
+
+        try:
+            while (item := await queue.get()) is not None:
+                self._cache_sections({item[0]: item[1]})
+                yield item
+        finally:
+            # Stop the remaining streams if the consumer gives up early.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(streams, return_exceptions=True)
+            self.logger.log(f"API keys: {self.ai_client.scheduler.summary()}", "i")
+
+    async def _stream_ai_chunk(self, vocab_list: list[str], queue: asyncio.Queue) -> None:
+        """Stream one chunk, emitting each section once it closes; only missing vocab are asked again."""
+        pending = list(vocab_list)
+
+        for attempt in range(1 + max(0, self.config.ai_retries)):
+            if not pending:
+                return
+            prompt_text = self._build_prompt(pending)
+            parser = SectionParser()
+            try:
+                async for delta in self.ai_client.stream_chat("#".join(pending), prompt=prompt_text):
+                    for raw in parser.feed(delta):
+                        self._accept_section(raw, pending, queue)
+                for raw in parser.close():
+                    self._accept_section(raw, pending, queue)
+            except Exception as e:
+                # The scheduler has benched the failing key; the next attempt gets a healthy one.
+                self.logger.log(f"[#f00][API ERROR]: {e}[/]", "_")
+                continue
+            if pending:
+                self.logger.log(f"[#f00][FATAL ERROR]: Disaligned. (Missing {pending})[/]", "_")
+
+        # Out of retries: leave the rest unexplained.
+        if pending:
+            self.logger.log(f"No aligned AI response for {', '.join(pending)}; leaving them unexplained.", "w")
+        for vocab in pending:
+            queue.put_nowait((vocab, f"# {vocab}"))
+
+    def _accept_section(self, raw: str, pending: list[str], queue: asyncio.Queue) -> None:
+        """Queue a streamed section if its heading is one of the vocab still pending."""
+        # Clean the section the same way a full response is cleaned.
+        for vocab, section in split_sections(self._fix_ai_response(raw)).items():
+            if vocab in pending:
+                pending.remove(vocab)
+                queue.put_nowait((vocab, section))
+
     async def _request_ai_explanations(self, vocab_list: list[str]) -> str:
-        """Request AI explanations and enforce formatting constraints."""
+        """Request AI explanations in concurrent chunks and merge them in order."""
+        # Split the selection; the scheduler spreads the chunks over the keys.
+        size = max(1, self.config.ai_chunk_size)
+        chunks = [vocab_list[i : i + size] for i in range(0, len(vocab_list), size)]
+        status = ["Waiting..."] * len(chunks)
+
+        # Prepare rich Live log with one status line per chunk.
+        with Live(console=self.logger.console, screen=False) as live:
+            def report(index: int, text: str) -> None:
+                status[index] = text
+                lines = [
+                    f"Chunk {i + 1}/{len(chunks)} ({len(chunk)}): {line}"
+                    for i, (chunk, line) in enumerate(zip(chunks, status))
+                ]
+                live.update("\n".join(lines), refresh=True)
+
+            responses = await asyncio.gather(
+                *(self._request_ai_chunk(chunk, index, report) for index, chunk in enumerate(chunks))
+            )
+        self.logger.log(f"API keys: {self.ai_client.scheduler.summary()}", "i")
+
+        # Merge the validated chunks back in selection order.
+        return "\n\n".join(responses)
+
+    async def _request_ai_chunk(self, vocab_list: list[str], index: int, report) -> str:
+        """Request one chunk, retrying only this chunk within the AIRetries budget."""
         # Build prompt and expected list.
         prompt_text = self._build_prompt(vocab_list)
         expected = vocab_list
         joined = "#".join(vocab_list)
-
-        # Prepare rich Live log.
-        with Live(console=self.logger.console, screen=False) as live:
-            while True:
-                # Request AI response.
-                api_response = await self.ai_client.request_chat(
-                    joined, prompt=prompt_text
+        response_text = ""
+
+        for attempt in range(1 + max(0, self.config.ai_retries)):
+            # Request AI response.
+            report(index, f"Requesting (attempt {attempt + 1})...")
+            api_response = await self.ai_client.request_chat(joined, prompt=prompt_text)
+
+            # API errors use up an attempt; the scheduler has already benched the failing key.
+            if isinstance(api_response, Exception):
+                report(index, f"[#f00][API ERROR]: {api_response}[/]")
+                continue
+
+            # Log fatal API errors.
+            if str(api_response).startswith("?!"):
+                self.logger.log(
+                    f"[#f00][FATAL API ERROR]:\n{api_response}\n---[/]", "_"
                 )
 
-                # Handle quota errors by rotating key.
-                if "402" in str(api_response):
-                    self.logger.log(
-                        "[#f00][API ERROR] (0 Kuota). Rotating to next key...[/]", "_"
-                    )
-                    self.ai_client.rotate_key()
-                    continue
-
-                # Log fatal API errors.
-                if str(api_response).startswith("?!"):
-                    self.logger.log(
-                        f"[#f00][FATAL API ERROR]:\n{api_response}\n---[/]", "_"
-                    )
+            # Convert to string and apply response fixes.
+            response_text = self._fix_ai_response(str(api_response))
 
-                # Convert to string for processing.
-                response_text = str(api_response)
-
-                # Update live status.
-                live.update("Output checking...")
-
-                # Apply response fixes.
-                response_text = self._fix_ai_response(response_text)
+            # Validate alignment.
+            if self._is_alignment_ok(response_text, expected):
+                report(index, "[#0f0]Aligned.[/]")
+                return response_text
+            report(
+                index,
+                f"[#f00][FATAL ERROR]: Disaligned. (Expecting {expected} got {re.findall(r'^#\s*([^\n]+)', response_text, flags=re.MULTILINE)} instead[/])",
+            )
 
-                # Validate alignment.
-                if self._is_alignment_ok(response_text, expected):
-                    live.update("\n\n[#0f0] Error Fixed.[/]", refresh=True)
-                    return response_text
-                else:
-                    live.update(
-                        f"\n\n[#f00][FATAL ERROR]: Disaligned. (Expecting {expected} got {re.findall(r'^#\\s*([^\\n]+)', response_text, flags=re.MULTILINE)} instead[/])"
-                    )
+        # Out of retries: keep the sections that did arrive, leave the rest empty.
+        sections = split_sections(response_text)
+        missing = [vocab for vocab in expected if vocab not in sections]
+        self.logger.log(f"No aligned AI response for {', '.join(missing)}; leaving them unexplained.", "w")
+        return "\n\n".join(sections.get(vocab, f"# {vocab}") for vocab in expected)
 
     # async def _request_ai_audio(self, past_vocab_list, vocab_list): # @A
 
-    def _format_explanation_sections(self, explanation: str) -> str:
-        """Apply HTML color styles to AI explanation sections."""
-        # Colorize [Semantic] section.
-        explanation = re.sub(
-            r"(\[Semantic\])\s+(.+)",
-            r'<p style="color:red;text-shadow: #ff0000aa 0 0 25px">\1<br>\2</p>',
-            explanation,
-            flags=re.DOTALL,
-        )
-        # Colorize [Context] section.
-        explanation = re.sub(
-            r"(\[Context\])\s+(.+)",
-            r'<p style="color:#ff00ff;text-shadow: #ff00ffaa 0 0 25px">\1<br>\2</p>',
-            explanation,
-            flags=re.DOTALL,
-        )
-        # Colorize [Component] section.
-        explanation = re.sub(
-            r"(\[Component\])\s+(.+)",
-            r'<p style="color:lime;text-shadow: #00ff00aa 0 0 25px">\1<br>\2</p>',
-            explanation,
-            flags=re.DOTALL,
-        )
-        # Return formatted explanation.
-        return explanation
-
-    def _censor_vocab_in_text(self, text: str, vocab: str) -> str:
-        """Replace occurrences of vocab with a fixed placeholder sequence."""
-        # Determine replacement pattern length.
-        vocab_len = len(vocab)
-        # Build a deterministic censor string.
-        censor_letters = "XYZABCDEFGHIJKLMNOPQRSTUVW"[0:vocab_len]
-        # Replace all occurrences of vocab.
-        return re.sub(re.escape(vocab), censor_letters, text)
-
-    def _color_vocab_by_verb_type(self, vocab: str, meaning: str) -> str:
-        """Color the last character based on v5/v1 tags in meaning."""
-        # Extract the last parenthetical group.
-        parens = re.findall(r"\(([^)]*)\)", meaning)
-        last_par = parens[-1] if parens else ""
-
-        # Apply coloring based on verb type.
-        if re.search(r"v5", last_par, re.IGNORECASE):
-            return (
-                vocab[:-1] + f'<span style="color:cyan">{vocab[-1]}</span>'
-                if vocab
-                else vocab
-            )
-        if re.search(r"v1", last_par, re.IGNORECASE):
-            return (
-                vocab[:-1] + f'<span style="color:red">{vocab[-1]}</span>'
-                if vocab
-                else vocab
-            )
-        return vocab
-
     async def _create_kanji_note(self, kanji: str, kanji_info: KanjiInfo) -> None:
         """Create a kanji note in clipboard or Anki."""
-        # Build fields for the kanji template.
-        formatted_template = self.config.template_kanji.format(
-            KANJI=kanji,
-            MEANING=kanji_info.meaning,
-            ONYOMI=" " + strip_prefix(kanji_info.onyomi, "On:"),
-            KUNYOMI=" " + strip_prefix(kanji_info.kunyomi, "Kun:"),
-            INFO=kanji_info.info,
-        )
+        # Render the kanji template.
+        formatted_template = self.card_renderer.render_kanji(kanji, kanji_info)
 
         # Decide output method based on config.
         if self.config.vocab_method == "m":
@@ -301,36 +459,141 @@ class AppController:
             )
             self.logger.log("Recorded to Anki (AnkiConnect)", "s")
 
+    async def _prepare_kanji(self, kanji: str, total_pages: int = 20, method: str = "c") -> PreparedKanji:
+        """Fetch everything a kanji needs before selection can start."""
+        # Run the independent stages concurrently with a single join point.
+        timings: dict[str, float] = {}
+        stats = PaginationStats()
+        start_time = time.perf_counter()
+        scrape = asyncio.ensure_future(self._timed(timings, "Scrape", self._scrape(kanji, total_pages, method, stats)))
+        try:
+            scraped, raw_svg, stored_info, learned = await asyncio.gather(
+                scrape,
+                self._timed(timings, "Stroke", self.stroke_scraper.fetch_svg(kanji)),
+                self._timed(timings, "Kanji Info", self._lookup_kanji_info(kanji)),
+                self._timed(timings, "Learned", self._update_learned(kanji)),
+                return_exceptions=True,
+            )
+        except asyncio.CancelledError:
+            # Do not leave a started page loader running behind a cancelled kanji.
+            await self._cancel_loader(scrape)
+            raise
+        total_elapsed = time.perf_counter() - start_time
+
+        # Without vocab there is nothing to select; the scrape never started a loader.
+        if isinstance(scraped, BaseException):
+            raise scraped
+        items, page_info, loader = scraped
+
+        # The other stages are optional: log their failure and carry on without them.
+        if isinstance(raw_svg, Exception):
+            self.logger.log(f"Stroke for {kanji} unavailable: {raw_svg}", "w")
+            raw_svg = None
+        if isinstance(stored_info, Exception):
+            self.logger.log(f"Kanji info for {kanji} unavailable: {stored_info}", "w")
+            stored_info = None
+        if isinstance(learned, Exception):
+            self.logger.log(f"Could not record {kanji} as learned: {learned}", "w")
+
+        # Without a single usable item on page 1, wait for the remaining pages.
+        if not items and loader:
+            await loader
+
+        # Prefer the local kanji store; fall back to the scraped page 1 info.
+        return PreparedKanji(
+            kanji=kanji,
+            items=items,
+            kanji_info=stored_info or page_info or KanjiInfo.empty(),
+            raw_svg=raw_svg,
+            loader=loader,
+            stats=stats,
+            timings=timings,
+            total_elapsed=total_elapsed,
+        )
+
+    async def _cancel_loader(self, scrape: asyncio.Future) -> None:
+        """Cancel and await the page loader of a finished scrape stage, if it started one."""
+        # Stop the scrape itself if it is still running.
+        if not scrape.done():
+            scrape.cancel()
+            await asyncio.gather(scrape, return_exceptions=True)
+            return
+
+        # A finished concurrent scrape hands back its background loader.
+        if scrape.cancelled() or scrape.exception() is not None:
+            return
+        loader = scrape.result()[2]
+        if loader is not None:
+            loader.cancel()
+            await asyncio.gather(loader, return_exceptions=True)
+
+    async def _prepare_after(
+        self, previous: asyncio.Task | None, kanji: str, total_pages: int, method: str
+    ) -> PreparedKanji:
+        """Prepare a kanji once the previous one has finished scraping."""
+        # Scrape in order so a kanji is learned before the next one is filtered,
+        # and not before the previous one's later pages are filtered.
+        if previous is not None:
+            await asyncio.wait([previous])
+            if not previous.cancelled() and previous.exception() is None and previous.result().loader:
+                await asyncio.wait([previous.result().loader])
+        return await self._prepare_kanji(kanji, total_pages, method)
+
+    async def run_batch(self, kanji_list: str, total_pages: int = 20, method: str = "c") -> None:
+        """Run kanji one after another while the next ones are prepared in the background."""
+        # Keep up to PrefetchDepth kanji prepared ahead of the one being selected.
+        depth = max(0, self.config.prefetch_depth)
+        tasks: list[asyncio.Task] = []
+
+        def schedule(up_to: int) -> None:
+            """Start preparation tasks up to the given count."""
+            while len(tasks) < min(up_to, len(kanji_list)):
+                previous = tasks[-1] if tasks else None
+                kanji = kanji_list[len(tasks)]
+                tasks.append(asyncio.create_task(self._prepare_after(previous, kanji, total_pages, method)))
+
+        try:
+            # Process in order; preparation of later kanji overlaps with selection.
+            for i in range(len(kanji_list)):
+                schedule(i + 1 + depth)
+                await self._process_prepared(await tasks[i])
+        finally:
+            # Stop prefetching and any background page loading left behind.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.exception() is None and task.result().loader:
+                    task.result().loader.cancel()
+
     async def run_for_kanji(
         self, kanji: str, total_pages: int = 20, method: str = "c"
     ) -> None:
         """Run the full pipeline for a single kanji."""
-        # Update learned set and config.
-        self._update_learned(kanji)
-
-        # Fetch stroke SVG asynchronously.
-        raw_svg = await self.stroke_scraper.fetch_svg(kanji)
-
-        # Scrape vocab with timing.
-        start_time = time.time()
-        if method == "c":
-            pagination_result = self.paginator.concurrent(kanji, total_pages)
-        else:
-            pagination_result = self.paginator.sequential(kanji, total_pages)
-        end_time = time.time()
-        scraper_time_elapsed = end_time - start_time
+        # Prepare, then select and record.
+        prepared = await self._prepare_kanji(kanji, total_pages, method)
+        await self._process_prepared(prepared)
+
+    async def _process_prepared(self, prepared: PreparedKanji) -> None:
+        """Select, explain and record vocab for a prepared kanji."""
+        # Unpack the prepared state.
+        kanji = prepared.kanji
+        items = prepared.items
+        kanji_info = prepared.kanji_info
+        raw_svg = prepared.raw_svg
+        loader = prepared.loader
+        stats = prepared.stats
+        scraper_time_elapsed = prepared.timings["Scrape"]
+
+        # Report per-stage timings; the total should track the slowest stage.
+        stage_summary = " | ".join(f"{stage} {elapsed:.2f}s" for stage, elapsed in prepared.timings.items())
+        self.logger.log(f"Stages: {stage_summary} | Total {prepared.total_elapsed:.2f}s", "i")
 
         # Stop if no results.
-        if not pagination_result.items:
+        if not items:
+            await self._finish_loading(loader, stats)
             self.logger.log("Nil.", "f")
             return
 
-        # Use kanji info from scraper result.
-        kanji_info = pagination_result.kanji_info or KanjiInfo.empty()
-
-        # Dedupe items.
-        items = self._dedupe_items(pagination_result.items)
-
         # Display kanji info once after scraping.
         if kanji_info and (
             kanji_info.onyomi
@@ -348,35 +611,67 @@ Info: {kanji_info.info}
                 "_",
             )
 
+        # Vocab already in the target deck; a no-op after the startup index load.
+        existing: set[str] = set()
+        if self.config.vocab_method != "m":
+            await self.anki_client.load_index(self.config.anki_model_vocab)
+            existing = self.anki_client.existing_vocab(self.config.anki_model_vocab)
+
         # Select items either automatically or interactively.
         if self.config.is_automatic:
+            # Automatic runs take every page, so wait for the stream to finish.
+            if loader:
+                await loader
             selected_indices = set(range(len(items)))
         else:
             # Define callback for kanji template creation.
             def on_kanji_template():
                 asyncio.create_task(self._create_kanji_note(kanji, kanji_info))
 
-            selected_indices = self.ui.select_vocabulary(
+            selected_indices = await self.ui.select_vocabulary(
                 items=items,
                 pagination_limit=self.config.pagination_limit,
                 kanji_info=kanji_info,
                 scraper_time_elapsed=scraper_time_elapsed,
                 target_kanji=kanji,
                 on_kanji_template=on_kanji_template,
+                loader=loader,
+                existing=existing,
             )
 
+        # Stop pages nobody will look at and report the request statistics.
+        await self._finish_loading(loader, stats)
+
         # Exit if nothing selected.
         if not selected_indices:
             self.logger.log("No vocabulary selected. Exiting.", "c")
             return
 
+        # Skip vocab already in Anki before any AI or Anki request.
+        sorted_indices = []
+        for idx in sorted(selected_indices):
+            if normalize_jp(items[idx].vocab) in existing:
+                self.logger.log(f"VBX #{idx + 1} already in Anki, skipped", "w")
+            else:
+                sorted_indices.append(idx)
+        if not sorted_indices:
+            self.logger.log("Every selected vocabulary is already in Anki. Exiting.", "c")
+            return
+
         # Build vocab list for AI prompt.
-        sorted_indices = sorted(selected_indices)
         selected_vocab_list = [items[i].vocab for i in sorted_indices]
 
+        # Reference the stroke SVG as shared media, or inline it.
+        stroke, stroke_media = self._stroke_field(kanji, raw_svg)
+
+        # Stream explanations straight into cards and Anki when enabled.
+        if self.config.is_automatic and self.config.is_ai_streamed:
+            await self._stream_cards(kanji, kanji_info, stroke, stroke_media, items, sorted_indices)
+            return
+
         # Request AI explanations. Only if self.config.is_automatic is TRUE.. oh cmon its not that expensive for a cheap AI api 😂
         if self.config.is_automatic:
-            api_response = await self._request_ai_explanations(selected_vocab_list)
+            api_response = await self._explain(selected_vocab_list)
         
             # Log and give time to abort if needed.
             self.logger.log(api_response)
@@ -386,71 +681,127 @@ Info: {kanji_info.info}
             )
             await asyncio.sleep(5)
 
-            # Split explanations by #.
-            explanation_list = [
-                piece.strip() for piece in api_response.split("#") if piece.strip()
-            ]
+            # Pick each vocab's section; one the AI skipped stays unexplained.
+            sections = split_sections(api_response)
+            explanation_list = [explanation_text(vocab, sections.get(vocab, "")) for vocab in selected_vocab_list]
         else:
             # fallback: no AI → empty explanations. Faking as if explanation_list exist.
             explanation_list = [""] * len(sorted_indices)
 
-        # Collect Anki tasks if needed.
-        anki_tasks = []
-
-        # Process each selected vocab with its explanation.
-        for idx, explanation in zip(sorted_indices, explanation_list):
-            item = items[idx]
-
-            # Convert furigana markup to HTML.
-            html_furigana = self.formatter.cv_html(item.furigana)
-
-            # Format meaning with line breaks before numbering.
-            formatted_meaning = re.sub(r"(\d+\.)", r"<br>\1", item.meaning)
-
-            # Colorize explanation sections.
-            formatted_explanation = self._format_explanation_sections(explanation)
-
-            # Build final meaning with AI content.
-            updated_meaning = formatted_meaning + "<br><br>" + formatted_explanation
-
-            # Censor original vocab in meaning.
-            updated_meaning = self._censor_vocab_in_text(updated_meaning, item.vocab)
-
-            # Color vocab by verb type.
-            colored_vocab = self._color_vocab_by_verb_type(
-                item.vocab, formatted_meaning
-            )
-
-            # Build the final template.
-            formatted_template = self.config.template.format(
-                KANJI=kanji,
-                KANJI_ONYOMI=" " + strip_prefix(kanji_info.onyomi, "On:"),
-                KANJI_KUNYOMI=" " + strip_prefix(kanji_info.kunyomi, "Kun:"),
-                KANJI_MEANING=kanji_info.meaning,
-                VOCAB=r"{{c1::" + colored_vocab + r"}}",
-                MEANING=r"{{c2::" + updated_meaning + r"}}",
-                FURIGANA=r"{{c1::" + html_furigana + r"}}",
-                TAG=item.tag,
-                STROKE=raw_svg or "",
-            )
+        # Render every selected card in one batch; kanji-level fields are bound once.
+        cards = self.card_renderer.render_batch(
+            kanji, kanji_info, stroke, [items[idx] for idx in sorted_indices], explanation_list
+        )
 
-            # Output via clipboard or Anki.
+        # Output via clipboard, or queue one note per card for a batched Anki write.
+        notes = []
+        for idx, formatted_template in zip(sorted_indices, cards):
             if self.config.vocab_method == "m":
                 self.clipboard.copy(formatted_template)
                 self.logger.log(f"VBX #{idx} COPIED successfully (Confirmed)", "s")
             else:
-                task = asyncio.create_task(
-                    self.anki_client.add_note(
-                        {"Content": formatted_template},
-                        self.config.anki_model_vocab,
+                notes.append(
+                    self.anki_client.build_note(
+                        {"Content": formatted_template}, self.config.anki_model_vocab, media=stroke_media
                     )
                 )
-                anki_tasks.append(task)
+
+        # Flush queued notes in multi requests and report each one.
+        if notes:
+            self._report_notes(sorted_indices, await self.anki_client.add_notes(notes))
+
+    def _report_notes(self, indices: list[int], results: list[bool | None]) -> None:
+        """Log the outcome of each written vocab note."""
+        for idx, added in zip(indices, results):
+            if added:
                 self.logger.log(f"VBX #{idx + 1} recorded", "s")
+            elif added is None:
+                self.logger.log(f"VBX #{idx + 1} queued in the outbox", "w")
+            else:
+                self.logger.log(f"VBX #{idx + 1} failed", "f")
 
-        # Await all Anki tasks to finish.
-        if anki_tasks:
-            await asyncio.gather(*anki_tasks, return_exceptions=True)
+    async def _stream_cards(
+        self,
+        kanji: str,
+        kanji_info: KanjiInfo,
+        stroke: str,
+        stroke_media: list[dict] | None,
+        items: list[VocabItem],
+        sorted_indices: list[int],
+    ) -> None:
+        """Render and write each card as soon as its explanation section has streamed in."""
+        # Bind the kanji-level fields once; map vocab back to their rows.
+        bound = self.card_renderer.bind_kanji(kanji, kanji_info, stroke)
+        index_of = {items[idx].vocab: idx for idx in sorted_indices}
+
+        # A writer task drains finished notes to Anki in batches while the model keeps generating.
+        notes: asyncio.Queue = asyncio.Queue()
+        writer = asyncio.create_task(self._write_notes(notes)) if self.config.vocab_method != "m" else None
+
+        try:
+            async for vocab, section in self._stream_explanations([items[idx].vocab for idx in sorted_indices]):
+                idx = index_of[vocab]
+                self.logger.log(section)
+                card = self.card_renderer.render_vocab(bound, items[idx], explanation_text(vocab, section))
+                if writer:
+                    notes.put_nowait(
+                        (idx, self.anki_client.build_note({"Content": card}, self.config.anki_model_vocab, media=stroke_media))
+                    )
+                else:
+                    self.clipboard.copy(card)
+                    self.logger.log(f"VBX #{idx} COPIED successfully (Confirmed)", "s")
+        finally:
+            # Let the writer flush what is left.
+            if writer:
+                notes.put_nowait(None)
+                await writer
+
+    async def _write_notes(self, queue: asyncio.Queue) -> None:
+        """Write queued (index, note) pairs in batches as they arrive, until None."""
+        finished = False
+        while not finished:
+            # Wait for one note, then take whatever else is already waiting.
+            batch = [await queue.get()]
+            while len(batch) < self.anki_client.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is None:
+                finished = True
+                batch.pop()
+            if batch:
+                results = await self.anki_client.add_notes([note for _, note in batch])
+                self._report_notes([idx for idx, _ in batch], results)
+
+    def _stroke_field(self, kanji: str, raw_svg: str | None) -> tuple[str, list[dict] | None]:
+        """Return the STROKE field and the media it needs."""
+        # Clipboard cards cannot carry media, so they keep the inline SVG.
+        if not raw_svg:
+            return "", None
+        if not self.config.is_stroke_media or self.config.vocab_method == "m":
+            return raw_svg, None
+
+        # One file per kanji, named by codepoint; Anki stores it only once.
+        media = self.anki_client.media_from_data(
+            raw_svg.encode("utf-8"), ".svg", filename=f"{MEDIA_PREFIX}stroke_{uni(kanji)}.svg"
+        )
+        return f'<img src="{media["filename"]}">', [media]
+
+    async def replay_outbox(self) -> None:
+        """Resend every queued note, including ones Anki rejected before."""
+        # Nothing to do without an outbox.
+        outbox = self.anki_client.outbox
+        if not outbox or not outbox.count(include_rejected=True):
+            self.logger.log("Outbox is empty.", "i")
+            return
+
+        # Deliver in batches and report the outcome.
+        self.logger.log(f"Replaying {outbox.count(include_rejected=True)} queued note(s)...", "i")
+        try:
+            added, rejected = await self.anki_client.flush(include_rejected=True)
+        except Exception as e:
+            self.logger.log(f"An error occurred: {str(e)}", "f")
+            self.logger.log(f"{outbox.count(include_rejected=True)} note(s) remain queued.", "w")
+            return
+        self.logger.log(f"Replay: {added} delivered, {rejected} rejected (kept for the next replay)", "s")
 
     async def dispatch(self, args: CLIArgs) -> None:
         """Dispatch CLI actions to the correct workflow."""
@@ -466,7 +817,8 @@ Info: {kanji_info.info}
             self.logger.log(
                 "Command list:\n"
                 "1. -c/--config | To modify config.json\n"
-                "2. Kanji2Vocab.py [KANJI] [TOTAL_PAGINATION] [PAGE_SCRAPE_METHOD]\n"
+                "2. -r/--replay | To resend notes queued while Anki was unavailable\n"
+                "3. Kanji2Vocab.py [KANJI] [TOTAL_PAGINATION] [PAGE_SCRAPE_METHOD]\n"
                 " | [KANJI] = Requires any Kanji\n"
                 " | [TOTAL_PAGINATION] = Require an integer\n"
                 " | [PAGE_SCRAPE_METHOD] = Either s or c, s = Sequential (one-by-one), c = Concurrent (all-together), default = s\n\n"
@@ -475,10 +827,14 @@ Info: {kanji_info.info}
             )
             return
 
+        # Handle outbox replay, including notes Anki rejected before.
+        if args.action == "replay":
+            await self.replay_outbox()
+            return
+
         # Handle multi-kanji default run.
         if args.action == "multi" and args.kanji:
-            for ch in args.kanji:
-                await self.run_for_kanji(ch, total_pages=20, method="c")
+            await self.run_batch(args.kanji, total_pages=20, method="c")
             return
 
         # Handle explicit run.
@@ -1,8 +1,12 @@
 # file: kanji2vocab/models.py
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional
+
+from rich.markup import escape
 
 
 @dataclass
@@ -21,9 +25,33 @@ class AppConfig:
     anki_model_kanji: str = ""
     vocab_method: str = "a"
     is_colored: bool = True
+    is_stroke_media: bool = False
     is_automatic: bool = False
     is_ai: bool = True
     is_audio: bool = True
+    connection_limit: int = 10
+    is_cached: bool = True
+    cache_path: str = "data/jisho_cache.sqlite3"
+    cache_ttl: int = 604800
+    cache_max_mb: int = 64
+    vocab_source: str = "jisho"
+    jmdict_path: str = "data/JMdict_e.xml"
+    jmdict_db: str = "data/jmdict.sqlite3"
+    jmdict_common_only: bool = True
+    kanjidic_path: str = "data/kanjidic2.xml"
+    kanjidic_db: str = "data/kanjidic.sqlite3"
+    speculative_pages: int = 1
+    prefetch_depth: int = 1
+    meaning_rules: dict[str, Any] = field(default_factory=dict)
+    anki_batch_size: int = 25
+    outbox_path: str = "data/anki_outbox.sqlite3"
+    outbox_flush_interval: float = 30.0
+    ai_timeout: float = 120.0
+    ai_chunk_size: int = 8
+    ai_retries: int = 3
+    is_ai_streamed: bool = False
+    is_ai_cached: bool = True
+    ai_cache_path: str = "data/ai_cache.sqlite3"
     extra: dict[str, Any] = field(default_factory=dict)
     
     #TODO: Add additional configuration for others. e.g., isAI
@@ -48,9 +76,33 @@ class AppConfig:
         anki_model_kanji = raw.pop("AnkiModelKanji", "")
         vocab_method = raw.pop("VocabularyMethod", "a")
         is_colored = raw.pop("isColored", True)
+        is_stroke_media = raw.pop("isStrokeMedia", False)
         is_automatic = raw.pop("isAutomatic", False)
         is_ai = raw.pop("isAi", True)
         is_audio = raw.pop("isAudio", True)
+        connection_limit = raw.pop("ConnectionLimit", 10)
+        is_cached = raw.pop("isCached", True)
+        cache_path = raw.pop("CachePath", "data/jisho_cache.sqlite3")
+        cache_ttl = raw.pop("CacheTTL", 604800)
+        cache_max_mb = raw.pop("CacheMaxMB", 64)
+        vocab_source = raw.pop("VocabSource", "jisho")
+        jmdict_path = raw.pop("JMdictPath", "data/JMdict_e.xml")
+        jmdict_db = raw.pop("JMdictDB", "data/jmdict.sqlite3")
+        jmdict_common_only = raw.pop("JMdictCommonOnly", True)
+        kanjidic_path = raw.pop("KanjidicPath", "data/kanjidic2.xml")
+        kanjidic_db = raw.pop("KanjidicDB", "data/kanjidic.sqlite3")
+        speculative_pages = raw.pop("SpeculativePages", 1)
+        prefetch_depth = raw.pop("PrefetchDepth", 1)
+        meaning_rules = raw.pop("MeaningRules", {})
+        anki_batch_size = raw.pop("AnkiBatchSize", 25)
+        outbox_path = raw.pop("OutboxPath", "data/anki_outbox.sqlite3")
+        outbox_flush_interval = raw.pop("OutboxFlushInterval", 30.0)
+        ai_timeout = raw.pop("AITimeout", 120.0)
+        ai_chunk_size = raw.pop("AIChunkSize", 8)
+        ai_retries = raw.pop("AIRetries", 3)
+        is_ai_streamed = raw.pop("isAIStreamed", False)
+        is_ai_cached = raw.pop("isAICached", True)
+        ai_cache_path = raw.pop("AICachePath", "data/ai_cache.sqlite3")
 
         # Normalize has_learned into a list of characters.
         if isinstance(has_learned, list):
@@ -76,9 +128,33 @@ class AppConfig:
             anki_model_kanji=anki_model_kanji,
             vocab_method=vocab_method,
             is_colored=is_colored,
+            is_stroke_media=is_stroke_media,
             is_automatic=is_automatic,
             is_ai=is_ai,
             is_audio=is_audio,
+            connection_limit=connection_limit,
+            is_cached=is_cached,
+            cache_path=cache_path,
+            cache_ttl=cache_ttl,
+            cache_max_mb=cache_max_mb,
+            vocab_source=vocab_source,
+            jmdict_path=jmdict_path,
+            jmdict_db=jmdict_db,
+            jmdict_common_only=jmdict_common_only,
+            kanjidic_path=kanjidic_path,
+            kanjidic_db=kanjidic_db,
+            speculative_pages=speculative_pages,
+            prefetch_depth=prefetch_depth,
+            meaning_rules=meaning_rules if isinstance(meaning_rules, dict) else {},
+            anki_batch_size=anki_batch_size,
+            outbox_path=outbox_path,
+            outbox_flush_interval=outbox_flush_interval,
+            ai_timeout=ai_timeout,
+            ai_chunk_size=ai_chunk_size,
+            ai_retries=ai_retries,
+            is_ai_streamed=is_ai_streamed,
+            is_ai_cached=is_ai_cached,
+            ai_cache_path=ai_cache_path,
             extra=extra
         )
 
@@ -99,9 +175,33 @@ class AppConfig:
             "AnkiModelKanji": self.anki_model_kanji,
             "VocabularyMethod": self.vocab_method,
             "isColored": self.is_colored,
+            "isStrokeMedia": self.is_stroke_media,
             "isAutomatic": self.is_automatic,
             "isAi": self.is_ai,
-            "isAudio": self.is_audio
+            "isAudio": self.is_audio,
+            "ConnectionLimit": self.connection_limit,
+            "isCached": self.is_cached,
+            "CachePath": self.cache_path,
+            "CacheTTL": self.cache_ttl,
+            "CacheMaxMB": self.cache_max_mb,
+            "VocabSource": self.vocab_source,
+            "JMdictPath": self.jmdict_path,
+            "JMdictDB": self.jmdict_db,
+            "JMdictCommonOnly": self.jmdict_common_only,
+            "KanjidicPath": self.kanjidic_path,
+            "KanjidicDB": self.kanjidic_db,
+            "SpeculativePages": self.speculative_pages,
+            "PrefetchDepth": self.prefetch_depth,
+            "MeaningRules": self.meaning_rules,
+            "AnkiBatchSize": self.anki_batch_size,
+            "OutboxPath": self.outbox_path,
+            "OutboxFlushInterval": self.outbox_flush_interval,
+            "AITimeout": self.ai_timeout,
+            "AIChunkSize": self.ai_chunk_size,
+            "AIRetries": self.ai_retries,
+            "isAIStreamed": self.is_ai_streamed,
+            "isAICached": self.is_ai_cached,
+            "AICachePath": self.ai_cache_path
         }
 
         # Merge extra keys, letting known keys override if conflicts exist.
@@ -123,13 +223,48 @@ class KanjiInfo:
         return cls()
 
 
-@dataclass
+class Span(NamedTuple):
+    """Represents a run of text with an optional hex color and a semantic kind."""
+    text: str
+    color: Optional[str] = None
+    # One of: text, label, info, example, onyomi, kunyomi, tag.
+    kind: str = "text"
+
+
+# Styled text is an immutable sequence of spans, so renders can be cached.
+RichText = tuple[Span, ...]
+
+
+@lru_cache(maxsize=4096)
+def render_rich(spans: RichText) -> str:
+    """Render spans as Rich console markup."""
+    # Escape text so brackets in meanings are never read as markup.
+    return "".join(
+        f"[#{span.color}]{escape(span.text)}[/]" if span.color else escape(span.text) for span in spans
+    )
+
+
+@lru_cache(maxsize=4096)
+def render_html(spans: RichText) -> str:
+    """Render spans as HTML for Anki cards."""
+    # Text may already hold <a> links from the source page, so it is not escaped.
+    return "".join(
+        f'<span style="color:#{span.color}">{span.text}</span>' if span.color else span.text for span in spans
+    )
+
+
+def plain(spans: RichText) -> str:
+    """Return the text of spans without any styling."""
+    return "".join(span.text for span in spans)
+
+
+@dataclass(slots=True)
 class VocabItem:
     """Represents a single vocabulary entry."""
     vocab: str
-    furigana: str
-    meaning: str
-    tag: str
+    furigana: RichText
+    meaning: RichText
+    tag: RichText
 
 
 @dataclass
@@ -139,6 +274,9 @@ class ScrapePageResult:
     has_next: bool
     total_scraped: int
     kanji_info: Optional[KanjiInfo] = None
+    parse_time: float = 0.0
+    saved_time: float = 0.0
+    total_results: Optional[int] = None
 
 
 @dataclass
@@ -148,6 +286,57 @@ class PaginationResult:
     kanji_info: KanjiInfo
 
 
+@dataclass
+class PaginationStats:
+    """Represents request counts for one pagination run."""
+    pages: int = 0
+    launched: int = 0
+    requested: int = 0
+    wasted: int = 0
+    # Pages in the order they were handed out; None marks a page that failed its retries.
+    results: list[tuple[int, Optional[ScrapePageResult]]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        """Return a one-line request summary."""
+        # Keep the format short enough for a table caption.
+        return f"Requests: {self.requested} | Wasted: {self.wasted} | Fan-out: {self.launched}/{self.pages}"
+
+
+@dataclass
+class KeyStats:
+    """Represents usage and health of one API key, identified by its variable name."""
+    name: str
+    in_flight: int = 0
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    rate_limited: int = 0
+    quota_exhausted: int = 0
+    streak: int = 0
+    cooldown_until: float = 0.0
+
+    def summary(self) -> str:
+        """Return a one-line usage summary."""
+        # Never include the key itself, only its variable name.
+        return (
+            f"{self.name}: {self.successes}/{self.requests} ok | 429: {self.rate_limited} | "
+            f"402: {self.quota_exhausted} | Failed: {self.failures}"
+        )
+
+
+@dataclass
+class PreparedKanji:
+    """Represents everything fetched for a kanji before selection starts."""
+    kanji: str
+    items: list[VocabItem]
+    kanji_info: KanjiInfo
+    raw_svg: Optional[str]
+    loader: Optional[asyncio.Task]
+    stats: PaginationStats
+    timings: dict[str, float]
+    total_elapsed: float
+
+
 @dataclass
 class CLIArgs:
     """Represents parsed command-line arguments."""
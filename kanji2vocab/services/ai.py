@@ -1,8 +1,11 @@
 # file: kanji2vocab/services/ai.py
 import os
+import time
 import asyncio
 import openai
+from typing import AsyncIterator
 
+from ..models import KeyStats
 from .logger import Logger
 
 """
@@ -19,57 +22,150 @@ API_KEY_2 = "sdk3S-..."
 API_KEY_n = "thri@-..."
 ```
 """
-class APIKeyRotator:
-    """Cycles through a list of API keys stored in environment variables."""
-    def __init__(self, key_prefixes: list[int], logger: Logger, key_format: str = "API_KEY_{}") -> None:
-        # Store logger for warnings.
+class KeyScheduler:
+    """Spreads requests over every API_KEY_* key, steering around rate-limited and exhausted ones."""
+    def __init__(
+        self,
+        logger: Logger,
+        prefix: str = "API_KEY_",
+        quota_cooldown: float = 3600.0,
+        max_backoff: float = 60.0,
+        max_wait: float = 60.0,
+    ) -> None:
+        # Store logger and cooldown policy.
         self.logger = logger
-        # Build a list of available keys.
-        keys = [] # This is not where you put your keys.
-        for prefix in key_prefixes:
-            key_name = key_format.format(prefix)
-            key_value = os.getenv(key_name)
-            if key_value:
-                keys.append(key_value)
-            else:
-                self.logger.log(f"Warning: Environment variable {key_name} not found.", "w")
+        self.prefix = prefix
+        self.quota_cooldown = quota_cooldown
+        self.max_backoff = max_backoff
+        self.max_wait = max_wait
+        # Key values and per-key statistics, both by variable name.
+        self.keys: dict[str, str] = {}
+        self.stats: dict[str, KeyStats] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Load every non-empty API_KEY_* variable, keeping the statistics of known keys."""
+        # Order API_KEY_2 before API_KEY_10.
+        names = sorted(
+            (name for name, value in os.environ.items() if name.startswith(self.prefix) and value),
+            key=lambda name: (len(name), name),
+        )
 
         # Raise if no keys are available.
-        if not keys:
-            raise ValueError("No valid API keys were loaded.")
+        if not names:
+            raise ValueError(f"No valid API keys were loaded ({self.prefix}* not set).")
+
+        # Keep state for keys that are still there.
+        self.keys = {name: os.environ[name] for name in names}
+        self.stats = {name: self.stats.get(name) or KeyStats(name) for name in names}
+
+    async def acquire(self) -> str:
+        """Reserve the healthy key with the fewest requests in flight and return its name."""
+        while True:
+            # Prefer idle keys, then the least used.
+            now = time.monotonic()
+            healthy = [stats for stats in self.stats.values() if stats.cooldown_until <= now]
+            if healthy:
+                stats = min(healthy, key=lambda stats: (stats.in_flight, stats.requests))
+                stats.in_flight += 1
+                stats.requests += 1
+                return stats.name
+
+            # Every key is cooling down: wait for the first one unless that takes too long.
+            wait = min(stats.cooldown_until for stats in self.stats.values()) - now
+            if wait > self.max_wait:
+                raise RuntimeError(f"No API key available for another {wait:.0f}s ({self.summary()}).")
+            await asyncio.sleep(wait)
+
+    def release(self, name: str, error: BaseException | None = None) -> None:
+        """Return a key and record the outcome of its request."""
+        stats = self.stats[name]
+        stats.in_flight -= 1
+
+        # A cancelled or abandoned request says nothing about the key.
+        if isinstance(error, (asyncio.CancelledError, GeneratorExit)):
+            return
+        if error is None:
+            stats.successes += 1
+            stats.streak = 0
+            return
+        stats.failures += 1
 
-        # Store key list and index.
-        self.keys = keys
-        self.index = 0
+        # Rate limits back off exponentially unless the server says how long.
+        status = getattr(error, "status_code", None)
+        if status == 429:
+            stats.rate_limited += 1
+            stats.streak += 1
+            delay = _retry_after(error) or min(self.max_backoff, 2.0 ** stats.streak)
+            self._cool_down(stats, delay, "rate limited")
+        # Out of quota (402) or rejected (401/403): keep the key out for much longer.
+        elif status == 402:
+            stats.quota_exhausted += 1
+            self._cool_down(stats, self.quota_cooldown, "out of quota")
+        elif status in (401, 403):
+            self._cool_down(stats, self.quota_cooldown, "rejected")
 
-    def rotate(self) -> str:
-        """Rotate to the next key and return it."""
-        # Move index in a circular fashion.
-        self.index = (self.index + 1) % len(self.keys)
-        return self.keys[self.index]
+    def _cool_down(self, stats: KeyStats, delay: float, reason: str) -> None:
+        """Take a key out of rotation for delay seconds."""
+        stats.cooldown_until = max(stats.cooldown_until, time.monotonic() + delay)
+        self.logger.log(f"{stats.name} {reason}; cooling down for {delay:.0f}s.", "w")
 
-    def current(self) -> str:
-        """Return the current active key."""
-        # Return key at the current index.
-        return self.keys[self.index]
+    def summary(self) -> str:
+        """Return per-key usage statistics."""
+        return " || ".join(stats.summary() for stats in self.stats.values())
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """Return the Retry-After delay of an API error in seconds, if it has one."""
+    # Only the seconds form is honoured; dates fall back to the backoff.
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
 
 
 class AIClient:
-    """Handles AI chat requests with key rotation support."""
-    def __init__(self, key_rotator: APIKeyRotator, base_url: str | None, model: str | None, logger: Logger) -> None:
+    """Handles AI chat requests, each on a key chosen by the scheduler."""
+    def __init__(
+        self,
+        scheduler: KeyScheduler,
+        base_url: str | None,
+        model: str | None,
+        logger: Logger,
+        timeout: float = 120.0,
+    ) -> None:
         # Store dependencies and config.
-        self.key_rotator = key_rotator
+        self.scheduler = scheduler
         self.base_url = base_url
         self.model = model or ""
         self.logger = logger
+        # Per-request timeout in seconds; connecting gets a shorter one.
+        self.timeout = openai.Timeout(timeout, connect=min(10.0, timeout))
+        # One async client (and connection pool) per API key, created on first use.
+        self._clients: dict[str, openai.AsyncOpenAI] = {}
 
-    def rotate_key(self) -> str:
-        """Rotate API key and return the new key."""
-        # Rotate and return.
-        return self.key_rotator.rotate()
+    def _client(self, api_key: str) -> openai.AsyncOpenAI:
+        """Return the cached client for a key, creating it on first use."""
+        # Reuse the client so every key keeps its warm connections.
+        client = self._clients.get(api_key)
+        if client is None:
+            # The controller's own loop retries, so the SDK's retries would only stretch the timeout.
+            client = openai.AsyncOpenAI(
+                api_key=api_key, base_url=self.base_url or None, timeout=self.timeout, max_retries=0
+            )
+            self._clients[api_key] = client
+        return client
+
+    async def close(self) -> None:
+        """Close every client that was opened."""
+        # Release pooled connections.
+        await asyncio.gather(*(client.close() for client in self._clients.values()), return_exceptions=True)
+        self._clients.clear()
 
     async def request_chat(self, input_text: str, prompt: str = "") -> str | Exception:
-        """Send a chat completion request to the AI model."""
+        """Send a chat completion request to the AI model on the healthiest key."""
         # Return early if input is empty.
         if input_text == "":
             return "No input given"
@@ -77,23 +173,42 @@ class AIClient:
         # Build the final input with optional prompt.
         final_input = f"{prompt}\n---\n{input_text}" if prompt else input_text
 
-        # Build the OpenAI client creation parameters.
-        client_kwargs = {"api_key": self.key_rotator.current()}
-        if self.base_url:
-            client_kwargs["base_url"] = self.base_url
-
-        # Execute the request in a background thread.
-        def _call():
-            client = openai.OpenAI(**client_kwargs)
-            chat = client.chat.completions.create(
+        try:
+            # Await the request on a scheduled key's client.
+            name = await self.scheduler.acquire()
+        except Exception as e:
+            return e
+        try:
+            chat = await self._client(self.scheduler.keys[name]).chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": final_input}],
             )
-            return chat.choices[0].message.content
+        except BaseException as e:
+            # Record the outcome; return API errors for upstream handling.
+            self.scheduler.release(name, e)
+            if not isinstance(e, Exception):
+                raise
+            return e
+        self.scheduler.release(name)
+        return chat.choices[0].message.content
+
+    async def stream_chat(self, input_text: str, prompt: str = "") -> AsyncIterator[str]:
+        """Stream a chat completion, yielding content deltas; API errors are raised."""
+        # Build the final input with optional prompt.
+        final_input = f"{prompt}\n---\n{input_text}" if prompt else input_text
 
+        # Open the stream on a scheduled key's client; the key stays in flight until the stream ends.
+        name = await self.scheduler.acquire()
         try:
-            # Run the request in a thread to avoid blocking.
-            return await asyncio.to_thread(_call)
-        except Exception as e:
-            # Return the exception object for upstream handling.
-            return e
\ No newline at end of file
+            stream = await self._client(self.scheduler.keys[name]).chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": final_input}],
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except BaseException as e:
+            self.scheduler.release(name, e)
+            raise
+        self.scheduler.release(name)
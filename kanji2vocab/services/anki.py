@@ -1,83 +1,158 @@
 # file: kanji2vocab/services/anki.py
 import asyncio
-import requests
+import aiohttp
 import os
+import re
+import time
 import base64
+import hashlib
+from urllib.parse import urlparse
 from .logger import Logger
+from .outbox import AnkiOutbox
+from .utils import normalize_jp
+
+
+# First cloze of a card; the vocab template puts {VOCAB} there.
+_FIRST_CLOZE = re.compile(r"\{\{c1::(.*?)\}\}", re.DOTALL)
+
+# Prefix of every media file this app stores, so the media index stays small.
+MEDIA_PREFIX = "k2v_"
 
 
 class AnkiInteractor:
     """Low-level AnkiConnect interactor."""
-    def __init__(self, url: str = "http://localhost:8765", logger: Logger | None = None) -> None:
-        # Store URL and create a session for reuse.
+    def __init__(
+        self,
+        url: str = "http://localhost:8765",
+        logger: Logger | None = None,
+        timeout: float = 30.0,
+        max_concurrency: int = 1,
+        retries: int = 2,
+    ) -> None:
+        # Store URL and request policy.
         self.url = url
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.retries = retries
+        # AnkiConnect handles one request at a time on Anki's main thread.
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Single keep-alive session, created lazily inside the event loop.
+        self._session: aiohttp.ClientSession | None = None
         # Store logger for error reporting.
         self.logger = logger
         # self.error_handler = ErrorHandler(logger) # TODO: Refer to error/anki and test out all possible error and give all possible soltuins.
-    
-    async def invoke(self, action: str, **params):
-        """Send an action to AnkiConnect asynchronously."""
+
+    @property
+    def is_local(self) -> bool:
+        """Return True if AnkiConnect runs on this machine and can read local paths."""
+        return urlparse(self.url).hostname in ("localhost", "127.0.0.1", "::1")
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the persistent session, creating it on first use."""
+        # One pooled connection is all AnkiConnect can serve.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=1))
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session if it was opened."""
+        # Release the pooled connection.
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def invoke(self, action: str, *, timeout: float | None = None, **params):
+        """Send an action to AnkiConnect; ``timeout`` overrides the default for this call."""
         # Build the payload for AnkiConnect.
         payload = {
             "action": action,
             "version": 6,
             "params": params,
         }
+        limit = timeout if timeout is not None else self.timeout
 
-        # Perform the HTTP request in a background thread.
-        def _post():
-            response = self.session.post(self.url, json=payload)
-            if response.status_code != 200:
-                raise Exception(f"Anki::HTTP [ERR]: {response.status_code} when {response.text}")
-            data = response.json()
-            if "error" in data and data["error"] is not None:
-                raise Exception(f"Anki::Interactor [ERR]: {data['error']}")
-            return data["result"]
+        # Queue behind other calls; the timeout only covers the request itself.
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    session = self._get_session()
+                    async with session.post(
+                        self.url, json=payload, timeout=aiohttp.ClientTimeout(total=limit)
+                    ) as response:
+                        if response.status != 200:
+                            raise Exception(f"Anki::HTTP [ERR]: {response.status} when {await response.text()}")
+                        # AnkiConnect does not always send a JSON content type.
+                        data = await response.json(content_type=None)
+                    break
+                except aiohttp.ClientConnectorError as e:
+                    # Anki is not running; retrying will not help.
+                    raise Exception(f"Anki::Connection [ERR]: cannot reach {self.url}: {e}") from e
+                except (aiohttp.ServerDisconnectedError, aiohttp.ClientOSError, ConnectionResetError) as e:
+                    # A dropped keep-alive connection is reopened and the call retried.
+                    if attempt == self.retries:
+                        raise Exception(f"Anki::Connection [ERR]: {action} failed: {e}") from e
+                    if self.logger:
+                        self.logger.log(f"AnkiConnect connection reset, retrying {action}...", "w")
+                    await asyncio.sleep(0.1 * (attempt + 1))
+                except asyncio.TimeoutError as e:
+                    raise Exception(f"Anki::Timeout [ERR]: {action} took longer than {limit}s") from e
 
-        return await asyncio.to_thread(_post)
+        if "error" in data and data["error"] is not None:
+            raise Exception(f"Anki::Interactor [ERR]: {data['error']}")
+        return data["result"]
 
 
 class AnkiClient:
     """High-level Anki note creation helper."""
-    def __init__(self, interactor: AnkiInteractor, deck_name: str, logger: Logger) -> None:
+    def __init__(
+        self,
+        interactor: AnkiInteractor,
+        deck_name: str,
+        logger: Logger,
+        batch_size: int = 25,
+        outbox: AnkiOutbox | None = None,
+        flush_interval: float = 30.0,
+    ) -> None:
         # Store dependencies and deck name.
         self.interactor = interactor
         self.deck_name = deck_name
         self.logger = logger
+        # Notes sent per multi request.
+        self.batch_size = batch_size
+        # Normalized vocab of existing notes per (deck, model).
+        self.index: dict[tuple[str, str], set[str]] = {}
+        self._index_lock = asyncio.Lock()
+        # Optional durable outbox, drained in the background while Anki is away.
+        self.outbox = outbox
+        self.flush_interval = flush_interval
+        self._flusher: asyncio.Task | None = None
+        # Outbox ids add_notes is delivering itself, hidden from the flusher.
+        self._in_flight: set[int] = set()
+        # Names of our media files Anki already has, loaded on first upload.
+        self.media_names: set[str] | None = None
+        # storeMediaFile params of the media attached this run, by file name.
+        self.media_files: dict[str, dict] = {}
 
     def update_deck(self, deck_name: str) -> None:
         """Update the target deck name."""
         # Assign new deck name.
         self.deck_name = deck_name
 
-    async def add_note(self, fields: dict, model: str, audio_path=None, audio_field=None, tags: list[str] | None = None) -> bool:
-        """Create a note in Anki using AnkiConnect."""
+    def update_settings(self, deck_name: str | None = None, batch_size: int | None = None) -> None:
+        """Update deck and batching settings."""
+        # Apply only provided values.
+        if deck_name is not None:
+            self.update_deck(deck_name)
+        if batch_size is not None:
+            self.batch_size = max(1, batch_size)
+
+    def build_note(
+        self, fields: dict, model: str, tags: list[str] | None = None, media: list[dict] | None = None
+    ) -> dict:
+        """Build an addNote payload for the current deck; media is uploaded with the note."""
         # Validate fields presence.
         if not fields:
             raise ValueError("Should at least contain one field.")
 
-        # Original Code from: kanji2Immersion/request.py:
-        # ---- AUDIO HANDLING ----
-        if audio_path:
-            if not os.path.isfile(audio_path):
-                raise FileNotFoundError(f"Invalid audio file: {audio_path}")
-
-            filename = os.path.basename(audio_path)
-
-            with open(audio_path, "rb") as f:
-                audio_base64 = base64.b64encode(f.read()).decode("utf-8")
-
-            media_result = await self.anki_connect.invoke(
-                "storeMediaFile",
-                filename=filename,
-                data=audio_base64,
-            )
-
-            print("MEDIA RESULT:", media_result)
-
-            fields[audio_field] = f"[sound:{filename}]"
-
         # Build note payload.
         note = {
             "deckName": self.deck_name,
@@ -86,13 +161,273 @@ class AnkiClient:
             "tags": tags or ["Kanji2VocabCreation"],
             "options": {"allowDuplicate": False},
         }
+        # Notes carry only media file names, never sent as part of the note; the data is resolved per batch.
+        if media:
+            note["_media"] = [params["filename"] for params in media]
+            self.media_files.update((params["filename"], params) for params in media)
+        return note
+
+    def media_from_path(self, path: str, filename: str | None = None) -> dict:
+        """Describe a local file as storeMediaFile params, named by content hash unless given a name."""
+        # Hash the file without loading it whole.
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Invalid media file: {path}")
+        if filename is None:
+            with open(path, "rb") as f:
+                digest = hashlib.file_digest(f, "sha1").hexdigest()[:16]
+            filename = f"{MEDIA_PREFIX}{digest}{os.path.splitext(path)[1]}"
+
+        # A local Anki reads the file itself; a remote one needs the bytes.
+        if self.interactor.is_local:
+            return {"filename": filename, "path": os.path.abspath(path)}
+        with open(path, "rb") as f:
+            return {"filename": filename, "data": base64.b64encode(f.read()).decode("ascii")}
+
+    def media_from_data(self, data: bytes, extension: str, filename: str | None = None) -> dict:
+        """Describe in-memory content as storeMediaFile params, named by content hash unless given a name."""
+        # Name by content so identical files are stored once.
+        if filename is None:
+            filename = f"{MEDIA_PREFIX}{hashlib.sha1(data).hexdigest()[:16]}{extension}"
+        return {"filename": filename, "data": base64.b64encode(data).decode("ascii")}
+
+    async def load_index(self, model: str) -> None:
+        """Index the notes of the current deck and model once; later calls are no-ops."""
+        async with self._index_lock:
+            key = (self.deck_name, model)
+            if key in self.index:
+                return
+
+            try:
+                # Find the note ids, then read their fields in chunks.
+                query = f'deck:"{_quote(self.deck_name)}" note:"{_quote(model)}"'
+                note_ids = await self.interactor.invoke("findNotes", query=query)
+                vocab: set[str] = set()
+                for offset in range(0, len(note_ids), 500):
+                    infos = await self.interactor.invoke("notesInfo", notes=note_ids[offset : offset + 500])
+                    for info in infos:
+                        fields = sorted((info.get("fields") or {}).values(), key=lambda f: f.get("order", 0))
+                        if fields:
+                            vocab.add(note_key(fields[0].get("value", "")))
+            except Exception as e:
+                # Leave the key unindexed so the next call retries.
+                self.logger.log(f"Could not index existing notes: {str(e)}", "w")
+                return
+
+            vocab.discard("")
+            self.index[key] = vocab
+            self.logger.log(f"Indexed {len(vocab)} existing notes in {self.deck_name} ({model})", "i")
+
+    def existing_vocab(self, model: str) -> set[str]:
+        """Return the live set of normalized vocab already in the current deck and model."""
+        # Unindexed decks are treated as empty.
+        return self.index.get((self.deck_name, model), set())
+
+    def _remember(self, note: dict) -> None:
+        """Record an added note in the index of its deck and model."""
+        # Only indexed decks are kept up to date; others load fresh later.
+        indexed = self.index.get((note["deckName"], note["modelName"]))
+        if indexed is not None and note["fields"]:
+            indexed.add(note_key(next(iter(note["fields"].values()))))
+
+    async def add_note(self, fields: dict, model: str, audio_path=None, audio_field=None, tags: list[str] | None = None) -> bool | None:
+        """Create a note in Anki using AnkiConnect; None means it waits in the outbox."""
+        # Validate fields presence.
+        if not fields:
+            raise ValueError("Should at least contain one field.")
+
+        # Attach the audio file; it is uploaded in the same request as the note.
+        media = None
+        if audio_path:
+            audio = self.media_from_path(audio_path)
+            fields[audio_field] = f"[sound:{audio['filename']}]"
+            media = [audio]
 
+        # Build note payload and deliver it through the batched path.
+        note = self.build_note(fields, model, tags, media)
+        return (await self.add_notes([note]))[0]
+
+    async def add_notes(self, notes: list[dict]) -> list[bool | None]:
+        """Add prepared notes with one multi request per batch.
+
+        Returns per-note success; None means Anki was unreachable and the note waits in the outbox.
+        """
+        start = time.perf_counter()
+
+        # Persist every note, and each media file once, before the first delivery attempt.
+        ids = self.outbox.put(notes, self._attached_media(notes)) if self.outbox else []
+        self._in_flight.update(ids)
         try:
-            # Invoke AnkiConnect addNote.
-            result = await self.interactor.invoke("addNote", note=note)
-            # Return True if result exists.
-            return result is not None
-        except Exception as e:
-            # Log error and return False.
-            self.logger.log(f"An error occurred: {str(e)}", "f")
-            return False
\ No newline at end of file
+            return await self._deliver(notes, ids, start)
+        finally:
+            self._in_flight.difference_update(ids)
+
+    async def _deliver(self, notes: list[dict], ids: list[int], start: float) -> list[bool | None]:
+        """Send freshly queued notes and settle their outbox rows."""
+        results: list[bool | None] = []
+
+        # Send notes in chunks so one request never carries an unbounded payload.
+        for offset in range(0, len(notes), self.batch_size):
+            chunk = notes[offset : offset + self.batch_size]
+            try:
+                errors = await self._send(chunk)
+            except Exception as e:
+                # Anki is unreachable; the rest of the batch would fail the same way.
+                self.logger.log(f"An error occurred: {str(e)}", "f")
+                remaining = len(notes) - offset
+                if self.outbox:
+                    self.logger.log(f"{remaining} note(s) kept in the outbox until Anki responds", "w")
+                    self.start_flusher()
+                    results.extend([None] * remaining)
+                else:
+                    results.extend([False] * remaining)
+                break
+
+            # Report every note individually.
+            for error in errors:
+                if error:
+                    self.logger.log(f"Note rejected: {error}", "f")
+                results.append(error is None)
+            if self.outbox:
+                self.outbox.settle(_settled(ids[offset : offset + len(chunk)], errors))
+
+        # Log throughput for the whole batch once Anki has answered.
+        elapsed = time.perf_counter() - start
+        if any(result is not None for result in results):
+            rate = len(notes) / elapsed if elapsed else float("inf")
+            self.logger.log(
+                f"Anki: {sum(1 for r in results if r)}/{len(notes)} notes added in {elapsed:.2f}s ({rate:.1f} notes/s)", "i"
+            )
+        return results
+
+    async def _send(self, chunk: list[dict]) -> list[str | None]:
+        """Send one multi request; returns each note's error, None if added. Raises if Anki is unreachable."""
+        # Upload media Anki does not have yet ahead of the notes, in the same request.
+        media = await self._missing_media(chunk)
+        actions = [{"action": "storeMediaFile", "version": 6, "params": params} for params in media]
+        actions += [
+            {"action": "addNote", "version": 6, "params": {"note": {k: v for k, v in note.items() if k != "_media"}}}
+            for note in chunk
+        ]
+        # Each action answers with its own {"result", "error"} pair.
+        responses = await self.interactor.invoke("multi", actions=actions)
+
+        # Index the stored media; a failed upload leaves the note without it.
+        for params, response in zip(media, responses):
+            error = response.get("error") if isinstance(response, dict) else None
+            if error:
+                self.logger.log(f"Media {params['filename']} not stored: {error}", "w")
+            else:
+                self.media_names.add(params["filename"])
+
+        # Normalize note responses and index the added notes.
+        errors: list[str | None] = []
+        for note, response in zip(chunk, responses[len(media):]):
+            error = response.get("error") if isinstance(response, dict) else None
+            result = response.get("result") if isinstance(response, dict) else response
+            if error is None and result is None:
+                error = "Anki returned no note id"
+            if error is None:
+                self._remember(note)
+            errors.append(error)
+        return errors
+
+    def _attached_media(self, notes: list[dict]) -> list[dict]:
+        """Return the params of the media files notes name, once per file name."""
+        # Notes name media attached this run; its params are still in memory.
+        names = dict.fromkeys(name for note in notes for name in note.get("_media", ()))
+        return [self.media_files[name] for name in names if name in self.media_files]
+
+    async def _missing_media(self, chunk: list[dict]) -> list[dict]:
+        """Return the media of a chunk that Anki does not have, once per file name."""
+        # Collect attached media names, deduplicated.
+        wanted = dict.fromkeys(name for note in chunk for name in note.get("_media", ()))
+        if not wanted:
+            return []
+
+        # Load the names of our files already in Anki's media folder once.
+        if self.media_names is None:
+            self.media_names = set(await self.interactor.invoke("getMediaFilesNames", pattern=f"{MEDIA_PREFIX}*"))
+        missing = [name for name in wanted if name not in self.media_names]
+
+        # Resolve the data: media of this run is in memory, media queued by an earlier run is in the outbox.
+        queued = self.outbox.media([name for name in missing if name not in self.media_files]) if self.outbox else {}
+        media = []
+        for name in missing:
+            params = self.media_files.get(name) or queued.get(name)
+            if params is None:
+                self.logger.log(f"Media {name} is no longer available; the note is sent without it", "w")
+            else:
+                media.append(params)
+        return media
+
+    async def flush(self, include_rejected: bool = False) -> tuple[int, int]:
+        """Deliver queued outbox notes in batches; returns (added, rejected). Raises if Anki is unreachable."""
+        added = rejected = 0
+        after_id = 0
+        if not self.outbox:
+            return added, rejected
+
+        # Walk the queue oldest first; rejected notes stay behind the cursor.
+        while rows := self.outbox.pending(self.batch_size, after_id, include_rejected):
+            after_id = rows[-1][0]
+            rows = [(note_id, note) for note_id, note in rows if note_id not in self._in_flight]
+            if not rows:
+                continue
+            ids = [note_id for note_id, _ in rows]
+            errors = await self._send([note for _, note in rows])
+            self.outbox.settle(_settled(ids, errors))
+            added += sum(1 for error in errors if error is None or _is_duplicate(error))
+            rejected += sum(1 for error in errors if error is not None and not _is_duplicate(error))
+        return added, rejected
+
+    def start_flusher(self) -> None:
+        """Start draining the outbox in the background if it is not already running."""
+        # One flusher at a time.
+        if self.outbox and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        """Retry the outbox every flush_interval seconds until no deliverable note is left."""
+        # Notes a running add_notes call is sending are not ours to wait for.
+        while self.outbox.count(exclude=self._in_flight):
+            try:
+                added, rejected = await self.flush()
+            except Exception:
+                # Anki is still away; try again later.
+                added = rejected = 0
+            if added or rejected:
+                self.logger.log(f"Outbox: {added} queued note(s) delivered, {rejected} rejected", "s")
+
+            # Always yield between passes, so a pass that sent nothing cannot spin the event loop.
+            await asyncio.sleep(self.flush_interval)
+
+    async def close(self) -> None:
+        """Stop the background flusher; queued notes stay on disk."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+
+
+def note_key(value: str) -> str:
+    """Return the normalized vocab of a first field, taken from its first cloze if any."""
+    # Vocab cards keep the word in {{c1::...}}; other models use the whole field.
+    match = _FIRST_CLOZE.search(value)
+    return normalize_jp(match.group(1) if match else value).strip()
+
+
+def _quote(value: str) -> str:
+    """Escape a value for a double-quoted Anki search term."""
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+
+def _is_duplicate(error: str) -> bool:
+    """Return True if AnkiConnect rejected a note as a duplicate."""
+    return "duplicate" in error
+
+
+def _settled(ids: list[int], errors: list[str | None]) -> list[tuple[int, str | None]]:
+    """Pair outbox ids with their outcome; duplicates count as delivered."""
+    # A duplicate is already in Anki, so there is nothing left to retry.
+    return [(note_id, None if error is not None and _is_duplicate(error) else error) for note_id, error in zip(ids, errors)]
@@ -0,0 +1,131 @@
+# file: kanji2vocab/services/cache.py
+import os
+import time
+import zlib
+import sqlite3
+
+
+class PageCache:
+    """Persistent, compressed page cache with TTL and LRU size eviction."""
+    def __init__(self, path: str, ttl: float = 604800, max_bytes: int = 64 * 1024 * 1024) -> None:
+        # Store cache location and limits.
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Track lookup statistics for this process.
+        self.hits = 0
+        self.misses = 0
+
+        # Create the parent directory if needed.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Open the database and ensure the schema exists.
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed_at)")
+
+        # Drop what expired since the last run, then keep a running byte total.
+        self.conn.execute("DELETE FROM pages WHERE stored_at < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        # LRU timestamps of hits, written with the next put or on close.
+        self._touched: dict[str, float] = {}
+
+    def get(self, url: str) -> bytes | None:
+        """Return the cached body for a URL, or None if missing or expired."""
+        # Look up the entry.
+        row = self.conn.execute(
+            "SELECT body, size, stored_at FROM pages WHERE url = ?", (url,)
+        ).fetchone()
+
+        # Count a miss for absent or expired entries; the delete is committed with the next write.
+        now = time.time()
+        if row is None or now - row[2] > self.ttl:
+            if row is not None:
+                self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self.total_bytes -= row[1]
+                self._touched.pop(url, None)
+            self.misses += 1
+            return None
+
+        # Remember the hit for the LRU order and return the decompressed body.
+        self._touched[url] = now
+        self.hits += 1
+        return zlib.decompress(row[0])
+
+    def put(self, url: str, body: bytes) -> None:
+        """Store a body for a URL and evict least recently used entries."""
+        # Compress the body before writing.
+        blob = zlib.compress(body, 6)
+        now = time.time()
+
+        # Replace any previous entry, keeping the byte total in step.
+        previous = self.conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+        if previous is not None:
+            self.total_bytes -= previous[0]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pages (url, body, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (url, blob, len(blob), now, now),
+        )
+        self.total_bytes += len(blob)
+        self._touched.pop(url, None)
+
+        # Write pending hits so eviction sees the real LRU order, then commit once.
+        self._write_touched()
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+        self.conn.commit()
+
+    def _write_touched(self) -> None:
+        """Write the buffered LRU timestamps in one statement."""
+        # Nothing to do without hits since the last write.
+        if not self._touched:
+            return
+        self.conn.executemany(
+            "UPDATE pages SET accessed_at = ? WHERE url = ?", [(at, url) for url, at in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the oldest ones until under max_bytes."""
+        # Remove expired entries first.
+        cutoff = time.time() - self.ttl
+        expired = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM pages WHERE stored_at < ?", (cutoff,)
+        ).fetchone()[0]
+        if expired:
+            self.conn.execute("DELETE FROM pages WHERE stored_at < ?", (cutoff,))
+            self.total_bytes -= expired
+
+        # Walk from least recently used while the cache is too large.
+        if self.total_bytes <= self.max_bytes:
+            return
+        for url, size in self.conn.execute(
+            "SELECT url, size FROM pages ORDER BY accessed_at ASC"
+        ).fetchall():
+            self.conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self.total_bytes -= size
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def stats(self) -> str:
+        """Return a short hit/miss summary."""
+        # Compute the hit ratio for this process.
+        lookups = self.hits + self.misses
+        ratio = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}%)"
+
+    def close(self) -> None:
+        """Write pending hits and close the underlying database."""
+        # Keep this run's LRU order for the next one.
+        self._write_touched()
+        self.conn.commit()
+
+        # Release the SQLite connection.
+        self.conn.close()
@@ -0,0 +1,172 @@
+# file: kanji2vocab/services/cards.py
+import re
+from string import Formatter as _StringFormatter
+from typing import Any, Iterable
+
+from ..models import KanjiInfo, VocabItem, plain, render_html
+from .utils import strip_prefix
+
+
+# Shared str.format machinery, so compiled templates behave exactly like str.format.
+_STRING_FORMATTER = _StringFormatter()
+
+# Patterns used for every card, compiled once.
+_NUMBERING = re.compile(r"(\d+\.)")
+_PARENS = re.compile(r"\(([^)]*)\)")
+_SECTIONS = [
+    (re.compile(r"(\[Semantic\])\s+(.+)", re.DOTALL), r'<p style="color:red;text-shadow: #ff0000aa 0 0 25px">\1<br>\2</p>'),
+    (re.compile(r"(\[Context\])\s+(.+)", re.DOTALL), r'<p style="color:#ff00ff;text-shadow: #ff00ffaa 0 0 25px">\1<br>\2</p>'),
+    (re.compile(r"(\[Component\])\s+(.+)", re.DOTALL), r'<p style="color:lime;text-shadow: #00ff00aa 0 0 25px">\1<br>\2</p>'),
+]
+_CENSOR_LETTERS = "XYZABCDEFGHIJKLMNOPQRSTUVW"
+_FIELD_ROOT = re.compile(r"[^.\[]*")
+
+
+class CompiledTemplate:
+    """A str.format template parsed once into literal and field segments."""
+    def __init__(self, template: str, segments: list[tuple[str, str | None, str, str | None]] | None = None) -> None:
+        # Keep the source for change detection.
+        self.template = template
+        # Parse the template unless pre-bound segments are given.
+        self.segments = segments if segments is not None else list(_STRING_FORMATTER.parse(template))
+
+        # Specs are applied as written, so a nested field like {MEANING:{WIDTH}} would never be filled.
+        for _, field_name, format_spec, _ in self.segments:
+            if format_spec and "{" in format_spec:
+                raise ValueError(
+                    f"Template field {{{field_name}:{format_spec}}} uses a nested format spec, "
+                    f"which is not supported; write the spec literally, e.g. {{{field_name}:>10}}."
+                )
+
+    def bind(self, **fields: Any) -> "CompiledTemplate":
+        """Return a copy with the given fields folded into the literal text."""
+        # Merge bound values into the surrounding literals.
+        segments: list[tuple[str, str | None, str, str | None]] = []
+        pending = ""
+        for literal, field_name, format_spec, conversion in self.segments:
+            pending += literal
+            if field_name is not None and _root(field_name) in fields:
+                pending += _format_field(field_name, format_spec, conversion, fields)
+            elif field_name is not None:
+                segments.append((pending, field_name, format_spec, conversion))
+                pending = ""
+        segments.append((pending, None, "", None))
+        return CompiledTemplate(self.template, segments)
+
+    def render(self, **fields: Any) -> str:
+        """Fill the remaining fields; raises KeyError like str.format on missing ones."""
+        # Join literals and formatted fields in one pass.
+        parts = []
+        for literal, field_name, format_spec, conversion in self.segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(_format_field(field_name, format_spec, conversion, fields))
+        return "".join(parts)
+
+
+class CardRenderer:
+    """Renders vocab and kanji cards from templates compiled once."""
+    def __init__(self, template: str, template_kanji: str) -> None:
+        # Compile both templates.
+        self.template = CompiledTemplate(template)
+        self.template_kanji = CompiledTemplate(template_kanji)
+
+    def update_templates(self, template: str, template_kanji: str) -> None:
+        """Recompile the templates if the config changed them."""
+        # Skip the parse when nothing changed.
+        if template != self.template.template:
+            self.template = CompiledTemplate(template)
+        if template_kanji != self.template_kanji.template:
+            self.template_kanji = CompiledTemplate(template_kanji)
+
+    def bind_kanji(self, kanji: str, kanji_info: KanjiInfo, stroke: str | None) -> CompiledTemplate:
+        """Pre-bind the fields shared by every vocab card of a kanji."""
+        # Everything kanji-level is formatted once per kanji.
+        return self.template.bind(
+            KANJI=kanji,
+            KANJI_ONYOMI=" " + strip_prefix(kanji_info.onyomi, "On:"),
+            KANJI_KUNYOMI=" " + strip_prefix(kanji_info.kunyomi, "Kun:"),
+            KANJI_MEANING=kanji_info.meaning,
+            STROKE=stroke or "",
+        )
+
+    def render_vocab(self, bound: CompiledTemplate, item: VocabItem, explanation: str) -> str:
+        """Render one vocab card from a kanji-bound template."""
+        # Format meaning with line breaks before numbering.
+        formatted_meaning = _NUMBERING.sub(r"<br>\1", render_html(item.meaning))
+
+        # Build final meaning with the colorized AI content, censoring the vocab itself.
+        updated_meaning = formatted_meaning + "<br><br>" + self.format_explanation_sections(explanation)
+        updated_meaning = self.censor_vocab(updated_meaning, item.vocab)
+
+        # Fill the per-card fields.
+        return bound.render(
+            VOCAB=r"{{c1::" + self.color_vocab_by_verb_type(item.vocab, plain(item.meaning)) + r"}}",
+            MEANING=r"{{c2::" + updated_meaning + r"}}",
+            FURIGANA=r"{{c1::" + render_html(item.furigana) + r"}}",
+            TAG=render_html(item.tag),
+        )
+
+    def render_batch(
+        self,
+        kanji: str,
+        kanji_info: KanjiInfo,
+        stroke: str | None,
+        items: Iterable[VocabItem],
+        explanations: Iterable[str],
+    ) -> list[str]:
+        """Render the cards for a whole selection of one kanji."""
+        # Bind the kanji-level fields once for the batch.
+        bound = self.bind_kanji(kanji, kanji_info, stroke)
+        return [self.render_vocab(bound, item, explanation) for item, explanation in zip(items, explanations)]
+
+    def render_kanji(self, kanji: str, kanji_info: KanjiInfo) -> str:
+        """Render the kanji card."""
+        # Fill the kanji template.
+        return self.template_kanji.render(
+            KANJI=kanji,
+            MEANING=kanji_info.meaning,
+            ONYOMI=" " + strip_prefix(kanji_info.onyomi, "On:"),
+            KUNYOMI=" " + strip_prefix(kanji_info.kunyomi, "Kun:"),
+            INFO=kanji_info.info,
+        )
+
+    def format_explanation_sections(self, explanation: str) -> str:
+        """Apply HTML color styles to AI explanation sections."""
+        # Colorize [Semantic], [Context] and [Component] sections in order.
+        for pattern, replacement in _SECTIONS:
+            explanation = pattern.sub(replacement, explanation)
+        return explanation
+
+    def censor_vocab(self, text: str, vocab: str) -> str:
+        """Replace occurrences of vocab with a fixed placeholder sequence."""
+        # A literal replace, one placeholder letter per character.
+        return text.replace(vocab, _CENSOR_LETTERS[: len(vocab)]) if vocab else text
+
+    def color_vocab_by_verb_type(self, vocab: str, meaning: str) -> str:
+        """Color the last character based on v5/v1 tags in the plain meaning text."""
+        # Check the last parenthetical group; plain text has no markup to match by accident.
+        if not vocab:
+            return vocab
+        parens = _PARENS.findall(meaning)
+        last_par = parens[-1].lower() if parens else ""
+
+        # Apply coloring based on verb type.
+        if "v5" in last_par:
+            return vocab[:-1] + f'<span style="color:cyan">{vocab[-1]}</span>'
+        if "v1" in last_par:
+            return vocab[:-1] + f'<span style="color:red">{vocab[-1]}</span>'
+        return vocab
+
+
+def _root(field_name: str) -> str:
+    """Return the argument name of a field like "NAME.attr" or "NAME[0]"."""
+    return _FIELD_ROOT.match(field_name).group(0)
+
+
+def _format_field(field_name: str, format_spec: str, conversion: str | None, fields: dict[str, Any]) -> str:
+    """Format one field the way str.format would."""
+    # Resolve, convert and format the value.
+    value, _ = _STRING_FORMATTER.get_field(field_name, (), fields)
+    value = _STRING_FORMATTER.convert_field(value, conversion)
+    return _STRING_FORMATTER.format_field(value, format_spec)
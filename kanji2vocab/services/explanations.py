@@ -0,0 +1,155 @@
+# file: kanji2vocab/services/explanations.py
+import os
+import re
+import time
+import sqlite3
+
+
+# A "# <vocab>" heading starts each section of an AI response.
+_HEADING = re.compile(r"^#\s*([^\n]+)", re.MULTILINE)
+
+
+def split_sections(response: str) -> dict[str, str]:
+    """Split an AI response into per-vocab sections, each starting at its heading."""
+    # Find every heading; text before the first one is preamble.
+    matches = list(_HEADING.finditer(response))
+
+    # Each section runs up to the next heading; a repeated vocab keeps its first section.
+    sections: dict[str, str] = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(response)
+        sections.setdefault(match.group(1).strip(), response[match.start() : end].strip())
+    return sections
+
+
+def explanation_text(vocab: str, section: str) -> str:
+    """Return the card text of a section; a bare heading for a vocab the AI skipped gives none."""
+    # The placeholder only repeats the vocab, which the card would censor into a hint.
+    return "" if section.strip() == f"# {vocab}" else section.lstrip("#").strip()
+
+
+class SectionParser:
+    """Cuts a streamed AI response into raw sections as soon as each one is closed."""
+    def __init__(self) -> None:
+        # Text received but not yet emitted, and how far it was searched for a next heading.
+        self._buffer = ""
+        self._scanned = 0
+
+    def feed(self, text: str) -> list[str]:
+        """Add streamed text and return every section closed by a following heading."""
+        # Append the new chunk to the pending text.
+        self._buffer += text
+        finished = []
+
+        # Anything before the first heading is preamble; a section ends where the next heading line starts.
+        while (start := _heading_start(self._buffer, 0)) != -1:
+            # Resume the search for the next heading where the last chunk left off.
+            end = _heading_start(self._buffer, max(start + 1, self._scanned))
+            if end == -1:
+                # The section is still open; keep it and remember how far it was searched.
+                self._buffer = self._buffer[start:]
+                self._scanned = len(self._buffer)
+                break
+
+            # Emit the closed section and continue from the heading that closed it.
+            finished.append(self._buffer[start:end].strip())
+            self._buffer = self._buffer[end:]
+            self._scanned = 0
+        return finished
+
+    def close(self) -> list[str]:
+        """Return the last section once the stream has ended."""
+        # Whatever follows the last heading is the final section; preamble alone is dropped.
+        start = _heading_start(self._buffer, 0)
+        rest = self._buffer[start:].strip() if start != -1 else ""
+
+        # Reset so the parser can be reused for another stream.
+        self._buffer = ""
+        self._scanned = 0
+        return [rest] if rest else []
+
+
+def _heading_start(text: str, pos: int) -> int:
+    """Return the index of the first line starting with "#" at or after pos, or -1."""
+    # Line starts are the text start and every position after a newline.
+    if pos == 0 and text.startswith("#"):
+        return 0
+
+    # Search one character back so a newline just before pos still counts.
+    index = text.find("\n#", max(0, pos - 1))
+    return index + 1 if index != -1 else -1
+
+
+class ExplanationCache:
+    """Persistent per-vocab AI explanations keyed by vocab, model and prompt hash."""
+    def __init__(self, path: str) -> None:
+        # Store cache location.
+        self.path = path
+        # Track lookup statistics for this process.
+        self.hits = 0
+        self.misses = 0
+        self.saved_tokens = 0
+
+        # Create the parent directory if needed.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Open the database and ensure the schema exists.
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "vocab TEXT NOT NULL, model TEXT NOT NULL, prompt_hash TEXT NOT NULL, "
+            "body TEXT NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (vocab, model, prompt_hash))"
+        )
+        self.conn.commit()
+
+    def get_many(self, vocab_list: list[str], model: str, prompt_hash: str) -> dict[str, str]:
+        """Return cached sections for the given vocab and count hits and misses."""
+        # Deduplicate while keeping the request order.
+        unique = list(dict.fromkeys(vocab_list))
+
+        # Look every vocab up in one query.
+        placeholders = ",".join("?" * len(unique))
+        rows = self.conn.execute(
+            f"SELECT vocab, body FROM explanations WHERE model = ? AND prompt_hash = ? AND vocab IN ({placeholders})",
+            (model, prompt_hash, *unique),
+        ).fetchall() if unique else []
+        found = dict(rows)
+
+        # Count per requested vocab; a hit saves roughly the section's output tokens.
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        self.saved_tokens += sum(estimate_tokens(body) for body in found.values())
+        return found
+
+    def put_many(self, sections: dict[str, str], model: str, prompt_hash: str) -> None:
+        """Store sections for a model and prompt hash."""
+        # Write the batch in one transaction.
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO explanations (vocab, model, prompt_hash, body, stored_at) VALUES (?, ?, ?, ?, ?)",
+                [(vocab, model, prompt_hash, body, now) for vocab, body in sections.items()],
+            )
+
+    def stats(self) -> str:
+        """Return a short hit/miss summary with estimated saved tokens."""
+        # Compute the hit ratio for this process.
+        lookups = self.hits + self.misses
+        ratio = (self.hits / lookups * 100) if lookups else 0.0
+        return f"{self.hits} hits / {self.misses} misses ({ratio:.0f}%), ~{self.saved_tokens} tokens saved"
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        # Release the SQLite connection.
+        self.conn.close()
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate tokens: about 4 characters each for ASCII, 1 for other characters."""
+    # Count ASCII characters, which share tokens.
+    ascii_chars = sum(1 for char in text if char.isascii())
+
+    # Kana and kanji usually cost about one token per character.
+    return ascii_chars // 4 + (len(text) - ascii_chars)
@@ -1,233 +1,436 @@
 # file: kanji2vocab/services/formatter.py
 import re
-from bs4 import BeautifulSoup
 from typing import Iterable, Optional
 
-from ..models import KanjiInfo
+from ..models import KanjiInfo, RichText, Span
+from .logger import Logger
+
+
+# Tag shortenings, combined into one alternation; each alternative has one group.
+_TAG_PATTERN = re.compile(r"\bJLPT N(\d+)\b|\bWanikani level (\d+)\b|\b(Common word)\b")
+_TAG_PREFIXES = ("N", "WN", None)
+
+# Built-in meaning labels: long label -> short label, or [short label, hex color].
+_MEANING_RULES: dict[str, str | list[str]] = {
+    "Adverb (fukushi)": ["adv", "00ff7f"],
+    "Noun which may take the genitive case particle 'no'": "adjの",
+    "Noun": "n",
+    "Suru verb": ["vする", "216bd6"],
+    "Transitive verb": "vt",
+    "Intransitive verb": "vi",
+    "Ichidan verb": ["v1", "ff0000"],
+    "Godan verb": ["v5", "00ffff"],
+    "Na-adjective (keiyodoshi)": ["adjな", "ff00ff"],
+    "I-adjective (keiyoushi)": ["adjい", "00ff00"],
+    "Wikipedia definition": ["wk", "c0c0c0"],
+    "Expressions (phrases, clauses, etc.)": ["exp", "6a5acd"],
+    "(Other forms)": ["alt", "708090"],
+    "Conjunction": "conj",
+    "------": "-------",
+    "Usually written using kana alone , usu. as": ["KANA usu. AS:", "ff1493"],
+    "Usually written using kana alone , as": ["KANA AS:", "ff1493"],
+    "Usually written using kana alone": ["KANA", "ff1493"],
+    "Antonym:": "ANT:",
+    "esp.": "ESP:",
+    "Auxiliary verb": ["v-AUX", "ff0094"],
+    "after the -masu stem of a verb": ["v-ます", "ff0094"],
+    "after the -te form of a verb": ["v-て", "ff0094"],
+}
+
+# A rule color is a 3 or 6 digit hex code without the "#".
+_HEX_COLOR = re.compile(r"[0-9a-fA-F]{3}(?:[0-9a-fA-F]{3})?")
+
+# Short runs (labels, brackets, joiners) repeat across entries, so they share one Span.
+_SHARED_MAX_LEN = 8
+_SHARED_LIMIT = 4096
+_shared_spans: dict[tuple[str, str | None, str], Span] = {}
+
+# Colored spans pass through meaning shortening as private-use marker characters:
+# a lead character, then one code per (color, kind) style or the shared closing code.
+# Markers are not whitespace or commas, so strip() and split(",") treat them like HTML tags.
+_MARKER = "\uf8fe"
+_MARKER_BASE = 0xE000
+_CLOSE = _MARKER + "\uf8ff"
+# Separates senses while a whole meaning is shortened as one string.
+_SENSE = "\uf8fd"
+_marker_styles: dict[str, tuple[str | None, str]] = {}
+_style_markers: dict[tuple[str, str, bool], str] = {}
+# Codes of colored info styles (the 【 】 brackets) that switch plain text between the text and info kinds.
+_switch_codes: set[str] = set()
+# Styles of unmarked text, compared by identity while decoding.
+_PLAIN = (None, "text")
+_PLAIN_INFO = (None, "info")
+# Marked text of short colored input spans, such as the info brackets.
+_span_marks: dict[Span, str] = {}
+# Decoded short colored runs (labels, brackets) by their marked text, with their style and switch.
+_colored_runs: dict[str, tuple[Span, tuple[str, str], bool]] = {}
+
+# Katakana to hiragana, applied with str.translate.
+_KATA_TO_HIRA = str.maketrans({chr(c): chr(c - 0x60) for c in range(ord("ァ"), ord("ヶ") + 1)})
+
+
+class ReadingMatcher:
+    """Colors onyomi/kunyomi readings in furigana with one precompiled regex."""
+    def __init__(self, onyomi: str, kunyomi: str) -> None:
+        # Split the readings the same way the kanji block prints them.
+        onyomi_list = [r.replace("On:", "").strip() for r in onyomi.split("、")] if onyomi else []
+        kunyomi_list = [r.replace("Kun:", "").replace("-", "").strip() for r in kunyomi.split("、")] if kunyomi else []
+
+        # Map hiragana forms to colored spans; onyomi win when both spell the same.
+        self.replacements: dict[str, Span] = {}
+        for kunyomi_reading in kunyomi_list:
+            self.replacements[kunyomi_reading.translate(_KATA_TO_HIRA)] = Span(kunyomi_reading, "ffff00", "kunyomi")
+        for onyomi_reading in onyomi_list:
+            self.replacements[onyomi_reading.translate(_KATA_TO_HIRA)] = Span(onyomi_reading, "00aaff", "onyomi")
+        self.replacements.pop("", None)
+
+        # Longest readings first, so きょう is not split by a shorter きょ match.
+        readings = sorted(self.replacements, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, readings))) if readings else None
+
+    def color(self, value: str) -> RichText:
+        """Color every reading in one pass; colored text is never matched again."""
+        if self.pattern is None:
+            return (Span(value),)
+
+        # Emit plain runs between matches and the reading spans themselves.
+        spans: list[Span] = []
+        position = 0
+        for match in self.pattern.finditer(value):
+            if match.start() > position:
+                spans.append(_span(value[position:match.start()]))
+            spans.append(self.replacements[match.group(0)])
+            position = match.end()
+        if position < len(value):
+            spans.append(_span(value[position:]))
+        return tuple(spans)
 
 
 class Formatter:
-    """Provides utilities for meaning/tag formatting and color conversions."""
-    def color_span(self, text: str, hex_color: str) -> str:
-        """Wrap text in an HTML span with a color tag."""
-        # Build a consistent HTML span marker for later conversion.
-        return f'<span id="k2v-colored" style="color:#{hex_color}">{text}</span>'
-
-    def color_to_rich(self, text: str) -> str:
-        """Convert HTML color spans to Rich markup."""
-        # Define pattern for our custom HTML span.
-        pattern = r'<span id="k2v-colored" style="color:#(\w{6})">(.*?)<\/span>'
-        # Replace with Rich markup syntax.
-        return re.sub(pattern, r'[#\1]\2[/]', text, flags=re.DOTALL | re.IGNORECASE)
+    """Provides utilities for meaning/tag formatting and reading colors."""
+    def __init__(self, meaning_rules: dict[str, str | list[str]] | None = None, logger: Logger | None = None) -> None:
+        # Store logger for reporting bad config rules.
+        self.logger = logger
+        # Reading matchers, built once per kanji's readings.
+        self._matchers: dict[tuple[str, str], ReadingMatcher] = {}
+        # Tag spans per tag string; entries repeat a handful of combinations.
+        self._tag_spans: dict[str, RichText] = {}
+        # Compile the meaning rule engine once.
+        self._extra_rules: dict[str, str | list[str]] | None = None
+        self.update_rules(meaning_rules or {})
+
+    def update_rules(self, meaning_rules: dict[str, str | list[str]]) -> None:
+        """Recompile the meaning rules with extra rules from config (MeaningRules)."""
+        # Skip the rebuild when nothing changed.
+        if meaning_rules == self._extra_rules:
+            return
+        self._extra_rules = dict(meaning_rules)
+
+        # Resolve replacements up front; valid config rules override built-ins.
+        # Plain replacements take the color of the text around them, so they carry no markers.
+        self._meaning_map: dict[str, str] = {}
+        for rules in (_MEANING_RULES, meaning_rules):
+            for label, short in rules.items():
+                replacement = self._resolve_rule(label, short)
+                if replacement is not None:
+                    text, color, kind = replacement
+                    self._meaning_map[label] = text if color is None else _open_marker(color, kind) + text + _CLOSE
+
+        # Alternatives are tried in order, so longest-first gives longest-match semantics.
+        labels = sorted(self._meaning_map, key=len, reverse=True)
+        # The group makes split() return each label between the text around it.
+        self._meaning_pattern = re.compile("(" + "|".join(map(re.escape, labels)) + ")")
+
+    def _resolve_rule(self, label, short) -> tuple[str, str | None, str] | None:
+        """Turn one rule into its (text, color, kind) replacement; malformed rules are logged and skipped."""
+        # A rule is "short text" or ["short text", "hex color"]; uncolored text has no style of its own.
+        if isinstance(label, str) and label:
+            if isinstance(short, str):
+                return short, None, "text"
+            if (
+                isinstance(short, (list, tuple))
+                and len(short) == 2
+                and all(isinstance(part, str) for part in short)
+                and _HEX_COLOR.fullmatch(short[1])
+            ):
+                return short[0], short[1], "label"
+
+        # Config is hand-edited, so a typo must not stop the reload.
+        if self.logger:
+            self.logger.log(
+                f'Ignoring MeaningRules entry {label!r}: {short!r} (expected "text" or ["text", "hex color"])', "w"
+            )
+        return None
 
     def shortify_tag(self, tag: str) -> str:
         """Shorten known tag phrases (e.g., JLPT N5 -> N5)."""
-        # Define regex replacements for tag shortening.
-        patterns = [
-            (r"\bJLPT N(\d+)\b", r"N\1"),
-            (r"\bWanikani level (\d+)\b", r"WN\1"),
-            (r"\bCommon word\b", "CMN"),
-        ]
-        # Apply all replacements in order.
-        for pattern, replacement in patterns:
-            tag = re.sub(pattern, replacement, tag)
-        # Return trimmed tag.
-        return tag.strip()
-
-    def shortify_meaning(self, meanings: Iterable[str] | str) -> str:
+        # Replace every known phrase in one scan.
+        return _TAG_PATTERN.sub(self._short_tag, tag).strip()
+
+    def tag_spans(self, tags: str) -> RichText:
+        """Split a joined tag string into one "tag" span per tag."""
+        # Reuse the spans of a tag string seen before.
+        spans = self._tag_spans.get(tags)
+        if spans is None:
+            parts: list[Span] = []
+            for tag in tags.split(", ") if tags else ():
+                if parts:
+                    parts.append(_span(", "))
+                parts.append(_span(tag, None, "tag"))
+            spans = self._tag_spans[tags] = tuple(parts)
+        return spans
+
+    def _short_tag(self, match: re.Match) -> str:
+        """Return the short form for a matched tag phrase."""
+        # The matched alternative is the one whose group is set.
+        index = match.lastindex - 1
+        prefix = _TAG_PREFIXES[index]
+        return "CMN" if prefix is None else prefix + match.group(index + 1)
+
+    def shortify_meaning(self, meanings: Iterable[RichText]) -> RichText:
         """Shorten meaning labels and format with numbering."""
-        # Normalize input into a list of strings.
-        if isinstance(meanings, str):
-            meaning_list = [meanings]
-        else:
-            meaning_list = list(meanings)
-
-        # Replace semicolons with commas.
-        meaning_list = [m.replace(";", ",") for m in meaning_list]
-
-        # Mapping of long labels to short labels.
-        pattern_map = {
-            "Adverb (fukushi)": self.color_span("adv", "00ff7f"),
-            "Noun which may take the genitive case particle 'no'": "adjの",
-            "Noun": "n",
-            "Suru verb": self.color_span("vする", "216bd6"),
-            "Transitive verb": "vt",
-            "Intransitive verb": "vi",
-            "Ichidan verb": self.color_span("v1", "ff0000"),
-            "Godan verb": self.color_span("v5", "00ffff"),
-            "Na-adjective (keiyodoshi)": self.color_span("adjな", "ff00ff"),
-            "I-adjective (keiyoushi)": self.color_span("adjい", "00ff00"),
-            "Wikipedia definition": self.color_span("wk", "c0c0c0"),
-            "Expressions (phrases, clauses, etc.)": self.color_span("exp", "6a5acd"),
-            "(Other forms)": self.color_span("alt", "708090"),
-            "Conjunction": "conj",
-            "------": "-------",
-            "Usually written using kana alone , usu. as": self.color_span("KANA usu. AS:", "ff1493"),
-            "Usually written using kana alone , as": self.color_span("KANA AS:", "ff1493"),
-            "Usually written using kana alone": self.color_span("KANA", "ff1493"),
-            "Antonym:": "ANT:",
-            "esp.": "ESP:",
-            "Auxiliary verb": self.color_span("v-AUX", "ff0094"),
-            "after the -masu stem of a verb": self.color_span("v-ます", "ff0094"),
-            "after the -te form of a verb": self.color_span("v-て", "ff0094"),
-        }
+        # Flatten all senses into one marked string, so the rules scan the whole meaning once.
+        marked = _marked(meanings)
+        if marked is None:
+            return ()
+
+        # Replace semicolons with commas, then shorten labels in one scan.
+        pieces = self._meaning_pattern.split(marked.replace(";", ","))
+        meaning_map = self._meaning_map
+        pieces[1::2] = [meaning_map[label] for label in pieces[1::2]]
+        text = "".join(pieces)
 
         processed = []
         # Process each meaning entry.
-        for i, meaning in enumerate(meaning_list, 1):
-            # Apply direct string replacements.
-            for pattern, replacement in pattern_map.items():
-                meaning = meaning.replace(pattern, replacement)
-
-            # Split by commas and trim whitespace.
-            parts = [p.strip() for p in meaning.split(",")]
-
-            # Remove repeated "to " after the first occurrence.
-            for j in range(len(parts)):
-                if j > 0 and parts[j].startswith("to ") and any(p.startswith("to ") for p in parts[:j]):
-                    parts[j] = parts[j][3:]
+        for i, sense in enumerate(text.split(_SENSE), 1):
+            # Split by commas and trim whitespace; markers stop the trim like HTML tags did.
+            parts = [p.strip() for p in sense.split(",")]
+
+            # Remove repeated "to " after the first occurrence; it takes two to need it.
+            if sense.count("to ") > 1:
+                seen_to = False
+                for j, part in enumerate(parts):
+                    if part.startswith("to "):
+                        if seen_to:
+                            parts[j] = part[3:]
+                        seen_to = True
 
             # Rebuild numbered meaning line.
             processed.append(f"{i}. " + ", ".join(parts))
 
-        # Join all meanings with newlines.
-        return "\n".join(processed)
-
-    def join_meanings(self, meanings: Iterable[str] | str) -> str:
-        """Join meanings into a single string if needed."""
-        # If already a string, return as-is.
-        if isinstance(meanings, str):
-            return meanings
-        # Otherwise, join list items with newlines.
-        return "\n".join(meanings)
-
-    def format_meaning(self, html) -> list[str]:
-        """Convert Jisho meaning HTML into readable strings."""
-        # Parse the HTML with BeautifulSoup.
-        soup = BeautifulSoup(str(html), "html.parser")
-        # Locate meaning blocks and their tag blocks.
-        meanings = soup.find_all("div", class_="meaning-wrapper")
-        tags = soup.find_all("div", class_="meaning-tags")
-
-        formatted_meanings: list[str] = []
-
-        def _filter(raw) -> str:
-            """Keep text and <a href> tags while stripping other elements."""
-            # Build result parts incrementally.
-            result = []
-            # Traverse all descendants to extract text and links.
-            for elem in raw.descendants:
-                if isinstance(elem, str):
-                    result.append(elem.strip())
-                elif elem.name == "a" and elem.has_attr("href"):
-                    result.append(str(elem))
-            # Join and normalize spacing.
-            return " ".join(result).strip()
-
-        def _process_sentence(sentence) -> str:
-            """Convert example sentence HTML into kanji[furigana] format."""
-            # Convert sentence soup to raw HTML.
-            sentence_html = str(sentence)
-
-            # Replace list items with kanji[furigana] pairs.
-            def replacer(match):
-                furigana = match.group("f")
-                kanji = match.group("k_hit") or match.group("k_normal")
-                return f"{kanji}[{furigana}]"
-
-            pattern = re.compile(
-                r'<li class="clearfix">\s*'
-                r'<span class="furigana">(?P<f>.*?)</span>\s*'
-                r'<span class="unlinked">(?:<span class="hit">(?P<k_hit>.*?)</span>|(?P<k_normal>.*?))</span>\s*'
-                r"</li>",
-                re.DOTALL,
-            )
-
-            # Apply regex substitution.
-            sentence_html = re.sub(pattern, replacer, sentence_html)
-
-            # Parse back to soup and return text.
-            sentence_soup = BeautifulSoup(sentence_html, "html.parser")
-            return sentence_soup.get_text(separator=" ", strip=True)
+        # Join all meanings with newlines and build the spans once.
+        return _unmark("\n".join(processed))
 
-        # Build formatted meanings with tags, info, and examples.
+    def join_meanings(self, meanings: Iterable[RichText]) -> RichText:
+        """Join meanings into a single styled text separated by newlines."""
+        # Insert a newline span between meanings.
+        joined: list[Span] = []
         for i, meaning in enumerate(meanings):
-            # Extract main meaning text.
-            meaning_text = meaning.find("span", class_="meaning-meaning")
-            meaning_text = _filter(meaning_text) if meaning_text else None
-
-            # Extract supplemental info.
-            meaning_info = meaning.find("span", class_="supplemental_info")
-            meaning_info = _filter(meaning_info) if meaning_info else None
-
-            # Extract example sentence.
-            meaning_ex = meaning.find("div", class_="sentence")
-            meaning_ex = _process_sentence(meaning_ex) if meaning_ex else None
-
-            # Build colored info and example blocks.
-            ex_exist = self.color_span(f"\n「{meaning_ex}」", "424242") if meaning_ex else ""
-            info_exist = (
-                self.color_span("\n【 ", "e39a0c") + meaning_info + self.color_span("】", "e39a0c")
-                if meaning_info
-                else ""
-            )
-
-            # Capture the tag text for this meaning.
-            tag_text = tags[i].text.strip() if i < len(tags) else None
-
-            # Combine the final meaning line.
-            if meaning_text:
-                if tag_text:
-                    formatted = f"{meaning_text} ({tag_text}){info_exist}{ex_exist}"
-                else:
-                    formatted = meaning_text
-                formatted_meanings.append(formatted)
-
-        # Return the list of formatted meaning strings.
-        return formatted_meanings
+            if i:
+                joined.append(Span("\n"))
+            joined.extend(meaning)
+        return _merge(joined)
 
-    def parse_color(self, value: str, kanji: Optional[KanjiInfo], enable_color: bool = True) -> str:
+    def parse_color(self, value: str, kanji: Optional[KanjiInfo], enable_color: bool = True) -> RichText:
         """Colorize furigana by matching onyomi/kunyomi readings."""
         # If coloring is disabled or no kanji info, return raw value.
-        if not enable_color or not kanji or not value:
-            return value or ""
-
-        # Prepare onyomi and kunyomi lists.
-        onyomi_list = []
-        kunyomi_list = []
-
-        # Extract onyomi readings if available.
-        if kanji.onyomi:
-            onyomi_list = [r.replace("On:", "").strip() for r in kanji.onyomi.split("、")]
-
-        # Extract kunyomi readings if available.
-        if kanji.kunyomi:
-            kunyomi_list = [r.replace("Kun:", "").replace("-", "").strip() for r in kanji.kunyomi.split("、")]
-
-        result = value
-
-        def kata_to_hira(text: str) -> str:
-            """Convert Katakana characters to Hiragana for matching."""
-            return "".join(chr(ord(c) - 0x60) if "ァ" <= c <= "ヶ" else c for c in text)
-
-        # Replace onyomi matches with colored katakana.
-        for onyomi in onyomi_list:
-            onyomi_hiragana = kata_to_hira(onyomi)
-            if onyomi_hiragana in result:
-                result = result.replace(onyomi_hiragana, f"[#00aaff]{onyomi}[/]")
-
-        # Replace kunyomi matches with colored kana.
-        for kunyomi in kunyomi_list:
-            kunyomi_hiragana = kata_to_hira(kunyomi)
-            if kunyomi_hiragana in result:
-                result = result.replace(kunyomi_hiragana, f"[#ffff00]{kunyomi}[/]")
-
-        # Return the colorized string.
-        return result
-
-    def cv_html(self, meaning: str) -> str:
-        """Convert Rich color markup into HTML spans."""
-        # Pattern to detect Rich color markup.
-        pattern = r"\[#([0-9A-Fa-f]{6})\](.*?)\[/\]"
-        # Replace with HTML span tags.
-        return re.sub(pattern, r'<span style="color:#\1">\2</span>', meaning)
\ No newline at end of file
+        if not value:
+            return ()
+        if not enable_color or not kanji:
+            return (Span(value),)
+
+        # Color with the matcher for this kanji's readings.
+        return self.reading_matcher(kanji).color(value)
+
+    def reading_matcher(self, kanji: KanjiInfo) -> "ReadingMatcher":
+        """Return the cached ReadingMatcher for a kanji's readings."""
+        # Key by the reading strings so one matcher serves every page and batch run.
+        key = (kanji.onyomi, kanji.kunyomi)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            matcher = self._matchers[key] = ReadingMatcher(kanji.onyomi, kanji.kunyomi)
+        return matcher
+
+
+
+# Shared bracket spans around supplemental info.
+_INFO_OPEN = Span("\n【 ", "e39a0c", "info")
+_INFO_CLOSE = Span("】", "e39a0c", "info")
+
+
+def info_spans(info: str) -> list[Span]:
+    """Wrap supplemental info in the colored 【 】 brackets."""
+    return [_INFO_OPEN, Span(info, None, "info"), _INFO_CLOSE]
+
+
+def _span(text: str, color: str | None = None, kind: str = "text") -> Span:
+    """Build a span; short runs come from the shared pool."""
+    # Long runs are unique glosses, not worth a lookup.
+    if len(text) > _SHARED_MAX_LEN:
+        return Span(text, color, kind)
+    key = (text, color, kind)
+    span = _shared_spans.get(key)
+    if span is None:
+        span = Span(text, color, kind)
+        # Bound the pool; odd runs past the limit are simply not shared.
+        if len(_shared_spans) < _SHARED_LIMIT:
+            _shared_spans[key] = span
+    return span
+
+
+def _merge(spans: Iterable[Span]) -> RichText:
+    """Drop empty spans and merge neighbours with the same color and kind."""
+    merged: list[Span] = []
+    for span in spans:
+        if not span.text:
+            continue
+        if merged and merged[-1].color == span.color and merged[-1].kind == span.kind:
+            merged[-1] = Span(merged[-1].text + span.text, span.color, span.kind)
+        else:
+            merged.append(span)
+    return tuple(merged)
+
+
+def _marked(meanings: Iterable[RichText]) -> Optional[str]:
+    """Flatten senses into one string, wrapping styled spans in their markers; None without senses."""
+    # Decoding gives uncolored text the info kind after every other colored info span (the 【 】 brackets),
+    # so only uncolored spans that break that pattern need markers of their own.
+    pieces: list[str] = []
+    for spans in meanings:
+        start = len(pieces)
+        plain_kind = "text"
+        for span in spans:
+            if span.color is None and span.kind == plain_kind:
+                pieces.append(span.text)
+                continue
+            pieces.append(_span_marks.get(span) or _mark_span(span))
+            if span.color is not None and span.kind == "info":
+                plain_kind = "text" if plain_kind == "info" else "info"
+
+        # Numbering added after the sense must be plain text; otherwise mark every non-plain span and switch nothing.
+        if plain_kind != "text":
+            pieces[start:] = [
+                span.text if span.color is None and span.kind == "text"
+                else _open_marker(span.color, span.kind, False) + span.text + _CLOSE
+                for span in spans
+            ]
+        pieces.append(_SENSE)
+    if not pieces:
+        return None
+    pieces.pop()
+    return "".join(pieces)
+
+
+def _mark_span(span: Span) -> str:
+    """Wrap one styled span in its markers."""
+    # Short spans repeat across senses, so only they are remembered.
+    marked = _open_marker(span.color, span.kind) + span.text + _CLOSE
+    if len(span.text) <= _SHARED_MAX_LEN and len(_span_marks) < _SHARED_LIMIT:
+        _span_marks[span] = marked
+    return marked
+
+
+def _open_marker(color: str | None, kind: str, switch: bool = True) -> str:
+    """Return the opening marker of a style, registering the style on first use."""
+    # Styles come from the parser and the meaning rules, so there are only a handful.
+    key = (color, kind, switch and color is not None and kind == "info")
+    marker = _style_markers.get(key)
+    if marker is None:
+        if _MARKER_BASE + len(_marker_styles) >= ord(_MARKER):
+            raise ValueError("Too many distinct span styles for meaning markers")
+        code = chr(_MARKER_BASE + len(_marker_styles))
+        marker = _style_markers[key] = _MARKER + code
+        # Uncolored styles decode to the shared plain styles, so their runs merge with plain text.
+        _marker_styles[code] = {_PLAIN: _PLAIN, _PLAIN_INFO: _PLAIN_INFO}.get((color, kind), (color, kind))
+        if key[2]:
+            _switch_codes.add(code)
+    return marker
+
+
+def _unmark(text: str) -> RichText:
+    """Turn a marked string back into spans, one per run of the same style."""
+    # Without nesting, every segment up to a closing marker is plain text, then one colored span.
+    segments = text.split(_CLOSE)
+    tail = segments.pop()
+    spans: list[Span] = []
+    # Plain text between the 【 】 info brackets keeps the info kind.
+    plain_style = _PLAIN
+    last = None
+    for segment in segments:
+        plain, marker, colored = segment.partition(_MARKER)
+        # A segment with a second marker, or none, belongs to nested spans.
+        if not marker or _MARKER in colored:
+            return _unmark_nested(text)
+
+        # Neighbouring runs of the same style are rare; they extend the previous span.
+        if plain:
+            if plain_style is last:
+                spans[-1] = _span(spans[-1].text + plain, *last)
+            else:
+                spans.append(Span(plain, *plain_style) if len(plain) > _SHARED_MAX_LEN else _span(plain, *plain_style))
+                last = plain_style
+        run = _colored_runs.get(colored) or _colored_run(colored)
+        style = run[1]
+        if len(colored) > 1:
+            if style is last:
+                spans[-1] = _span(spans[-1].text + colored[1:], *last)
+            else:
+                spans.append(run[0])
+                last = style
+        if run[2]:
+            plain_style = _PLAIN_INFO if plain_style is _PLAIN else _PLAIN
+
+    # The text after the last closing marker is plain.
+    if tail:
+        if _MARKER in tail:
+            return _unmark_nested(text)
+        if plain_style is last:
+            spans[-1] = _span(spans[-1].text + tail, *last)
+        else:
+            spans.append(_span(tail, *plain_style))
+    return tuple(spans)
+
+
+def _colored_run(colored: str) -> tuple[Span, tuple[str, str], bool]:
+    """Decode one colored run (style code, then text) into its span, style and whether it switches plain text."""
+    # Only short runs repeat, so only they are remembered.
+    style = _marker_styles[colored[0]]
+    run = (_span(colored[1:], *style), style, colored[0] in _switch_codes)
+    if len(colored) <= _SHARED_MAX_LEN and len(_colored_runs) < _SHARED_LIMIT:
+        _colored_runs[colored] = run
+    return run
+
+
+def _unmark_nested(text: str) -> RichText:
+    """Turn a marked string with nested colored spans back into spans."""
+    # Every piece after the first starts with the code of the marker before it.
+    pieces = text.split(_MARKER)
+    spans: list[Span] = []
+    # Colored spans nest like the HTML spans they replace; the innermost one wins.
+    # The bottom entry is the style of plain text, which is info between the 【 】 brackets.
+    styles: list[tuple[str | None, str]] = [_PLAIN]
+    style = _PLAIN
+    texts = [pieces[0]] if pieces[0] else []
+    for piece in pieces[1:]:
+        # Markers only switch the style of the text after them.
+        opened = _marker_styles.get(piece[0])
+        if opened is None:
+            if len(styles) > 1:
+                styles.pop()
+        else:
+            styles.append(opened)
+            if piece[0] in _switch_codes:
+                styles[0] = _PLAIN_INFO if styles[0] is _PLAIN else _PLAIN
+        body = piece[1:]
+        if not body:
+            continue
+
+        # Neighbouring text of the same style becomes one span.
+        if styles[-1] is not style:
+            if texts:
+                spans.append(_span("".join(texts), style[0], style[1]))
+            style, texts = styles[-1], []
+        texts.append(body)
+    if texts:
+        spans.append(_span("".join(texts), style[0], style[1]))
+    return tuple(spans)
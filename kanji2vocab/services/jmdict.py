@@ -0,0 +1,273 @@
+# file: kanji2vocab/services/jmdict.py
+import os
+import re
+import json
+import time
+import sqlite3
+import xml.etree.ElementTree as ET
+from functools import cached_property
+from itertools import groupby
+
+from ..models import RichText, ScrapePageResult, Span
+from .formatter import Formatter, info_spans
+from .kanjidic import KanjidicStore
+from .logger import Logger
+from .scraper import VocabFilter, VocabSource
+
+
+# JMdict entity expansions mapped to the labels Jisho prints (and the shortener knows).
+_POS_LABELS = {
+    "noun (common) (futsuumeishi)": "Noun",
+    "noun or participle which takes the aux. verb suru": "Suru verb",
+    "nouns which may take the genitive case particle 'no'": "Noun which may take the genitive case particle 'no'",
+    "adjective (keiyoushi)": "I-adjective (keiyoushi)",
+    "adjectival nouns or quasi-adjectives (keiyodoshi)": "Na-adjective (keiyodoshi)",
+    "adverb (fukushi)": "Adverb (fukushi)",
+    "expressions (phrases, clauses, etc.)": "Expressions (phrases, clauses, etc.)",
+    "transitive verb": "Transitive verb",
+    "intransitive verb": "Intransitive verb",
+    "conjunction": "Conjunction",
+    "auxiliary verb": "Auxiliary verb",
+    "word usually written using kana alone": "Usually written using kana alone",
+}
+
+# Priority markers JMdict uses for "common" words (same rule as Jisho).
+_COMMON_PRIORITIES = {"news1", "ichi1", "spec1", "spec2", "gai1"}
+
+
+def _label(text: str) -> str:
+    """Map a JMdict entity expansion to a Jisho-style label."""
+    # Fall back to capitalizing the first letter.
+    return _POS_LABELS.get(text, text[:1].upper() + text[1:])
+
+
+def _is_kana(ch: str) -> bool:
+    """Check whether a character is hiragana, katakana or the long vowel mark."""
+    # Both kana blocks sit in one contiguous range.
+    return "\u3040" <= ch <= "\u30ff"
+
+
+def _kanji_reading(vocab: str, reading: str) -> str:
+    """Return the reading of the kanji alone, without okurigana, like Jisho's furigana (強い: つよ)."""
+    # Kana in the spelling is spelled the same in the reading; every kanji run reads as at least one kana.
+    pattern = "".join(
+        re.escape("".join(run)) if is_kana else "(.+?)" for is_kana, run in groupby(vocab, _is_kana)
+    )
+    match = re.fullmatch(pattern, reading)
+    # Irregular spellings keep the whole reading.
+    return "".join(match.groups()) if match and match.groups() else reading
+
+
+class JMdictEntry:
+    """A stored JMdict headword, shaped like a parsed Jisho entry."""
+    def __init__(self, row: tuple, source: "JMdictSource") -> None:
+        # Unpack the stored columns; senses stay encoded until needed.
+        self.vocab, self.reading, common, self._senses = row
+        # Jisho only labels common words, so that is the one tag there is.
+        self.tags = ["Common word"] if common else []
+        # Keep the source for deferred sense formatting.
+        self.source = source
+
+    @cached_property
+    def furigana(self) -> str:
+        """Return the reading of the kanji in the headword."""
+        # Split off the okurigana only when the entry survived the filter.
+        return _kanji_reading(self.vocab, self.reading)
+
+    @cached_property
+    def senses(self) -> list[RichText]:
+        """Return the formatted senses."""
+        # Decode and format only when the entry survived the filter.
+        return [self.source.format_sense(s) for s in json.loads(self._senses)]
+
+
+class JMdictStore:
+    """SQLite copy of JMdict indexed by the kanji each headword contains."""
+    def __init__(self, db_path: str, logger: Logger) -> None:
+        # Store location and logger.
+        self.db_path = db_path
+        self.logger = logger
+
+        # Create the parent directory if needed.
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Open the database and ensure the schema exists.
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "id INTEGER PRIMARY KEY, vocab TEXT NOT NULL, reading TEXT NOT NULL, "
+            "common INTEGER NOT NULL, rank INTEGER NOT NULL, senses TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS kanji_index (kanji TEXT NOT NULL, entry_id INTEGER NOT NULL);"
+        )
+
+    def is_built(self) -> bool:
+        """Check whether an import has already populated the store."""
+        # One row is enough to tell.
+        return self.conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None
+
+    def build(self, xml_path: str) -> int:
+        """Import a JMdict XML file, replacing any previous import."""
+        # Start from an empty store.
+        self.conn.execute("DELETE FROM entries")
+        self.conn.execute("DELETE FROM kanji_index")
+        self.conn.execute("DROP INDEX IF EXISTS kanji_index_lookup")
+
+        # Stream the XML so the whole dictionary never sits in memory.
+        count = 0
+        start = time.time()
+        for _, element in ET.iterparse(xml_path, events=("end",)):
+            # Only whole entries are imported; their children come first.
+            if element.tag != "entry":
+                continue
+            count += self._import_entry(element)
+            # Free the finished entry.
+            element.clear()
+
+        # Index after the bulk insert, then persist.
+        self.conn.execute("CREATE INDEX kanji_index_lookup ON kanji_index (kanji, entry_id)")
+        self.conn.commit()
+        self.logger.log(f"Imported {count} JMdict headwords in {time.time() - start:.1f}s", "s")
+        return count
+
+    def _import_entry(self, element) -> int:
+        """Store every kanji headword of one <entry> element."""
+        # Collect readings with the spellings they are restricted to.
+        readings = [
+            (r_ele.findtext("reb", ""), {r.text for r in r_ele.findall("re_restr")})
+            for r_ele in element.findall("r_ele")
+            if r_ele.find("re_nokanji") is None
+        ]
+
+        # Build senses; part-of-speech carries over until a sense sets its own.
+        senses = []
+        pos: list[str] = []
+        for sense in element.findall("sense"):
+            own_pos = [_label(p.text or "") for p in sense.findall("pos")]
+            pos = own_pos or pos
+
+            # Senses without an English gloss have nothing to show.
+            glosses = [g.text for g in sense.findall("gloss") if g.text]
+            if not glosses:
+                continue
+
+            # Gather supplemental info in Jisho's order.
+            info = [_label(m.text or "") for m in sense.findall("misc")]
+            info += [s.text for s in sense.findall("s_inf") if s.text]
+            info += [f"See also {x.text}" for x in sense.findall("xref") if x.text]
+            info += [f"Antonym: {x.text}" for x in sense.findall("ant") if x.text]
+            senses.append({"gloss": "; ".join(glosses), "pos": ", ".join(pos), "info": ", ".join(info)})
+        # Every spelling of the entry shares one encoded sense list.
+        senses_json = json.dumps(senses, ensure_ascii=False)
+
+        # Store each kanji spelling as its own headword.
+        stored = 0
+        for k_ele in element.findall("k_ele"):
+            # Pair the spelling with the first reading allowed for it.
+            vocab = k_ele.findtext("keb", "")
+            priorities = {p.text for p in k_ele.findall("ke_pri")}
+            reading = next((reb for reb, restr in readings if not restr or vocab in restr), "")
+            if not vocab or not reading:
+                continue
+
+            # Rank by nfXX frequency band, then by the common flag.
+            common = bool(priorities & _COMMON_PRIORITIES)
+            bands = [int(p[2:]) for p in priorities if p and p.startswith("nf")]
+            rank = min(bands) if bands else (49 if common else 99)
+
+            # Insert the headword and index it under each of its kanji.
+            cursor = self.conn.execute(
+                "INSERT INTO entries (vocab, reading, common, rank, senses) VALUES (?, ?, ?, ?, ?)",
+                (vocab, reading, int(common), rank, senses_json),
+            )
+            self.conn.executemany(
+                "INSERT INTO kanji_index (kanji, entry_id) VALUES (?, ?)",
+                [(ch, cursor.lastrowid) for ch in set(vocab) if not _is_kana(ch)],
+            )
+            stored += 1
+        return stored
+
+    def lookup(self, kanji: str, limit: int, offset: int, common_only: bool = True) -> list[tuple]:
+        """Return (vocab, reading, common, senses) rows containing a kanji."""
+        # Order like Jisho: most frequent first, then dictionary order.
+        return self.conn.execute(
+            "SELECT e.vocab, e.reading, e.common, e.senses FROM kanji_index k "
+            "JOIN entries e ON e.id = k.entry_id "
+            "WHERE k.kanji = ? AND (? = 0 OR e.common = 1) "
+            "ORDER BY e.rank, e.id LIMIT ? OFFSET ?",
+            (kanji, int(common_only), limit, offset),
+        ).fetchall()
+
+    def count(self, kanji: str, common_only: bool = True) -> int:
+        """Return how many headwords contain a kanji."""
+        # Same filter as lookup, without paging.
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM kanji_index k JOIN entries e ON e.id = k.entry_id "
+            "WHERE k.kanji = ? AND (? = 0 OR e.common = 1)",
+            (kanji, int(common_only)),
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        # Release the SQLite connection.
+        self.conn.close()
+
+
+class JMdictSource(VocabSource):
+    """Offline vocab source backed by a local JMdict import."""
+    def __init__(
+        self,
+        store: JMdictStore,
+        formatter: Formatter,
+        logger: Logger,
+        vocab_filter: VocabFilter,
+        is_tag_shortened: bool = True,
+        is_meaning_shortened: bool = True,
+        is_colored: bool = True,
+        common_only: bool = True,
+        page_size: int = 20,
+        kanji_store: KanjidicStore | None = None,
+    ) -> None:
+        # Store shared formatting dependencies and flags.
+        super().__init__(
+            formatter,
+            logger,
+            vocab_filter,
+            is_tag_shortened=is_tag_shortened,
+            is_meaning_shortened=is_meaning_shortened,
+            is_colored=is_colored,
+            kanji_store=kanji_store,
+        )
+        # Store the dictionary and paging settings.
+        self.store = store
+        self.common_only = common_only
+        self.page_size = page_size
+
+    def format_sense(self, sense: dict) -> RichText:
+        """Format a stored sense the way the Jisho parser does."""
+        # Attach part-of-speech and colored supplemental info.
+        text = f"{sense['gloss']} ({sense['pos']})" if sense["pos"] else sense["gloss"]
+        if sense["info"]:
+            return (Span(text), *info_spans(sense["info"]))
+        return (Span(text),)
+
+    async def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
+        """Return one page of JMdict headwords containing the kanji."""
+        # Fetch one extra row to know whether another page exists.
+        start = time.perf_counter()
+        offset = (page - 1) * self.page_size
+        rows = self.store.lookup(kanji, self.page_size + 1, offset, self.common_only)
+        has_next = len(rows) > self.page_size
+
+        # Wrap rows; senses are only decoded for entries that pass the filter.
+        entries = [JMdictEntry(row, self) for row in rows[: self.page_size]]
+
+        # Report the total on the first page so pagination can size its fan-out.
+        total = self.store.count(kanji, self.common_only) if page == 1 else None
+
+        # JMdict has no kanji readings or meanings; they come from the KANJIDIC store when there is one.
+        kanji_info = self.kanji_store.get(kanji) if self.kanji_store else None
+
+        # Filter and format the entries.
+        return self._build_result(entries, kanji, kanji_info, has_next, start, total)
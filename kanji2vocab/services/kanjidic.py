@@ -0,0 +1,109 @@
+# file: kanji2vocab/services/kanjidic.py
+import os
+import time
+import sqlite3
+import xml.etree.ElementTree as ET
+
+from ..models import KanjiInfo
+from .logger import Logger
+
+
+class KanjidicStore:
+    """SQLite-backed kanji metadata built once from KANJIDIC2."""
+    def __init__(self, db_path: str, logger: Logger) -> None:
+        # Store location and logger.
+        self.db_path = db_path
+        self.logger = logger
+        # Memoize lookups; a run asks for the same kanji many times.
+        self._memo: dict[str, KanjiInfo | None] = {}
+
+        # Create the parent directory if needed.
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Open the database memory-mapped and ensure the schema exists.
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA mmap_size = 67108864")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS kanji ("
+            "literal TEXT PRIMARY KEY, onyomi TEXT NOT NULL, kunyomi TEXT NOT NULL, "
+            "meaning TEXT NOT NULL, info TEXT NOT NULL) WITHOUT ROWID"
+        )
+
+    def is_built(self) -> bool:
+        """Check whether an import has already populated the store."""
+        # Any row means a previous import finished.
+        return self.conn.execute("SELECT 1 FROM kanji LIMIT 1").fetchone() is not None
+
+    def build(self, xml_path: str) -> int:
+        """Import a KANJIDIC2 XML file, replacing any previous import."""
+        # Start from an empty store.
+        self.conn.execute("DELETE FROM kanji")
+        self._memo.clear()
+
+        # Stream the XML one <character> at a time.
+        rows = []
+        start = time.time()
+        for _, element in ET.iterparse(xml_path, events=("end",)):
+            if element.tag != "character":
+                continue
+            rows.append(self._row(element))
+            # Free the parsed subtree so memory stays flat over the whole file.
+            element.clear()
+
+        # Persist in one transaction.
+        self.conn.executemany("INSERT OR REPLACE INTO kanji VALUES (?, ?, ?, ?, ?)", rows)
+        self.conn.commit()
+        self.logger.log(f"Imported {len(rows)} KANJIDIC2 characters in {time.time() - start:.1f}s", "s")
+        return len(rows)
+
+    def _row(self, element) -> tuple:
+        """Convert a <character> element into a table row."""
+        # Collect readings and English meanings.
+        onyomi = [r.text for r in element.iterfind(".//reading[@r_type='ja_on']") if r.text]
+        kunyomi = [r.text for r in element.iterfind(".//reading[@r_type='ja_kun']") if r.text]
+        meanings = [m.text for m in element.iterfind(".//meaning") if m.text and "m_lang" not in m.attrib]
+
+        # Summarize stroke count, grade, JLPT and frequency.
+        misc = element.find("misc")
+        info = []
+        if misc is not None:
+            if misc.findtext("stroke_count"):
+                info.append(f"{misc.findtext('stroke_count')} strokes")
+            if misc.findtext("jlpt"):
+                info.append(f"JLPT (old) {misc.findtext('jlpt')}")
+            if misc.findtext("grade"):
+                info.append(f"taught in grade {misc.findtext('grade')}")
+            if misc.findtext("freq"):
+                info.append(f"frequency #{misc.findtext('freq')}")
+
+        # Mirror the On:/Kun: prefixes of Jisho's kanji block.
+        return (
+            element.findtext("literal", ""),
+            "On:" + "、".join(onyomi) if onyomi else "",
+            "Kun:" + "、".join(kunyomi) if kunyomi else "",
+            ", ".join(meanings),
+            ", ".join(info),
+        )
+
+    def get(self, kanji: str) -> KanjiInfo | None:
+        """Return KanjiInfo for a kanji, or None if it is unknown."""
+        # Serve repeated lookups from memory.
+        if kanji in self._memo:
+            return self._memo[kanji]
+
+        # Primary-key lookup.
+        row = self.conn.execute(
+            "SELECT onyomi, kunyomi, meaning, info FROM kanji WHERE literal = ?", (kanji,)
+        ).fetchone()
+
+        # Remember misses too, so unknown kanji are not queried again.
+        info = KanjiInfo(onyomi=row[0], kunyomi=row[1], meaning=row[2], info=row[3]) if row else None
+        self._memo[kanji] = info
+        return info
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        # Release the SQLite connection.
+        self.conn.close()
@@ -0,0 +1,104 @@
+# file: kanji2vocab/services/outbox.py
+import os
+import json
+import time
+import sqlite3
+
+
+class AnkiOutbox:
+    """Durable queue of rendered Anki notes, written before every delivery attempt."""
+    def __init__(self, path: str) -> None:
+        # Store the outbox location.
+        self.path = path
+
+        # Create the parent directory if needed.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Open the database; WAL keeps each batch commit to a single fsync.
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, note TEXT NOT NULL, queued_at REAL NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+        # Notes name their media files; each file's storeMediaFile params are kept once.
+        self.conn.execute("CREATE TABLE IF NOT EXISTS media (filename TEXT PRIMARY KEY, params TEXT NOT NULL)")
+        self.conn.commit()
+
+    def put(self, notes: list[dict], media: list[dict] | None = None) -> list[int]:
+        """Append notes and the media they name in one transaction and return the note ids."""
+        # Stamp the whole batch with one queue time.
+        now = time.time()
+
+        # Insert every note under a single commit; media already queued is not stored again.
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO media (filename, params) VALUES (?, ?)",
+                [(params["filename"], json.dumps(params)) for params in media or ()],
+            )
+            return [
+                self.conn.execute(
+                    "INSERT INTO notes (note, queued_at) VALUES (?, ?)", (json.dumps(note, ensure_ascii=False), now)
+                ).lastrowid
+                for note in notes
+            ]
+
+    def pending(self, limit: int, after_id: int = 0, include_rejected: bool = False) -> list[tuple[int, dict]]:
+        """Return up to limit queued notes after an id, oldest first."""
+        # Notes Anki rejected are only retried on an explicit replay.
+        query = "SELECT id, note FROM notes WHERE id > ?"
+        if not include_rejected:
+            query += " AND error IS NULL"
+
+        # Fetch the page oldest first and decode each note.
+        rows = self.conn.execute(query + " ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+        return [(note_id, json.loads(note)) for note_id, note in rows]
+
+    def media(self, names: list[str]) -> dict[str, dict]:
+        """Return the storeMediaFile params of the named files that are queued."""
+        # Nothing to look up for notes without media.
+        if not names:
+            return {}
+        rows = self.conn.execute(
+            f"SELECT filename, params FROM media WHERE filename IN ({','.join('?' * len(names))})", names
+        ).fetchall()
+        return {filename: json.loads(params) for filename, params in rows}
+
+    def settle(self, results: list[tuple[int, str | None]]) -> None:
+        """Drop delivered notes and record the error of rejected ones."""
+        # Apply the whole batch in one transaction.
+        with self.conn:
+            # Delivered notes leave the queue.
+            self.conn.executemany(
+                "DELETE FROM notes WHERE id = ?", [(note_id,) for note_id, error in results if error is None]
+            )
+            # Rejected notes stay, with their error and attempt count.
+            self.conn.executemany(
+                "UPDATE notes SET attempts = attempts + 1, error = ? WHERE id = ?",
+                [(error, note_id) for note_id, error in results if error is not None],
+            )
+            # Media lives as long as a queued note names it.
+            if any(error is None for _, error in results):
+                self.conn.execute(
+                    "DELETE FROM media WHERE NOT EXISTS "
+                    "(SELECT 1 FROM notes WHERE instr(note, '"' || media.filename || '"') > 0)"
+                )
+
+    def count(self, include_rejected: bool = False, exclude: set[int] | None = None) -> int:
+        """Return the number of notes still waiting for delivery, leaving out the excluded ids."""
+        # Build the filter from the optional conditions.
+        conditions = [] if include_rejected else ["error IS NULL"]
+        if exclude:
+            conditions.append(f"id NOT IN ({','.join('?' * len(exclude))})")
+
+        # Count the matching rows.
+        query = "SELECT COUNT(*) FROM notes" + (" WHERE " + " AND ".join(conditions) if conditions else "")
+        return self.conn.execute(query, tuple(exclude or ())).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        # Release the SQLite connection.
+        self.conn.close()
@@ -1,30 +1,64 @@
 # file: kanji2vocab/services/pagination.py
-import time
-import threading
-import concurrent.futures
+import asyncio
+from typing import AsyncIterator
 from rich.table import Table
 from rich.live import Live
 
-from ..models import KanjiInfo, PaginationResult
+from ..models import KanjiInfo, PaginationResult, PaginationStats, ScrapePageResult
 from .logger import Logger
-from .scraper import JishoScraper
+from .scraper import VocabSource
 
 
 class PaginationHandler:
-    """Handles sequential and concurrent pagination for scraping."""
-    def __init__(self, scraper: JishoScraper, logger: Logger) -> None:
+    """Handles sequential and streamed concurrent pagination for scraping."""
+    def __init__(self, scraper: VocabSource, logger: Logger, speculative_pages: int = 1) -> None:
         # Store scraper instance.
         self.scraper = scraper
         # Store logger instance.
         self.logger = logger
+        # Extra pages requested beyond the estimated last page.
+        self.speculative_pages = speculative_pages
 
-    def sequential(self, kanji: str, pages: int) -> PaginationResult:
-        """Scrape pages sequentially and merge results."""
-        # Initialize the live table for progress display.
+    def _parse_cell(self, result: ScrapePageResult) -> str:
+        """Format parse time and the estimated time saved by lazy parsing."""
+        # Show milliseconds for readability.
+        return f"{result.parse_time * 1000:.1f}ms (~{result.saved_time * 1000:.1f}ms skipped)"
+
+    def _progress_table(self) -> Table:
+        """Create the pagination progress table, one row per page."""
         table = Table()
         table.add_column("Pagination Step", justify="center", style="#00ffff bold")
         table.add_column("Total Scraped", justify="center", style="#ffffff bold")
         table.add_column("Next Pagination", justify="center", style="#00ff00 bold")
+        table.add_column("Parse CPU", justify="center", style="#808080")
+        return table
+
+    def _add_progress_row(self, table: Table, page: int, result: ScrapePageResult | None) -> None:
+        """Add one page to the progress table."""
+        # Failed scrape attempts have no counts to show.
+        if result is None:
+            table.add_row(str(page), "[red]Timeout (Retry Failed)![/]", "Unknown", "-")
+            return
+        table.add_row(
+            str(page),
+            f"[green]{len(result.items)}[/]/[red]{result.total_scraped}[/]",
+            "Yes" if result.has_next else "No",
+            self._parse_cell(result),
+        )
+
+    def stream_table(self, stats: PaginationStats) -> Table:
+        """Build the progress table of a streamed run, captioned with its request summary."""
+        # The stream records every page it hands out; the controller shows them once loading stops.
+        table = self._progress_table()
+        for page, result in stats.results:
+            self._add_progress_row(table, page, result)
+        table.caption = stats.summary()
+        return table
+
+    async def sequential(self, kanji: str, pages: int) -> PaginationResult:
+        """Scrape pages sequentially and merge results."""
+        # Initialize the live table for progress display.
+        table = self._progress_table()
 
         # Initialize results and kanji info.
         merged = []
@@ -36,7 +70,7 @@ class PaginationHandler:
             for page in range(1, pages + 1):
                 try:
                     # Scrape the current page.
-                    result = self.scraper.scrape_page(kanji, page)
+                    result = await self.scraper.scrape_page(kanji, page)
                 except Exception as e:
                     # Log the error and stop sequential scraping.
                     self.logger.log(f"Failure.\nError: {str(e)}", "f")
@@ -47,11 +81,7 @@ class PaginationHandler:
                     kanji_info = result.kanji_info
 
                 # Update table with counts.
-                table.add_row(
-                    f"{page}",
-                    f"[green]{len(result.items)}[/]/[red]{result.total_scraped}[/]",
-                    f"{result.has_next}",
-                )
+                self._add_progress_row(table, page, result)
 
                 # Merge results.
                 merged.extend(result.items)
@@ -63,125 +93,124 @@ class PaginationHandler:
         # Return combined results.
         return PaginationResult(items=merged, kanji_info=kanji_info)
 
-    def concurrent(self, kanji: str, pages: int, max_workers: int = 10) -> PaginationResult:
-        """Scrape pages concurrently with retries and merge results."""
-        # Initialize the live table for progress display.
-        table = Table()
-        table.add_column("Pagination Step", justify="center", style="#00ffff bold")
-        table.add_column("Total Scraped", justify="center", style="#ffffff bold")
-        table.add_column("Next Pagination", justify="center", style="#00ff00 bold")
-
-        # Thread-safe lock for table updates.
-        lock = threading.Lock()
-
-        # Store merged results and kanji info.
-        merged = []
-        kanji_info = KanjiInfo.empty()
-
-        # Event to request stopping remaining tasks.
-        stop_event = threading.Event()
-
-        def scrape_with_retry(page: int, retries: int = 3, backoff_factor: int = 1):
+    def _estimate_bound(self, first: ScrapePageResult | None, pages: int) -> int:
+        """Estimate how many pages are worth requesting after probing page 1."""
+        # Without a probe result or a result count, fall back to the full range.
+        if first is None:
+            return pages
+        if not first.has_next:
+            return 1
+        if first.total_results is None:
+            return pages
+        # Ceil-divide the result count and add the speculative window.
+        estimated = -(-first.total_results // self.scraper.page_size)
+        return max(2, min(pages, estimated + self.speculative_pages))
+
+    async def stream(
+        self, kanji: str, pages: int, stats: PaginationStats | None = None
+    ) -> AsyncIterator[tuple[int, ScrapePageResult | None]]:
+        """Yield (page, result) in page order while later pages load concurrently.
+
+        Page 1 is probed first to size the fan-out; a result of None means the
+        page still failed after an extra retry round.
+        """
+        # Pages that actually reached the source, for the wasted-request count.
+        requested: set[int] = set()
+
+        async def scrape_with_retry(page: int, retries: int = 3, backoff_factor: int = 1):
             """Wrapper to scrape a page with exponential backoff retries."""
+            requested.add(page)
             # Retry up to the configured number of attempts.
             for attempt in range(retries):
                 try:
                     # Attempt to scrape the page.
-                    return (page, self.scraper.scrape_page(kanji, page))
+                    return (page, await self.scraper.scrape_page(kanji, page))
                 except Exception:
                     # If not the last attempt, sleep before retrying.
                     if attempt < retries - 1:
-                        time.sleep(backoff_factor * (2 ** attempt))
+                        await asyncio.sleep(backoff_factor * (2 ** attempt))
                     else:
                         # Return a sentinel for failure.
                         return (page, None)
 
-        # Initialize state variables to prevent UnboundLocalError and track progress
-        kanji_info = None
-        successful_pages = set()
-        max_required_page = pages  # Defaults to the max requested pages
+        # Track the known last page and the highest launched page.
+        max_required_page = pages
+        launched = 1
+        tasks: dict[int, asyncio.Task] = {}
+
+        def launch(up_to: int) -> None:
+            """Start tasks for the pages after the last launched one."""
+            nonlocal launched
+            for page in range(launched + 1, up_to + 1):
+                task = asyncio.create_task(scrape_with_retry(page))
+                task.add_done_callback(on_done)
+                tasks[page] = task
+            launched = max(launched, up_to)
+
+        def observe(page_num: int, result: ScrapePageResult) -> None:
+            """Shrink or extend the fan-out based on a finished page."""
+            nonlocal max_required_page
+            if not result.has_next:
+                # Cap the max pages we care about and cancel the tasks beyond it.
+                max_required_page = min(max_required_page, page_num)
+                for page, task in tasks.items():
+                    if page > max_required_page:
+                        task.cancel()
+            elif page_num == launched and launched < max_required_page:
+                # The estimate was short; extend by another speculative window.
+                launch(min(max_required_page, launched + 1 + self.speculative_pages))
+
+        def on_done(task: asyncio.Task) -> None:
+            """React to pages as soon as they finish, in any order."""
+            if task.cancelled():
+                return
+            page_num, result = task.result()
+            if result is not None:
+                observe(page_num, result)
+
+        try:
+            # Probe page 1 first to learn the real result count.
+            _, first = await scrape_with_retry(1)
+            if first is not None and not first.has_next:
+                max_required_page = 1
+
+            # Fan out only to the estimated bound; the connection pool bounds parallelism.
+            launch(min(max_required_page, self._estimate_bound(first, pages)))
+            if stats is not None:
+                stats.results.append((1, first))
+            yield 1, first
+
+            # Hand pages out in order while the rest keep loading.
+            page = 2
+            while page <= min(max_required_page, launched):
+                task = tasks[page]
+                await asyncio.wait([task])
+                if task.cancelled():
+                    break
+                page_num, result = task.result()
 
-        # Use Live to update the table in-place.
-        with Live(table, refresh_per_second=2):
-            # Launch concurrent tasks.
-            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_page = {
-                    executor.submit(scrape_with_retry, page): page for page in range(1, pages + 1)
-                }
-
-                # Collect results as tasks complete.
-                for future in concurrent.futures.as_completed(future_to_page):
-                    page = future_to_page[future]
-
-                    try:
-                        # Unpack future result.
-                        page_num, result = future.result()
-                    except concurrent.futures.CancelledError:
-                        # Future was successfully cancelled (likely out of bounds), safely ignore.
-                        continue
-                    except Exception:
-                        # Handle unexpected errors.
-                        with lock:
-                            table.add_row(str(page), "[red]Timeout![/]", "Unknown")
-                        continue
-
-                    # Handle failed scrape attempts.
-                    if result is None:
-                        with lock:
-                            table.add_row(str(page_num), "[red]Timeout![/]", "Unknown")
-                        continue
-
-                    # Update shared state under lock.
-                    with lock:
-                        # Ignore results from pages that are beyond the known last page
-                        if page_num > max_required_page:
-                            continue
-
-                        # Mark this page as successfully scraped
-                        successful_pages.add(page_num)
-
-                        # Store kanji info if present.
-                        if result.kanji_info:
-                            kanji_info = result.kanji_info
-
-                        # Update the live table.
-                        table.add_row(
-                            str(page_num),
-                            f"[green]{len(result.items)}[/]/[red]{result.total_scraped}[/]",
-                            "Yes" if result.has_next else "No",
-                        )
-
-                        # Merge items.
-                        merged.extend(result.items)
-
-                        # If no further pages, request stop and cancel remaining futures.
-                        if not result.has_next:
-                            stop_event.set()
-                            # Cap the max pages we care about so we don't retry beyond this point
-                            max_required_page = min(max_required_page, page_num)
-                            for f in future_to_page:
-                                f.cancel()
-
-            # FINAL PASS: Replicating Code 2's intent to catch missed/timed-out pages.
-            # Ensure all pages up to the last valid page are successfully scraped.
-            for page in range(1, max_required_page + 1):
-                if page not in successful_pages:
-                    # Retry synchronously for missing pages
-                    page_num, result = scrape_with_retry(page)
-                    
+                # Give a failed page one more retry round before giving up on it.
+                if result is None:
+                    page_num, result = await scrape_with_retry(page)
                     if result is not None:
-                        successful_pages.add(page_num)
-                        if result.kanji_info and not kanji_info:
-                            kanji_info = result.kanji_info
-                        
-                        table.add_row(
-                            str(page_num),
-                            f"[green]{len(result.items)}[/]/[red]{result.total_scraped}[/]",
-                            "Yes" if result.has_next else "No",
-                        )
-                        merged.extend(result.items)
-                    else:
-                        table.add_row(str(page), "[red]Timeout (Retry Failed)![/]", "Unknown")
+                        observe(page_num, result)
 
-        # Return combined results.
-        return PaginationResult(items=merged, kanji_info=kanji_info)
\ No newline at end of file
+                # Stop at pages beyond the known last page.
+                if page_num > max_required_page:
+                    break
+                if stats is not None:
+                    stats.results.append((page_num, result))
+                yield page_num, result
+                page += 1
+        finally:
+            # Stop anything still running if the consumer quits early.
+            for task in tasks.values():
+                task.cancel()
+
+            # Report requests spent on pages past the last real one.
+            if stats is not None:
+                last_page = min(max_required_page, launched)
+                stats.pages = pages
+                stats.launched = launched
+                stats.requested = len(requested)
+                stats.wasted = len([page for page in requested if page > last_page])
@@ -0,0 +1,268 @@
+# file: kanji2vocab/services/parser.py
+from dataclasses import dataclass
+from functools import cached_property
+
+from lxml import etree
+
+from ..models import KanjiInfo, RichText, Span
+from .formatter import Formatter, info_spans
+
+
+def _cls(name: str) -> str:
+    """Build an XPath predicate matching a single class token."""
+    # Pad with spaces so partial class names do not match.
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath expressions compiled once at import time.
+_ENTRIES = etree.XPath(f"//div[{_cls('concept_light')}]")
+_MORE = etree.XPath(f"//a[{_cls('more')}]")
+_RESULT_COUNT = etree.XPath(f"string((//span[{_cls('result_count')}])[1])")
+_KANJI_CONTENT = etree.XPath(f"//div[{_cls('kanji_light_content')}]")
+_KANJI_ONYOMI = etree.XPath(f".//div[{_cls('on')} and {_cls('readings')}]")
+_KANJI_KUNYOMI = etree.XPath(f".//div[{_cls('kun')} and {_cls('readings')}]")
+_KANJI_MEANING = etree.XPath(f".//div[{_cls('meanings')} and {_cls('english')} and {_cls('sense')}]")
+_KANJI_INFO = etree.XPath(f".//div[{_cls('info')} and {_cls('clearfix')}]")
+_REPRESENTATION = etree.XPath(
+    f".//div[{_cls('concept_light-readings')} and {_cls('japanese')} and {_cls('japanese_gothic')}]"
+    f"/div[{_cls('concept_light-representation')}]"
+)
+_TEXT = etree.XPath(f".//span[{_cls('text')}]")
+_FURIGANA = etree.XPath(f".//span[{_cls('furigana')}]")
+_STATUS_TAGS = etree.XPath(
+    f".//div[{_cls('concept_light-status')}]//*[{_cls('concept_light-tag')} and {_cls('label')}]"
+)
+_MEANINGS_WRAPPER = etree.XPath(f".//div[{_cls('meanings-wrapper')}]")
+_SENSES = etree.XPath(f".//div[{_cls('meaning-wrapper')}]")
+_SENSE_TAGS = etree.XPath(f".//div[{_cls('meaning-tags')}]")
+_SENSE_MEANING = etree.XPath(f".//span[{_cls('meaning-meaning')}]")
+_SENSE_INFO = etree.XPath(f".//span[{_cls('supplemental_info')}]")
+_SENSE_SENTENCE = etree.XPath(f".//div[{_cls('sentence')}]")
+
+
+class ParsedEntry:
+    """One concept_light entry; everything but the vocab text is parsed on demand."""
+    def __init__(self, element, parser: "JishoParser") -> None:
+        # Keep the element and parser for deferred extraction.
+        self.element = element
+        self.parser = parser
+        # Locate the reading block and read the vocab text up front.
+        self.representation = _first(_REPRESENTATION(element))
+        self.vocab = _joined_text(self._find(_TEXT))
+
+    def _find(self, xpath):
+        """Return the first match under the reading block, or None."""
+        # Entries without a reading block have nothing to find.
+        if self.representation is None:
+            return None
+        return _first(xpath(self.representation))
+
+    @cached_property
+    def furigana(self) -> str:
+        """Return the furigana text."""
+        # Parsed on first access only.
+        return _joined_text(self._find(_FURIGANA))
+
+    @cached_property
+    def tags(self) -> list[str]:
+        """Return the non-empty tag labels."""
+        # Drop labels that are only whitespace.
+        return [t for t in (_joined_text(el) for el in _STATUS_TAGS(self.element)) if t]
+
+    @cached_property
+    def senses(self) -> list[RichText]:
+        """Return the formatted senses."""
+        # The parser owns the formatter, so it builds the spans.
+        wrapper = _first(_MEANINGS_WRAPPER(self.element))
+        return self.parser.parse_senses(wrapper) if wrapper is not None else []
+
+
+@dataclass
+class ParsedPage:
+    """Represents everything extracted from a Jisho result page."""
+    entries: list[ParsedEntry]
+    has_next: bool
+    kanji_info: KanjiInfo | None = None
+    total_results: int | None = None
+
+
+class JishoParser:
+    """Single-pass lxml parser for Jisho search result pages."""
+    def __init__(self, formatter: Formatter) -> None:
+        # Store formatter for colored info/example markers.
+        self.formatter = formatter
+        # Reuse one HTML parser; Jisho always serves UTF-8.
+        self.html_parser = etree.HTMLParser(encoding="utf-8")
+
+    def parse(self, content: bytes, with_kanji_info: bool = False) -> ParsedPage:
+        """Parse a result page into entries, pagination and kanji info."""
+        # Build the document tree once.
+        root = etree.fromstring(content, self.html_parser)
+        if root is None:
+            return ParsedPage(entries=[], has_next=False)
+
+        # Wrap each entry; details are only parsed when accessed.
+        entries = [ParsedEntry(el, self) for el in _ENTRIES(root)]
+
+        # Return the parsed page.
+        return ParsedPage(
+            entries=entries,
+            has_next=bool(_MORE(root)),
+            kanji_info=self._parse_kanji_info(root) if with_kanji_info else None,
+            total_results=_result_count(root),
+        )
+
+    def _parse_kanji_info(self, root) -> KanjiInfo:
+        """Parse kanji metadata from the sidebar block."""
+        # Locate the kanji content container.
+        target = _first(_KANJI_CONTENT(root))
+        # Return empty info if not found.
+        if target is None:
+            return KanjiInfo.empty()
+
+        # Extract text fields.
+        return KanjiInfo(
+            info=_joined_text(_first(_KANJI_INFO(target))),
+            onyomi=_joined_text(_first(_KANJI_ONYOMI(target))),
+            kunyomi=_joined_text(_first(_KANJI_KUNYOMI(target))),
+            meaning=_joined_text(_first(_KANJI_MEANING(target))),
+        )
+
+    def parse_senses(self, wrapper) -> list[RichText]:
+        """Convert a meanings-wrapper element into styled senses."""
+        # Locate meaning blocks and their tag blocks.
+        meanings = _SENSES(wrapper)
+        tags = _SENSE_TAGS(wrapper)
+
+        formatted_meanings: list[RichText] = []
+
+        # Build formatted meanings with tags, info, and examples.
+        for i, meaning in enumerate(meanings):
+            # Extract main meaning text.
+            meaning_el = _first(_SENSE_MEANING(meaning))
+            meaning_text = _filter(meaning_el) if meaning_el is not None else None
+
+            # Extract supplemental info.
+            info_el = _first(_SENSE_INFO(meaning))
+            meaning_info = _filter(info_el) if info_el is not None else None
+
+            # Extract example sentence.
+            sentence_el = _first(_SENSE_SENTENCE(meaning))
+            meaning_ex = _sentence_text(sentence_el) if sentence_el is not None else None
+
+            # Capture the tag text for this meaning.
+            tag_text = _all_text(tags[i]).strip() if i < len(tags) else None
+
+            # Combine the final meaning with colored info and example blocks.
+            if meaning_text:
+                if tag_text:
+                    spans = [Span(f"{meaning_text} ({tag_text})")]
+                    if meaning_info:
+                        spans += info_spans(meaning_info)
+                    if meaning_ex:
+                        spans.append(Span(f"\n「{meaning_ex}」", "424242", "example"))
+                    formatted_meanings.append(tuple(spans))
+                else:
+                    formatted_meanings.append((Span(meaning_text),))
+
+        # Return the list of formatted senses.
+        return formatted_meanings
+
+
+def _first(elements: list):
+    """Return the first element of an XPath result, or None."""
+    return elements[0] if elements else None
+
+
+def _result_count(root) -> int | None:
+    """Read the result count from the " — 123 found" header."""
+    # Keep only the digits; thousands separators vary.
+    digits = "".join(ch for ch in _RESULT_COUNT(root) if ch.isdigit())
+    return int(digits) if digits else None
+
+
+def _all_text(el) -> str:
+    """Return all text under an element, comments excluded."""
+    return "".join(el.itertext(tag=etree.Element))
+
+
+def _joined_text(el) -> str:
+    """Join stripped text fragments without a separator."""
+    # Mirror get_text(strip=True, separator="") on missing elements too.
+    if el is None:
+        return ""
+    return "".join(s.strip() for s in el.itertext(tag=etree.Element))
+
+
+def _filter(el) -> str:
+    """Keep text and <a href> tags while stripping other elements."""
+    # Build result parts incrementally in document order.
+    result: list[str] = []
+
+    def walk(node) -> None:
+        if node.text is not None and isinstance(node.tag, str):
+            result.append(node.text.strip())
+        for child in node:
+            if child.tag == "a" and "href" in child.attrib:
+                result.append(etree.tostring(child, encoding="unicode", with_tail=False))
+            if isinstance(child.tag, str):
+                walk(child)
+            elif child.text is not None:
+                # Comments still count as strings.
+                result.append(child.text.strip())
+            if child.tail is not None:
+                result.append(child.tail.strip())
+
+    walk(el)
+    # Join and normalize spacing.
+    return " ".join(result).strip()
+
+
+def _is_furigana_pair(li) -> bool:
+    """Check for a <li class="clearfix"> holding furigana + unlinked spans only."""
+    # Require the exact list item class and two span children.
+    if li.tag != "li" or li.get("class") != "clearfix" or len(li) != 2:
+        return False
+    furigana, unlinked = li
+    if furigana.tag != "span" or furigana.get("class") != "furigana" or len(furigana):
+        return False
+    if unlinked.tag != "span" or unlinked.get("class") != "unlinked":
+        return False
+    # Only whitespace may surround the two spans.
+    return all(not (s or "").strip() for s in (li.text, furigana.tail, unlinked.tail))
+
+
+def _sentence_text(sentence) -> str:
+    """Convert an example sentence into kanji[furigana] format."""
+    # Text fragments merge across replaced list items, like a text node would.
+    chunks: list[str] = []
+    buffer: list[str] = []
+
+    def flush() -> None:
+        if buffer:
+            chunks.append("".join(buffer))
+            buffer.clear()
+
+    def walk(node) -> None:
+        if node.text is not None:
+            buffer.append(node.text)
+        for child in node:
+            if isinstance(child.tag, str) and _is_furigana_pair(child):
+                # Replace the list item with its kanji[furigana] pair.
+                furigana, unlinked = child
+                hit = unlinked[0] if len(unlinked) == 1 and unlinked[0].get("class") == "hit" else None
+                kanji = _all_text(hit if hit is not None else unlinked)
+                buffer.append(f"{kanji}[{furigana.text or ''}]")
+            elif isinstance(child.tag, str):
+                flush()
+                walk(child)
+                flush()
+            else:
+                flush()
+            if child.tail is not None:
+                buffer.append(child.tail)
+
+    walk(sentence)
+    flush()
+    # Join stripped fragments with spaces.
+    return " ".join(c.strip() for c in chunks if c.strip())
@@ -1,11 +1,15 @@
 # file: kanji2vocab/services/scraper.py
+import time
 import random
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+from abc import ABC, abstractmethod
 
 from ..models import KanjiInfo, ScrapePageResult, VocabItem
+from .cache import PageCache
 from .formatter import Formatter
+from .kanjidic import KanjidicStore
 from .logger import Logger
+from .parser import JishoParser
 
 
 class VocabFilter:
@@ -35,20 +39,18 @@ class VocabFilter:
         return True
 
 
-class JishoScraper:
-    """Scrapes Jisho.org for kanji vocab and metadata."""
+class VocabSource(ABC):
+    """Base class for anything PaginationHandler can page through."""
     def __init__(
         self,
-        base_url_template: str,
         formatter: Formatter,
         logger: Logger,
         vocab_filter: VocabFilter,
         is_tag_shortened: bool = True,
         is_meaning_shortened: bool = True,
         is_colored: bool = True,
+        kanji_store: KanjidicStore | None = None,
     ) -> None:
-        # Store base URL template.
-        self.base_url_template = base_url_template
         # Store formatter for parsing/formatting.
         self.formatter = formatter
         # Store logger for error reporting.
@@ -59,14 +61,12 @@ class JishoScraper:
         self.is_tag_shortened = is_tag_shortened
         self.is_meaning_shortened = is_meaning_shortened
         self.is_colored = is_colored
-        # Prepare a list of user agents for rotation.
-        self.user_agents = [
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.150 Safari/537.36",
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.141 Safari/537.36",
-        ]
+        # Store the optional local kanji metadata store.
+        self.kanji_store = kanji_store
+        # Sources without a page cache leave this empty.
+        self.cache: PageCache | None = None
+        # Entries per result page, used to estimate the page count.
+        self.page_size = 20
 
     def update_settings(
         self,
@@ -75,10 +75,7 @@ class JishoScraper:
         is_meaning_shortened: bool | None = None,
         is_colored: bool | None = None,
     ) -> None:
-        """Update scraper settings without rebuilding the object."""
-        # Update base URL template if provided.
-        if base_url_template is not None:
-            self.base_url_template = base_url_template
+        """Update source settings without rebuilding the object."""
         # Update flags if provided.
         if is_tag_shortened is not None:
             self.is_tag_shortened = is_tag_shortened
@@ -87,132 +84,82 @@ class JishoScraper:
         if is_colored is not None:
             self.is_colored = is_colored
 
-    def _build_url(self, kanji: str, page: int) -> str:
-        """Build the Jisho search URL for a given page."""
-        # Insert kanji into the base URL template.
-        base = self.base_url_template.format(Kanji=kanji)
-        # Append pagination parameter.
-        return f"{base}?page={page}"
+    @abstractmethod
+    async def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
+        """Return one page of vocab entries for a kanji."""
 
-    def _parse_kanji_info(self, soup: BeautifulSoup) -> KanjiInfo:
-        """Parse kanji metadata from the first page."""
-        # Locate the kanji content container.
-        target = soup.select_one("div.kanji_light_content")
-        # Return empty info if not found.
-        if not target:
-            return KanjiInfo.empty()
-
-        # Select specific kanji info elements.
-        scr_onyomi = target.select_one("div.on.readings")
-        scr_kunyomi = target.select_one("div.kun.readings")
-        scr_meaning = target.select_one("div.meanings.english.sense")
-        scr_info = target.select_one("div.info.clearfix")
-
-        # Remove <a> tags to simplify text.
-        if scr_onyomi:
-            for a in scr_onyomi.find_all("a", recursive=True):
-                a.unwrap()
-        if scr_kunyomi:
-            for a in scr_kunyomi.find_all("a", recursive=True):
-                a.unwrap()
-
-        # Extract text fields.
-        kanji_onyomi = scr_onyomi.get_text(strip=True, separator="") if scr_onyomi else ""
-        kanji_kunyomi = scr_kunyomi.get_text(strip=True, separator="") if scr_kunyomi else ""
-        kanji_meaning = scr_meaning.get_text(strip=True, separator="") if scr_meaning else ""
-        kanji_info = scr_info.get_text(strip=True, separator="") if scr_info else ""
-
-        # Return structured KanjiInfo.
-        return KanjiInfo(
-            info=kanji_info,
-            onyomi=kanji_onyomi,
-            kunyomi=kanji_kunyomi,
-            meaning=kanji_meaning,
-        )
+    async def close(self) -> None:
+        """Release any resources held by the source."""
+        # Sources without open resources have nothing to release.
+        return None
 
-    def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
-        """Scrape a single Jisho page for vocab entries."""
-        # Build request headers with a random user agent.
-        headers = {"User-Agent": random.choice(self.user_agents)}
-
-        # Build URL for the requested page.
-        url = self._build_url(kanji, page)
-
-        # Execute the HTTP request.
-        response = requests.get(url, headers=headers, timeout=20)
-        response.raise_for_status()
-
-        # Parse the HTML document.
-        try:
-            soup = BeautifulSoup(response.content, "lxml")
-        except Exception:
-            soup = BeautifulSoup(response.content, "html.parser")
-
-        # Detect next-page availability.
-        has_next = bool(soup.select_one("a.more"))
-
-        # Collect the vocab-related elements.
-        characters = soup.select(
-            "div.concept_light-readings.japanese.japanese_gothic > div.concept_light-representation"
-        )
-        meanings = soup.select("div.meanings-wrapper")
-        tags = soup.select("div.concept_light-status")
-
-        # Parse kanji info on the first page only.
-        kanji_info = self._parse_kanji_info(soup) if page == 1 else None
+    def _build_result(
+        self,
+        entries,
+        kanji: str,
+        kanji_info: KanjiInfo | None,
+        has_next: bool,
+        start: float,
+        total_results: int | None = None,
+    ) -> ScrapePageResult:
+        """Filter entries and format the survivors into a ScrapePageResult.
+
+        Entries only need vocab, furigana, tags and senses attributes; the
+        last three are read after filtering so lazy entries stay cheap.
+        """
+        # Prefer the local kanji store so every page is colored, not just page 1.
+        stored_info = self.kanji_store.get(kanji) if self.kanji_store else None
+        color_info = stored_info or kanji_info
 
         # Prepare results list and counters.
         items: list[VocabItem] = []
         total_scraped = 0
+        build_time = 0.0
 
-        # Iterate through vocab blocks together.
-        for char_el, meaning_el, tag_el in zip(characters, meanings, tags):
-            # Extract vocab text and furigana.
-            text_el = char_el.select_one("span.text")
-            furi_el = char_el.select_one("span.furigana")
-
-            scr_vocab = text_el.get_text(strip=True) if text_el else None
-            scr_furi = furi_el.get_text(strip=True) if furi_el else None
-
+        # Iterate through the parsed entries.
+        for entry in entries:
             # Count all scraped entries.
             total_scraped += 1
 
-            # Skip invalid or missing entries.
-            if not scr_vocab or not scr_furi:
+            # Filter by learned set and target kanji before touching anything else.
+            if not entry.vocab or not self.vocab_filter.is_valid(entry.vocab, kanji):
                 continue
 
-            # Filter by learned set and target kanji.
-            if not self.vocab_filter.is_valid(scr_vocab, kanji):
+            # Skip entries without furigana.
+            if not entry.furigana:
                 continue
 
-            # Extract tag contents.
-            tag_contents = [t.get_text(strip=True) for t in tag_el.select(".concept_light-tag.label") if t]
-            tag_contents = [t for t in tag_contents if t]
+            # Time the per-entry work that filtered entries never pay for.
+            build_start = time.perf_counter()
 
             # Join tags and optionally shorten.
-            tag_text = ", ".join(tag_contents)
+            tag_text = ", ".join(entry.tags)
             if self.is_tag_shortened:
                 tag_text = self.formatter.shortify_tag(tag_text)
 
-            # Format meanings and optionally shorten.
-            meaning_list = self.formatter.format_meaning(meaning_el)
+            # Optionally shorten meanings.
             if self.is_meaning_shortened:
-                meaning_text = self.formatter.shortify_meaning(meaning_list)
+                meaning_text = self.formatter.shortify_meaning(entry.senses)
             else:
-                meaning_text = self.formatter.join_meanings(meaning_list)
+                meaning_text = self.formatter.join_meanings(entry.senses)
 
             # Colorize furigana if enabled and kanji info available.
-            furi_colored = self.formatter.parse_color(scr_furi, kanji_info, self.is_colored)
+            furi_colored = self.formatter.parse_color(entry.furigana, color_info, self.is_colored)
 
             # Append vocab item.
             items.append(
                 VocabItem(
-                    vocab=scr_vocab,
+                    vocab=entry.vocab,
                     furigana=furi_colored,
                     meaning=meaning_text,
-                    tag=tag_text,
+                    tag=self.formatter.tag_spans(tag_text),
                 )
             )
+            build_time += time.perf_counter() - build_start
+
+        # Estimate the work avoided on filtered entries from the average build cost.
+        skipped = total_scraped - len(items)
+        saved_time = build_time / len(items) * skipped if items else 0.0
 
         # Return page scrape result.
         return ScrapePageResult(
@@ -220,4 +167,133 @@ class JishoScraper:
             has_next=has_next,
             total_scraped=total_scraped,
             kanji_info=kanji_info,
-        )
\ No newline at end of file
+            parse_time=time.perf_counter() - start,
+            saved_time=saved_time,
+            total_results=total_results,
+        )
+
+
+class JishoScraper(VocabSource):
+    """Scrapes Jisho.org for kanji vocab and metadata."""
+    def __init__(
+        self,
+        base_url_template: str,
+        formatter: Formatter,
+        logger: Logger,
+        vocab_filter: VocabFilter,
+        is_tag_shortened: bool = True,
+        is_meaning_shortened: bool = True,
+        is_colored: bool = True,
+        connection_limit: int = 10,
+        cache: PageCache | None = None,
+        kanji_store: KanjidicStore | None = None,
+    ) -> None:
+        # Store shared formatting dependencies and flags.
+        super().__init__(
+            formatter,
+            logger,
+            vocab_filter,
+            is_tag_shortened=is_tag_shortened,
+            is_meaning_shortened=is_meaning_shortened,
+            is_colored=is_colored,
+            kanji_store=kanji_store,
+        )
+        # Store base URL template.
+        self.base_url_template = base_url_template
+        # Build the page parser once.
+        self.parser = JishoParser(formatter)
+        # Store the connection limit for the shared session.
+        self.connection_limit = connection_limit
+        # Shared keep-alive session, created lazily inside the event loop.
+        self._session: aiohttp.ClientSession | None = None
+        # Store the optional on-disk page cache.
+        self.cache = cache
+        # Prepare a list of user agents for rotation.
+        self.user_agents = [
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/90.0.4430.93 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.150 Safari/537.36",
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/87.0.4280.141 Safari/537.36",
+        ]
+
+    def update_settings(
+        self,
+        base_url_template: str | None = None,
+        is_tag_shortened: bool | None = None,
+        is_meaning_shortened: bool | None = None,
+        is_colored: bool | None = None,
+    ) -> None:
+        """Update scraper settings without rebuilding the object."""
+        # Update base URL template if provided.
+        if base_url_template is not None:
+            self.base_url_template = base_url_template
+        # Update shared flags.
+        super().update_settings(
+            is_tag_shortened=is_tag_shortened,
+            is_meaning_shortened=is_meaning_shortened,
+            is_colored=is_colored,
+        )
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive session, creating it on first use."""
+        # Reuse the open session so pages share pooled TLS connections.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=20),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session if it was opened."""
+        # Release pooled connections.
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _build_url(self, kanji: str, page: int) -> str:
+        """Build the Jisho search URL for a given page."""
+        # Insert kanji into the base URL template.
+        base = self.base_url_template.format(Kanji=kanji)
+        # Append pagination parameter.
+        return f"{base}?page={page}"
+
+    async def _fetch(self, url: str) -> bytes:
+        """Download a page through the shared session."""
+        # Build request headers with a random user agent.
+        headers = {"User-Agent": random.choice(self.user_agents)}
+
+        # Execute the HTTP request on a pooled connection.
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
+        """Scrape a single Jisho page for vocab entries."""
+        # Build URL for the requested page.
+        url = self._build_url(kanji, page)
+
+        # Serve from the page cache when possible, else download and store.
+        content = self.cache.get(url) if self.cache else None
+        if content is None:
+            content = await self._fetch(url)
+            if self.cache:
+                self.cache.put(url, content)
+
+        # Parse the page.
+        return self._parse_page(content, kanji, page)
+
+    def _parse_page(self, content: bytes, kanji: str, page: int) -> ScrapePageResult:
+        """Parse a downloaded Jisho page into a ScrapePageResult."""
+        # Walk the document once; kanji info lives on the first page only
+        # and is not needed at all when the local kanji store is available.
+        start = time.perf_counter()
+        parsed = self.parser.parse(content, with_kanji_info=page == 1 and self.kanji_store is None)
+
+        # Filter and format the entries.
+        return self._build_result(
+            parsed.entries, kanji, parsed.kanji_info, parsed.has_next, start, parsed.total_results
+        )
@@ -1,4 +1,5 @@
 # file: kanji2vocab/services/stroke.py
+import re
 import aiohttp
 from bs4 import BeautifulSoup
 
@@ -6,6 +7,25 @@ from .utils import uni
 from .logger import Logger
 
 
+# Parts of a KanjiVG SVG that do not affect rendering; the xml parser may drop the kvg: prefix.
+_SVG_NOISE = re.compile(
+    r"<\?xml[^>]*\?>|<!--.*?-->|<!DOCTYPE[^>]*(?:\[.*?\])?\s*>"
+    r"|\s+(?:xmlns:kvg|id|(?:kvg:)?(?:element|variant|partial|original|part|number|tradForm"
+    r'|radicalForm|position|radical|phon|type))="[^"]*"',
+    re.DOTALL,
+)
+_TAG_GAP = re.compile(r">\s+<")
+_SPACE_RUN = re.compile(r"\s{2,}")
+
+
+def minify_svg(svg: str) -> str:
+    """Strip metadata, ids and whitespace that the rendered stroke SVG does not need."""
+    # Drop noise, then collapse whitespace between and inside tags.
+    svg = _SVG_NOISE.sub("", svg)
+    svg = _TAG_GAP.sub("><", svg)
+    return _SPACE_RUN.sub(" ", svg).strip()
+
+
 class StrokeScraper:
     """Fetches kanji stroke SVG from kvg."""
     def __init__(self, logger: Logger) -> None:
@@ -41,5 +61,5 @@ class StrokeScraper:
                 if g_element:
                     g_element["style"] = "stroke:#fff; background:#000"
 
-                # Return the modified SVG string.
-                return str(soup)
\ No newline at end of file
+                # Return the modified SVG string, minified.
+                return minify_svg(str(soup))
\ No newline at end of file
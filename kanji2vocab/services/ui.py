@@ -1,10 +1,13 @@
 # file: kanji2vocab/services/ui.py
+import asyncio
+
 from rich.table import Table
 from rich.console import Console
 
-from ..models import KanjiInfo, VocabItem
+from ..models import KanjiInfo, VocabItem, render_rich
 from .logger import Logger
 from .formatter import Formatter
+from .utils import normalize_jp
 from ..config import ConfigManager
 
 
@@ -130,7 +133,7 @@ class ConsoleUI:
                 # Handle invalid choices.
                 self.logger.log("Invalid choice", "f")
 
-    def select_vocabulary(
+    async def select_vocabulary(
         self,
         items: list[VocabItem],
         pagination_limit: int,
@@ -138,18 +141,26 @@ class ConsoleUI:
         scraper_time_elapsed: float,
         target_kanji: str,
         on_kanji_template,
+        loader: asyncio.Task | None = None,
+        existing: set[str] | None = None,
     ) -> set[int]:
-        """Interactive selection of vocab items with pagination."""
-        # Compute pagination statistics.
-        total_items = len(items)
+        """Interactive selection of vocab items; items may grow at the end while loader runs.
+
+        Vocab whose normalized form is in ``existing`` is already in Anki and cannot be selected.
+        """
+        existing = existing if existing is not None else set()
         current_page = 0
-        total_pages = (total_items + pagination_limit - 1) // pagination_limit
 
         # Track selected indices.
         selected = set()
 
         # Continue until user finishes selection.
         while True:
+            # Recompute pagination statistics; later pages may have arrived.
+            total_items = len(items)
+            total_pages = max(1, (total_items + pagination_limit - 1) // pagination_limit)
+            is_loading = loader is not None and not loader.done()
+
             # Compute page bounds.
             start_idx = current_page * pagination_limit
             end_idx = min(start_idx + pagination_limit, total_items)
@@ -160,6 +171,7 @@ class ConsoleUI:
                     f"Scraped Vocabulary\nPage {current_page + 1} of {total_pages}"
                     f"\nItems {start_idx + 1}-{end_idx} of {total_items}"
                     f"\nTime Taken: {scraper_time_elapsed}"
+                    + ("\nLoading more pages... (Enter to refresh)" if is_loading else "")
                 ),
                 show_lines=True,
             )
@@ -171,19 +183,28 @@ class ConsoleUI:
             # Populate table rows.
             for i in range(start_idx, end_idx):
                 item = items[i]
-                meaning = self.formatter.color_to_rich(item.meaning)
-                if i in selected:
+                meaning = render_rich(item.meaning)
+                furigana = render_rich(item.furigana)
+                tag = render_rich(item.tag)
+                if normalize_jp(item.vocab) in existing:
+                    table.add_row(
+                        f"[grey50]{i + 1}. {item.vocab} (in Anki)[/]",
+                        f"[grey50]{furigana}[/]",
+                        f"[grey50]{tag}[/]",
+                        f"[grey50]{meaning}[/]",
+                    )
+                elif i in selected:
                     table.add_row(
                         f"[blue]{i + 1}. {item.vocab}[/]",
-                        f"[blue]{item.furigana}[/]",
-                        f"[blue]{item.tag}[/]",
+                        f"[blue]{furigana}[/]",
+                        f"[blue]{tag}[/]",
                         f"[blue]{meaning}[/]",
                     )
                 else:
                     table.add_row(
                         f"{i + 1}. {item.vocab}",
-                        f"{item.furigana}",
-                        f"{item.tag}",
+                        f"{furigana}",
+                        f"{tag}",
                         f"{meaning}",
                     )
 
@@ -204,15 +225,19 @@ Info: {kanji_info.info}
                 "_",
             )
 
-            # Read user command.
-            command = input("Enter command or number: ").strip()
+            # Read user command in a thread so background pages keep loading.
+            command = (await asyncio.to_thread(input, "Enter command or number: ")).strip()
 
-            if command == "<":
+            if command == "":
+                # Redraw with whatever has loaded since.
+                continue
+            elif command == "<":
                 # Move to previous page.
                 current_page = max(0, current_page - 1)
             elif command == ">":
                 # Move to next page.
-                current_page = min(total_pages - 1, current_page + 1)
+                last_page = max(0, (len(items) - 1) // pagination_limit)
+                current_page = min(last_page, current_page + 1)
             elif command.lower() in ["k", "kanji"]:
                 # Trigger kanji template action.
                 on_kanji_template()
@@ -220,13 +245,18 @@ Info: {kanji_info.info}
                 # Finish selection.
                 break
             elif command in [".", "all"]:
-                # Select all and finish.
-                selected = set(range(total_items))
+                # Select all once every page has arrived, then finish.
+                if is_loading:
+                    self.logger.log("Waiting for remaining pages...", "i")
+                    await loader
+                selected = {i for i in range(len(items)) if normalize_jp(items[i].vocab) not in existing}
                 break
             elif command.isdigit():
                 # Add a single item by index.
                 index = int(command) - 1
-                if 0 <= index < total_items:
+                if 0 <= index < len(items) and normalize_jp(items[index].vocab) in existing:
+                    self.logger.log(f"Vocabulary {index + 1} is already in Anki", "c")
+                elif 0 <= index < len(items):
                     selected.add(index)
                     self.logger.log(f"Vocabulary {index + 1} selected for batch processing", "s")
                 else:
@@ -0,0 +1,137 @@
+# file: tests/fakes.py
+import io
+import json
+import asyncio
+import fnmatch
+from aiohttp import web
+from rich.console import Console
+
+from kanji2vocab.controller import AppController
+from kanji2vocab.models import AppConfig
+from kanji2vocab.services.anki import AnkiClient, AnkiInteractor
+from kanji2vocab.services.cards import CardRenderer
+from kanji2vocab.services.formatter import Formatter
+from kanji2vocab.services.pagination import PaginationHandler
+from kanji2vocab.services.scraper import JishoScraper, VocabFilter
+from kanji2vocab.services.stroke import StrokeScraper
+from kanji2vocab.services.ui import ConsoleUI
+
+
+class RecordingLogger:
+    """Logger stand-in that keeps every line instead of printing it."""
+    def __init__(self) -> None:
+        self.lines: list[tuple[str, str]] = []
+        # Live displays still need a console to draw on.
+        self.console = Console(file=io.StringIO())
+
+    def log(self, text, status: str = "s") -> None:
+        self.lines.append((str(text), status))
+
+
+class MemoryConfig:
+    """ConfigManager stand-in that records learned kanji without touching config.json."""
+    def update_learned(self, config: AppConfig, kanji: str) -> AppConfig:
+        if kanji not in config.has_learned:
+            config.has_learned.append(kanji)
+        return config
+
+
+def make_controller(source=None, **dependencies) -> AppController:
+    """Build an AppController wired like __main__, paginating over source; keywords replace single dependencies."""
+    # Offline services by default; nothing here opens a connection until it is used.
+    logger = dependencies.pop("logger", None) or RecordingLogger()
+    formatter = Formatter(logger=logger)
+    vocab_filter = VocabFilter(set())
+    scraper = JishoScraper("{}{}", formatter, logger, vocab_filter)
+    wiring = dict(
+        config_manager=MemoryConfig(),
+        logger=logger,
+        formatter=formatter,
+        ui=ConsoleUI(logger, formatter),
+        scraper=scraper,
+        paginator=PaginationHandler(source or scraper, logger),
+        stroke_scraper=StrokeScraper(logger),
+        ai_client=None,
+        anki_client=AnkiClient(AnkiInteractor(logger=logger), "", logger),
+        card_renderer=CardRenderer("", ""),
+        vocab_filter=vocab_filter,
+        clipboard=None,
+        initial_config=AppConfig(),
+    )
+    wiring.update(dependencies)
+    return AppController(**wiring)
+
+
+class FakeAnki:
+    """In-process AnkiConnect stand-in that can drop connections and stall replies."""
+    def __init__(self) -> None:
+        # Stored notes and media, plus every action received.
+        self.notes: list[dict] = []
+        self.media: dict[str, str] = {}
+        self.actions: list[str] = []
+        # Fault injection: requests to drop before answering and seconds to stall each reply.
+        self.resets = 0
+        self.delay = 0.0
+        # Highest number of requests handled at once.
+        self.active = 0
+        self.max_active = 0
+        self.url = ""
+
+    async def __aenter__(self) -> "FakeAnki":
+        # Serve on a free local port.
+        app = web.Application()
+        app.router.add_post("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        """Answer one AnkiConnect call, unless a reset or delay is pending."""
+        body = json.loads(await request.read())
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            # Drop the connection without a reply.
+            if self.resets:
+                self.resets -= 1
+                request.transport.close()
+                raise ConnectionResetError("dropped by FakeAnki")
+            await asyncio.sleep(self.delay)
+            try:
+                return web.json_response({"result": self._run(body["action"], body.get("params", {})), "error": None})
+            except Exception as e:
+                return web.json_response({"result": None, "error": str(e)})
+        finally:
+            self.active -= 1
+
+    def _run(self, action: str, params: dict):
+        """Apply an action to the in-memory collection."""
+        self.actions.append(action)
+        if action == "multi":
+            results = []
+            for sub in params["actions"]:
+                try:
+                    results.append({"result": self._run(sub["action"], sub.get("params", {})), "error": None})
+                except Exception as e:
+                    results.append({"result": None, "error": str(e)})
+            return results
+        if action == "addNote":
+            note = params["note"]
+            if any(other["fields"] == note["fields"] for other in self.notes):
+                raise Exception("cannot create note because it is a duplicate")
+            self.notes.append(note)
+            return len(self.notes)
+        if action == "storeMediaFile":
+            self.media[params["filename"]] = params.get("data") or params.get("path")
+            return params["filename"]
+        if action == "getMediaFilesNames":
+            return [name for name in self.media if fnmatch.fnmatch(name, params.get("pattern", "*"))]
+        if action == "version":
+            return 6
+        raise Exception(f"unsupported action {action}")
@@ -0,0 +1,177 @@
+# file: tests/test_anki.py
+import time
+import socket
+import asyncio
+import threading
+import pytest
+
+from kanji2vocab.services.anki import AnkiClient, AnkiInteractor
+from kanji2vocab.services.outbox import AnkiOutbox
+from fakes import FakeAnki, RecordingLogger
+
+
+def test_invoke_retries_after_connection_reset():
+    async def scenario():
+        async with FakeAnki() as anki:
+            anki.resets = 2
+            interactor = AnkiInteractor(anki.url, retries=2)
+            try:
+                assert await interactor.invoke("version") == 6
+            finally:
+                await interactor.close()
+            return anki.actions
+
+    # Two dropped requests, then the third attempt is answered.
+    assert asyncio.run(scenario()) == ["version"]
+
+
+def test_invoke_gives_up_after_retries():
+    async def scenario():
+        async with FakeAnki() as anki:
+            anki.resets = 5
+            interactor = AnkiInteractor(anki.url, retries=1)
+            try:
+                with pytest.raises(Exception, match="Anki::Connection"):
+                    await interactor.invoke("version")
+            finally:
+                await interactor.close()
+            return anki.resets
+
+    # One try plus one retry used up two of the resets.
+    assert asyncio.run(scenario()) == 3
+
+
+def test_invoke_times_out_and_recovers():
+    async def scenario():
+        async with FakeAnki() as anki:
+            anki.delay = 1.0
+            interactor = AnkiInteractor(anki.url, timeout=0.2)
+            try:
+                start = time.perf_counter()
+                with pytest.raises(Exception, match="Anki::Timeout"):
+                    await interactor.invoke("version")
+                elapsed = time.perf_counter() - start
+
+                # A per-call timeout overrides the default.
+                assert await interactor.invoke("version", timeout=5.0) == 6
+            finally:
+                await interactor.close()
+            return elapsed
+
+    assert asyncio.run(scenario()) < 0.9
+
+
+def test_invoke_fails_fast_when_anki_is_down():
+    # Reserve a port, then release it so nothing listens there.
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def scenario():
+        interactor = AnkiInteractor(f"http://127.0.0.1:{port}", retries=3)
+        try:
+            with pytest.raises(Exception, match="cannot reach"):
+                await interactor.invoke("version")
+        finally:
+            await interactor.close()
+
+    start = time.perf_counter()
+    asyncio.run(scenario())
+    assert time.perf_counter() - start < 0.3
+
+
+def test_invoke_serializes_concurrent_calls():
+    async def scenario():
+        async with FakeAnki() as anki:
+            anki.delay = 0.02
+            interactor = AnkiInteractor(anki.url)
+            try:
+                results = await asyncio.gather(*(interactor.invoke("version") for _ in range(8)))
+            finally:
+                await interactor.close()
+            return results, anki.max_active
+
+    # AnkiConnect only ever sees one request at a time.
+    results, max_active = asyncio.run(scenario())
+    assert results == [6] * 8
+    assert max_active == 1
+
+
+def test_flusher_does_not_starve_add_notes(tmp_path):
+    logger = RecordingLogger()
+    outcome = {}
+
+    async def scenario():
+        async with FakeAnki() as anki:
+            anki.delay = 0.05
+            interactor = AnkiInteractor(anki.url)
+            outbox = AnkiOutbox(str(tmp_path / "outbox.sqlite3"))
+            client = AnkiClient(interactor, "Deck", logger, outbox=outbox, flush_interval=0.05)
+            try:
+                # A note left over from an earlier run, drained at startup.
+                outbox.put([client.build_note({"Front": "left over"}, "Basic")])
+                client.start_flusher()
+                await asyncio.sleep(0.01)
+
+                # While the flusher is sending it, a fresh note is delivered directly.
+                outcome["results"] = await client.add_notes([client.build_note({"Front": "fresh"}, "Basic")])
+                await asyncio.wait_for(client._flusher, 5)
+                outcome["queued"] = outbox.count(include_rejected=True)
+            finally:
+                await client.close()
+                await interactor.close()
+                outbox.close()
+            outcome["notes"] = sorted(note["fields"]["Front"] for note in anki.notes)
+
+    # A spinning flusher would block the loop itself, so guard from another thread.
+    runner = threading.Thread(target=asyncio.run, args=(scenario(),), daemon=True)
+    runner.start()
+    runner.join(10)
+    assert not runner.is_alive(), "flusher blocked the event loop"
+
+    assert outcome == {"results": [True], "queued": 0, "notes": ["fresh", "left over"]}
+    flush_logs = [text for text, _ in logger.lines if text.startswith("Outbox:")]
+    assert flush_logs == ["Outbox: 1 queued note(s) delivered, 0 rejected"]
+
+
+def test_queued_notes_name_media_and_the_outbox_keeps_it_once(tmp_path):
+    # Reserve a port, then release it so the first run finds Anki down.
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def scenario():
+        outbox = AnkiOutbox(str(tmp_path / "outbox.sqlite3"))
+        try:
+            # First run: two cards share one stroke file, and both wait in the outbox.
+            down = AnkiInteractor(f"http://127.0.0.1:{port}", retries=0)
+            client = AnkiClient(down, "Deck", RecordingLogger(), outbox=outbox)
+            stroke = client.media_from_data(b"<svg>" + b"x" * 3000 + b"</svg>", ".svg", filename="k2v_stroke_5f37.svg")
+            notes = [client.build_note({"Front": front}, "Basic", media=[stroke]) for front in ("強い", "勉強")]
+            assert await client.add_notes(notes) == [None, None]
+            await client.close()
+            await down.close()
+            queued = [note for _, note in outbox.pending(10)]
+            stored = outbox.conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+            # Next run: the data is resolved from the outbox while flushing.
+            async with FakeAnki() as anki:
+                interactor = AnkiInteractor(anki.url)
+                client = AnkiClient(interactor, "Deck", RecordingLogger(), outbox=outbox)
+                try:
+                    delivered = await client.flush()
+                finally:
+                    await interactor.close()
+            left = outbox.conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+            return queued, stored, delivered, anki.media, left, stroke
+        finally:
+            outbox.close()
+
+    queued, stored, delivered, media, left, stroke = asyncio.run(scenario())
+
+    # Notes hold the file name only; the data is queued once and dropped after delivery.
+    assert [note["_media"] for note in queued] == [["k2v_stroke_5f37.svg"]] * 2
+    assert stored == 1
+    assert delivered == (2, 0)
+    assert media == {"k2v_stroke_5f37.svg": stroke["data"]}
+    assert left == 0
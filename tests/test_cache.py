@@ -0,0 +1,69 @@
+# file: tests/test_cache.py
+import os
+import zlib
+
+from kanji2vocab.services.cache import PageCache
+
+
+def stored_bytes(cache: PageCache) -> int:
+    """Return the byte total as the database sees it."""
+    return cache.conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+
+def test_hits_do_not_write(tmp_path):
+    cache = PageCache(str(tmp_path / "pages.sqlite3"))
+    cache.put("a", b"page a")
+
+    # A hit is served without opening a write transaction.
+    assert cache.get("a") == b"page a"
+    assert cache.get("missing") is None
+    assert not cache.conn.in_transaction
+    assert cache.stats() == "1 hits / 1 misses (50%)"
+    cache.close()
+
+
+def test_eviction_follows_buffered_hits(tmp_path):
+    # Incompressible bodies, so three entries never fit under the limit.
+    bodies = {url: os.urandom(1000) for url in "abc"}
+    size = len(zlib.compress(bodies["a"], 6))
+    cache = PageCache(str(tmp_path / "pages.sqlite3"), max_bytes=2 * size + 10)
+
+    cache.put("a", bodies["a"])
+    cache.put("b", bodies["b"])
+    # Reading "a" makes "b" the least recently used entry.
+    cache.get("a")
+    cache.put("c", bodies["c"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == bodies["a"]
+    assert cache.total_bytes == stored_bytes(cache)
+    cache.close()
+
+
+def test_running_total_survives_replace_and_reopen(tmp_path):
+    path = str(tmp_path / "pages.sqlite3")
+    cache = PageCache(path)
+    cache.put("a", b"x" * 500)
+    cache.put("a", os.urandom(500))
+    cache.put("b", b"y" * 10)
+    assert cache.total_bytes == stored_bytes(cache)
+    cache.close()
+
+    # The total is rebuilt once when the cache is opened again.
+    reopened = PageCache(path)
+    assert reopened.total_bytes == stored_bytes(reopened)
+    reopened.close()
+
+
+def test_hits_are_persisted_on_close(tmp_path):
+    path = str(tmp_path / "pages.sqlite3")
+    cache = PageCache(path)
+    cache.put("a", b"page a")
+    before = cache.conn.execute("SELECT accessed_at FROM pages").fetchone()[0]
+    cache.get("a")
+    cache.close()
+
+    reopened = PageCache(path)
+    after = reopened.conn.execute("SELECT accessed_at FROM pages").fetchone()[0]
+    assert after > before
+    reopened.close()
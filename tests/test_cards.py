@@ -0,0 +1,19 @@
+# file: tests/test_cards.py
+import pytest
+
+from kanji2vocab.services.cards import CompiledTemplate
+
+
+def test_compiled_template_matches_str_format():
+    template = "{TAG:>6}|{VOCAB!r}|{{literal}}|{MEANING[0]}|{KANJI}"
+    fields = {"TAG": "N5", "VOCAB": "勉強", "MEANING": ["study"], "KANJI": "強"}
+
+    bound = CompiledTemplate(template).bind(KANJI="強", TAG="N5")
+
+    assert bound.render(VOCAB="勉強", MEANING=["study"]) == template.format(**fields)
+
+
+def test_nested_format_spec_is_rejected():
+    # str.format would fill {WIDTH}; a compiled template cannot, so it must not load.
+    with pytest.raises(ValueError, match=r"\{TAG:>\{WIDTH\}\} uses a nested format spec"):
+        CompiledTemplate("<span>{TAG:>{WIDTH}}</span>")
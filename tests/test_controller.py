@@ -0,0 +1,120 @@
+# file: tests/test_controller.py
+import asyncio
+import pytest
+
+from fakes import make_controller
+from kanji2vocab.models import AppConfig, KanjiInfo, ScrapePageResult, VocabItem
+from kanji2vocab.services.explanations import explanation_text, split_sections
+
+
+ITEM = VocabItem(vocab="日本", furigana="にほん", meaning="Japan", tag="")
+
+
+class PageSource:
+    """Vocab source whose first page holds one item; later pages never finish."""
+    page_size = 1
+
+    def __init__(self, total_results: int = 1) -> None:
+        self.total_results = total_results
+        self.cancelled: list[int] = []
+
+    async def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
+        if page == 1:
+            return ScrapePageResult(
+                items=[ITEM], has_next=self.total_results > 1, total_scraped=1,
+                kanji_info=KanjiInfo(meaning="page"), total_results=self.total_results,
+            )
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            self.cancelled.append(page)
+            raise
+
+
+class BrokenPaginator:
+    """Paginator whose page stream fails before page 1."""
+    async def stream(self, kanji: str, pages: int, stats=None):
+        raise ConnectionError("jisho unreachable")
+        yield
+
+
+class LockedStore:
+    """KANJIDIC store whose database is locked."""
+    def get(self, kanji: str) -> KanjiInfo:
+        raise RuntimeError("store locked")
+
+
+class FailingStroke:
+    """Stroke scraper whose network request always fails."""
+    async def fetch_svg(self, kanji: str) -> str | None:
+        raise ConnectionError("kvg unreachable")
+
+
+class SlowStroke:
+    """Stroke scraper that never answers."""
+    async def fetch_svg(self, kanji: str) -> str | None:
+        await asyncio.sleep(60)
+
+
+class SkippingAI:
+    """AI client that never explains the last vocab it is asked about."""
+    model = "fake"
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.scheduler = self
+
+    def summary(self) -> str:
+        return ""
+
+    async def request_chat(self, joined: str, prompt: str) -> str:
+        self.requests += 1
+        return "\n".join(f"# {vocab}\n[Semantic]\nAbout {vocab}." for vocab in joined.split("#")[:-1])
+
+
+def test_prepare_kanji_survives_optional_stage_failures():
+    controller = make_controller(PageSource(), stroke_scraper=FailingStroke(), kanji_store=LockedStore())
+    prepared = asyncio.run(controller._prepare_kanji("日", method="s"))
+
+    # Stroke and store failures fall back instead of aborting the kanji.
+    assert prepared.items == [ITEM]
+    assert prepared.raw_svg is None
+    assert prepared.kanji_info == KanjiInfo(meaning="page")
+    assert controller.config.has_learned == ["日"]
+    assert [status for _, status in controller.logger.lines] == ["w", "w"]
+
+
+def test_prepare_kanji_raises_scrape_failures():
+    controller = make_controller(paginator=BrokenPaginator(), stroke_scraper=FailingStroke())
+    with pytest.raises(ConnectionError):
+        asyncio.run(controller._prepare_kanji("日"))
+
+
+def test_cancelled_prepare_kanji_stops_the_loader():
+    source = PageSource(total_results=2)
+
+    async def scenario():
+        controller = make_controller(source, stroke_scraper=SlowStroke())
+        task = asyncio.create_task(controller._prepare_kanji("日"))
+
+        # Cancel once page 1 is in and the loader waits on page 2, while the stroke still loads.
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert source.cancelled == [2, 3]
+
+
+def test_vocab_the_ai_skips_stays_unexplained():
+    controller = make_controller(ai_client=SkippingAI(), initial_config=AppConfig(ai_retries=1))
+
+    response = asyncio.run(controller._explain(["強い", "強盗"]))
+    sections = split_sections(response)
+
+    # The chunk is retried, then the skipped vocab gets an empty explanation instead of its own heading.
+    assert controller.ai_client.requests == 2
+    assert explanation_text("強い", sections["強い"]) == "強い\n[Semantic]\nAbout 強い."
+    assert explanation_text("強盗", sections["強盗"]) == ""
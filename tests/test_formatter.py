@@ -0,0 +1,98 @@
+# file: tests/test_formatter.py
+from fakes import RecordingLogger
+from kanji2vocab.models import Span, plain
+from kanji2vocab.services.formatter import Formatter
+
+
+class CountingPattern:
+    """Compiled pattern stand-in that counts every scan."""
+    def __init__(self, pattern) -> None:
+        self.pattern = pattern
+        self.scans = 0
+
+    def __getattr__(self, name):
+        self.scans += 1
+        return getattr(self.pattern, name)
+
+
+def test_config_rules_extend_and_override_builtins():
+    formatter = Formatter({"Onomatopoeic or mimetic word": ["ono", "ffa500"], "Noun": "名"})
+
+    shortened = formatter.shortify_meaning([(Span("sound (Onomatopoeic or mimetic word, Noun)"),)])
+
+    assert plain(shortened) == "1. sound (ono, 名)"
+    assert Span("ono", "ffa500", "label") in shortened
+
+
+def test_malformed_rules_are_skipped_and_logged():
+    logger = RecordingLogger()
+    formatter = Formatter(logger=logger)
+
+    # Hand-edited config: too short, not a list, bad color, non-string text.
+    formatter.update_rules({
+        "Noun": ["名"],
+        "Transitive verb": 5,
+        "Intransitive verb": ["vi!", "orange"],
+        "Conjunction": [1, "ff0000"],
+        "Godan verb": ["五段", "0f0"],
+    })
+
+    shortened = formatter.shortify_meaning([(Span("go (Godan verb, Noun, Transitive verb, Conjunction)"),)])
+
+    # Bad entries fall back to the built-in rules; the good one still applies.
+    assert plain(shortened) == "1. go (五段, n, vt, conj)"
+    assert [status for _, status in logger.lines] == ["w"] * 4
+
+
+def test_meaning_rules_scan_each_meaning_once():
+    formatter = Formatter()
+    formatter._meaning_pattern = pattern = CountingPattern(formatter._meaning_pattern)
+    sense = (Span("to study; to learn (Noun, Suru verb)"), Span("\n「毎日勉強する。」", "424242", "example"))
+
+    shortened = formatter.shortify_meaning([sense] * 6)
+
+    # The compiled engine is the speedup: one scan per meaning, not one per sense, span or rule.
+    assert pattern.scans == 1
+    assert plain(shortened).splitlines()[:2] == ["1. to study, learn (n, vする)", "「毎日勉強する。」"]
+
+
+def test_tags_shorten_in_one_pass():
+    formatter = Formatter()
+    assert formatter.shortify_tag("Common word, JLPT N5, Wanikani level 9") == "CMN, N5, WN9"
+
+
+def test_tag_spans_are_split_and_shared():
+    formatter = Formatter()
+
+    spans = formatter.tag_spans("CMN, N5")
+
+    assert spans == (Span("CMN", None, "tag"), Span(", "), Span("N5", None, "tag"))
+    assert formatter.tag_spans("CMN, N5") is spans
+    assert formatter.tag_spans("") == ()
+
+
+def test_short_runs_share_one_span_across_entries():
+    formatter = Formatter()
+
+    first = formatter.shortify_meaning([(Span("to study (Suru verb)"),)])
+    second = formatter.shortify_meaning([(Span("to work (Suru verb)"),)])
+
+    # Labels and joiners repeat on every entry, so both results hold the same objects.
+    assert first[1] is second[1] and first[1] == Span("vする", "216bd6", "label")
+    assert first[2] is second[2]
+
+
+def test_merged_info_brackets_keep_kinds_per_character():
+    formatter = Formatter()
+    # Two info notes back to back merge their brackets into one "】\n【 " span.
+    sense = (
+        Span("strong"),
+        Span("\n【 ", "e39a0c", "info"), Span("esp. wind", None, "info"),
+        Span("】\n【 ", "e39a0c", "info"), Span("rain", None, "info"),
+    )
+
+    shortened = formatter.shortify_meaning([sense, (Span("powerful"),)])
+
+    kinds = {span.text: span.kind for span in shortened}
+    assert plain(shortened) == "1. strong\n【 ESP: wind】\n【 rain\n2. powerful"
+    assert kinds["rain"] == "info" and kinds["\n2. powerful"] == "text"
@@ -0,0 +1,70 @@
+# file: tests/test_jmdict.py
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from fakes import RecordingLogger
+from kanji2vocab.models import KanjiInfo, plain
+from kanji2vocab.services.formatter import Formatter
+from kanji2vocab.services.jmdict import JMdictSource, JMdictStore
+from kanji2vocab.services.scraper import VocabFilter, VocabSource
+
+
+# A few hand-written entries in JMdict's XML format.
+FIXTURE = Path(__file__).parent / "fixtures" / "jmdict" / "JMdict_e.xml"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JMdictStore(str(tmp_path / "jmdict.sqlite3"), RecordingLogger())
+    store.build(str(FIXTURE))
+    yield store
+    store.close()
+
+
+def test_vocab_source_is_abstract():
+    with pytest.raises(TypeError):
+        VocabSource(Formatter(), RecordingLogger(), VocabFilter(set()))
+
+
+def test_lookup_orders_by_frequency(store):
+    # 強盗 has no priority and comes last; the 勉彊 spelling does not contain 強.
+    assert [row[0] for row in store.lookup("強", 10, 0, common_only=False)] == ["勉強", "強い", "強いる", "強盗"]
+    assert store.count("強") == 3
+
+
+def test_source_pages_through_common_words(store):
+    source = JMdictSource(
+        store, Formatter(), RecordingLogger(), VocabFilter(set("勉いる")),
+        is_meaning_shortened=False, is_colored=False, page_size=2,
+    )
+
+    first = asyncio.run(source.scrape_page("強", 1))
+    second = asyncio.run(source.scrape_page("強", 2))
+
+    assert [item.vocab for item in first.items] == ["勉強", "強い"]
+    assert [plain(item.furigana) for item in first.items] == ["べんきょう", "つよ"]
+    assert first.has_next and not second.has_next
+    assert first.total_results == 3
+    assert [item.vocab for item in second.items] == ["強いる"]
+    assert plain(second.items[0].meaning) == "to force; to compel (Ichidan verb, Transitive verb)\n【 esp. in negative】"
+
+
+class KanjiStore:
+    """KANJIDIC store stand-in that knows a single kanji."""
+    def get(self, kanji: str):
+        return KanjiInfo(info="11 strokes", onyomi="On:キョウ、ゴウ", kunyomi="Kun:つよ.い", meaning="strong")
+
+
+def test_source_takes_kanji_info_from_the_kanjidic_store(store):
+    source = JMdictSource(
+        store, Formatter(), RecordingLogger(), VocabFilter(set("勉いる")),
+        is_meaning_shortened=False, is_colored=False, page_size=2, kanji_store=KanjiStore(),
+    )
+
+    result = asyncio.run(source.scrape_page("強", 2))
+
+    # The reading loses its okurigana like Jisho's furigana: 強いる reads し.
+    assert result.kanji_info.meaning == "strong"
+    assert [plain(item.furigana) for item in result.items] == ["し"]
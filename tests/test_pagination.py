@@ -0,0 +1,45 @@
+# file: tests/test_pagination.py
+import asyncio
+
+from rich.console import Console
+
+from kanji2vocab.models import PaginationStats, ScrapePageResult
+from kanji2vocab.services.pagination import PaginationHandler
+
+
+class PagedSource:
+    """Vocab source with a fixed number of result pages; one page always fails."""
+    page_size = 20
+
+    def __init__(self, last_page: int, failing: int | None = None) -> None:
+        self.last_page = last_page
+        self.failing = failing
+
+    async def scrape_page(self, kanji: str, page: int) -> ScrapePageResult:
+        if page == self.failing:
+            raise ConnectionError("jisho unreachable")
+        return ScrapePageResult(
+            items=[], has_next=page < self.last_page, total_scraped=page, total_results=self.last_page * 20
+        )
+
+
+def test_stream_table_shows_every_page_and_the_request_summary(monkeypatch):
+    # Skip the retry backoff; the failing page still takes every attempt.
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda seconds: sleep(0))
+    handler = PaginationHandler(PagedSource(last_page=3, failing=2), logger=None)
+    stats = PaginationStats()
+
+    async def scenario():
+        return [page async for page, _ in handler.stream("強", 5, stats)]
+
+    pages = asyncio.run(scenario())
+
+    # Pages are recorded as handed out, failures included, and drawn once loading stops.
+    assert pages == [1, 2, 3]
+    assert [(page, result is None) for page, result in stats.results] == [(1, False), (2, True), (3, False)]
+    console = Console(width=200, record=True)
+    console.print(handler.stream_table(stats))
+    text = console.export_text()
+    assert "Timeout (Retry Failed)!" in text
+    assert stats.summary() in text
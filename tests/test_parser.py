@@ -0,0 +1,51 @@
+# file: tests/test_parser.py
+import json
+import dataclasses
+from pathlib import Path
+
+import pytest
+
+from kanji2vocab.models import render_html, render_rich
+from kanji2vocab.services.formatter import Formatter
+from kanji2vocab.services.logger import Logger
+from kanji2vocab.services.parser import JishoParser
+from kanji2vocab.services.scraper import JishoScraper, VocabFilter
+
+
+# Result pages in Jisho's markup, and what the BeautifulSoup scraper made of them before JishoParser.
+FIXTURES = Path(__file__).parent / "fixtures" / "jisho"
+LEARNED = set("勉盗いる")
+
+
+def legacy(page: dict) -> dict:
+    """Drop the id="k2v-colored" marker the span renderer no longer emits."""
+    # Everything else must match character for character.
+    items = [
+        [vocab, furigana, meaning.replace(' id="k2v-colored"', ""), tag] for vocab, furigana, meaning, tag in page["items"]
+    ]
+    return {**page, "items": items}
+
+
+@pytest.mark.parametrize("page", [1, 2])
+def test_parser_matches_legacy_output(page):
+    expected = json.loads((FIXTURES / "expected.json").read_text(encoding="utf-8"))[f"page{page}"]
+    scraper = JishoScraper("{}{}", Formatter(), Logger(), VocabFilter(LEARNED))
+
+    result = scraper._parse_page((FIXTURES / f"page{page}.html").read_bytes(), "強", page)
+
+    assert {
+        "items": [[item.vocab, render_rich(item.furigana), render_html(item.meaning), render_html(item.tag)] for item in result.items],
+        "has_next": result.has_next,
+        "kanji_info": dataclasses.asdict(result.kanji_info) if result.kanji_info else None,
+    } == legacy(expected)
+
+
+def test_senses_are_parsed_on_demand():
+    parser = JishoParser(Formatter())
+    parsed = parser.parse((FIXTURES / "page1.html").read_bytes())
+
+    # Only vocab is read up front; senses wait until first access.
+    entry = parsed.entries[0]
+    assert "senses" not in entry.__dict__
+    assert entry.senses == entry.senses
+    assert parsed.total_results == 123